@@ -5,6 +5,8 @@ from twsapi.ibapi.contract import Contract, ContractDetails
 from twsapi.ibapi.order import Order
 from twsapi.ibapi.client import EClient
 from twsapi.ibapi.wrapper import EWrapper
+from twsapi.ibapi.registry import RequestRegistry, POSITIONS, OPEN_ORDERS
+from Logic.QuoteTable import QuoteTable
 
 
 class IBapi(EWrapper, EClient):
@@ -15,27 +17,35 @@ class IBapi(EWrapper, EClient):
         self.openPositionsLiveDataRequests = {}
         self.temp_positions={}
         self.openOrders = {}
-        self.candidatesLive = {}
+        self.candidatesLive = {}  # reqId: the candidate's ratings, its prices are in self.quotes
+        self.quotes = QuoteTable()  # live quotes of the candidates by reqId
         self.openPositionsHistolicalData={}
         self.generalStatus = "PnL not yet received"
         self.dailyPnl =0
-        self.finishedPostitionsGeneral=False
-        self.finishedReceivingOrders=False
         self.openPositionsLiveHistoryRequests={}
         self.excessLiquidity = 0
         self.sMa=0
         self.tradesRemaining=0
         self.netLiquidation=0
-        self.contract_processing=False
         self.setting=None
         self.trading_session=''
-        self.trading_hours_received=False
-        self.executions_received=False
+        self.trading_session_state=None
+        self.requests=RequestRegistry()  # request and order ids, completed by the callbacks below
+        self.marketData=self  # where market data requests go, the worker's EClientPool if it has one
 
 
     def nextValidId(self, orderId: int):
         super().nextValidId(orderId)
         self.nextorderId = orderId
+        self.requests.setNextOrderId(orderId)
+
+    def error(self, reqId, errorCode: int, errorString: str):
+        super().error(reqId, errorCode, errorString)
+        self.requests.error(reqId, errorCode, errorString)
+
+    def connectionClosed(self):
+        super().connectionClosed()
+        self.requests.cancelAll("connection closed")
 
     def pnl(self, reqId: int, dailyPnL: float, unrealizedPnL: float, realizedPnL: float):
         super().pnl(reqId, dailyPnL, unrealizedPnL, realizedPnL)
@@ -62,6 +72,7 @@ class IBapi(EWrapper, EClient):
             print('pnl details received for request:' + str(reqId))    #debug only
             self.cancelPnLSingle(reqId)
             self.openPositionsLiveDataRequests.pop(reqId, None)
+            self.requests.complete(reqId)
 
     def position(self, account: str, contract: Contract, position: float, avgCost: float):
         super().position(account, contract, position, avgCost)
@@ -69,7 +80,7 @@ class IBapi(EWrapper, EClient):
 
     def positionEnd(self):
         super().positionEnd()
-        self.finishedPostitionsGeneral=True
+        self.requests.complete(POSITIONS, self.temp_positions)
 
     def orderStatus(self, orderId, status, filled, remaining, avgFullPrice, permId, parentId, lastFillPrice, clientId,
                     whyHeld, mktCapPrice):
@@ -88,10 +99,11 @@ class IBapi(EWrapper, EClient):
 
     def openOrderEnd(self):
         super().openOrderEnd()
-        self.finishedReceivingOrders=True
+        self.requests.complete(OPEN_ORDERS, self.openOrders)
 
     def execDetails(self, reqId, contract, execution):
         super().execDetails(reqId, contract, execution)
+        self.requests.add(reqId, execution)
         #important
         symbol=contract.symbol
         shares=execution.shares
@@ -102,66 +114,28 @@ class IBapi(EWrapper, EClient):
 
     def execDetailsEnd(self, reqId: int):
         super().execDetailsEnd(reqId)
-        self.executions_received=True
+        self.requests.complete(reqId)
 
     def tickPrice(self, reqId, tickType, price, attrib):
         super().tickPrice(reqId, tickType, price, attrib)
-        # print("Tick received")
-        if tickType == 1:
-            self.candidatesLive[reqId]["Bid"] = price
-            if(self.candidatesLive[reqId]["Ask"]!=0 and self.candidatesLive[reqId]["Close"]!=0):
-                if self.trading_session_state=='Open':
-                    if self.candidatesLive[reqId]["Open"] != 0:
-                        self.cancelMktData(reqId)
-                        self.CandidatesLiveDataRequests.pop(reqId, None)
-                        print("Got data, stopped tracking request " + str(reqId))
-                else:
-                    self.cancelMktData(reqId)
-                    self.CandidatesLiveDataRequests.pop(reqId, None)
-                    print("Got data, stopped tracking request "+str(reqId))
-        elif tickType == 2:
-            self.candidatesLive[reqId]["Ask"] = price
-            if(self.candidatesLive[reqId]["Bid"]!=0 and self.candidatesLive[reqId]["Close"]!=0):
-                if self.trading_session_state=='Open':
-                    if self.candidatesLive[reqId]["Open"] != 0:
-                        self.cancelMktData(reqId)
-                        self.CandidatesLiveDataRequests.pop(reqId, None)
-                        print("Got data, stopped tracking request " + str(reqId))
-                else:
-                    self.cancelMktData(reqId)
-                    self.CandidatesLiveDataRequests.pop(reqId, None)
-                    print("Got data, stopped tracking request "+str(reqId))
-        elif tickType == 4:
-            #last price ignored - have no value
-            return
-        elif tickType == 9:
-            self.candidatesLive[reqId]["Close"] = price
-            if(self.candidatesLive[reqId]["Bid"]!=0 and self.candidatesLive[reqId]["Ask"]!=0):
-                if self.trading_session_state=='Open':
-                    if self.candidatesLive[reqId]["Open"] != 0:
-                        self.cancelMktData(reqId)
-                        self.CandidatesLiveDataRequests.pop(reqId, None)
-                        print("Got data, stopped tracking request " + str(reqId))
-                else:
-                    self.cancelMktData(reqId)
-                    self.CandidatesLiveDataRequests.pop(reqId, None)
-                    print("Got data, stopped tracking request "+str(reqId))
-        elif tickType == 6:
-            return
-            # self.candidatesLive[reqId]["High"] = price
-        elif tickType == 7:
-            # self.candidatesLive[reqId]["Low"] = price
-            return
-        elif tickType == 14:
-            self.candidatesLive[reqId]["Open"] = price
-            if(self.candidatesLive[reqId]["Bid"]!=0 and self.candidatesLive[reqId]["Ask"]!=0 and self.candidatesLive[reqId]["Close"]!=0):
-                self.cancelMktData(reqId)
-                self.CandidatesLiveDataRequests.pop(reqId, None)
+        slot = self.quotes.setPrice(reqId, tickType, price)
+        if slot is not None and self.requests.isPending(reqId):
+            # the candidate is evaluated on its bid, ask and close, and on the open during the session
+            if self.quotes.hasQuote(slot, self.trading_session_state == 'Open'):
+                self.marketData.cancelMktData(reqId)
+                self.requests.complete(reqId)
                 print("Got data, stopped tracking request " + str(reqId))
-        else:
-            print("unrecognized tick:", tickType)
 
-        self.candidatesLive[reqId]["LastUpdate"] = datetime.datetime.now()
+    def tickSize(self, reqId, tickType, size):
+        super().tickSize(reqId, tickType, size)
+        self.quotes.setSize(reqId, tickType, size)
+
+    def candidates_with_quotes(self):
+        """
+The candidates with their current quotes (Bid, Ask, Close, Open, LastUpdate...) as dicts, for the report
+        """
+        return {reqId: dict(c, **self.quotes.quote(reqId)) if reqId in self.quotes else dict(c)
+                for (reqId, c) in list(self.candidatesLive.items())}
 
     def accountSummary(self, reqId: int, account: str, tag: str, value: str,
                        currency: str):
@@ -180,6 +154,11 @@ class IBapi(EWrapper, EClient):
             s = self.openPositionsLiveHistoryRequests[reqId]
             self.openPositions[s]["HistoricalData"].append(bar)
 
+    def historicalDataBatch(self, reqId: int, bars):
+        if reqId in self.openPositionsLiveHistoryRequests.keys():
+            s = self.openPositionsLiveHistoryRequests[reqId]
+            self.openPositions[s]["HistoricalData"] = bars
+
     def historicalDataEnd(self, reqId: int, start: str, end: str):
         super().historicalDataEnd(reqId, start, end)
         del self.openPositionsLiveHistoryRequests[reqId]
@@ -187,15 +166,22 @@ class IBapi(EWrapper, EClient):
 
     def historicalDataUpdate(self, reqId: int, bar: BarData):
         s = self.openPositionsLiveHistoryRequests[reqId]
-        self.openPositions[s]["HistoricalData"][-1]=bar
+        history = self.openPositions[s]["HistoricalData"]
+        if isinstance(history, list):
+            history[-1]=bar
+        else:
+            # bars received as arrays by historicalDataBatch
+            for field in ("date", "open", "high", "low", "close", "volume", "average", "barCount"):
+                getattr(history, field)[-1] = getattr(bar, field)
 
     def contractDetails(self, reqId: int, contractDetails: ContractDetails):
         super().contractDetails(reqId, contractDetails)
         self.trading_session=contractDetails.tradingHours
-        self.trading_hours_received=True
+        self.requests.add(reqId, contractDetails)
 
     def contractDetailsEnd(self, reqId: int):
         super().contractDetailsEnd(reqId)
+        self.requests.complete(reqId)
 
     def report_execution_to_Server(self, symbol, shares, price, side, time):
         report_market_action(self.setting,symbol, shares, price, side, time)
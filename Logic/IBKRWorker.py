@@ -1,19 +1,39 @@
-import time
 import threading
 import datetime
+import concurrent.futures
+
+import numpy as np
 
 from Logic.ApiWrapper import IBapi, createContract, createTrailingStopOrder, create_limit_buy_order, createMktSellOrder
+from Logic.QuoteTable import ASK
 from pytz import timezone
 
 from twsapi.ibapi.execution import ExecutionFilter
+from twsapi.ibapi.pool import EClientPool
+from twsapi.ibapi.registry import NEXT_VALID_ID, POSITIONS, OPEN_ORDERS, waitAll
+
+REQUEST_TIMEOUT = 60  # seconds to wait for the answer to a request
+CANDIDATES_IN_FLIGHT = 90  # market data requests waiting for their first prices
+CANDIDATES_WAIT = 10  # seconds to wait for the prices of the last candidates
 
 
 class IBKRWorker():
     def __init__(self, settings):
         self.trading_session_state=None
         self.app = IBapi()
+        self.app.setEventDriven(True)  # connect/disconnect without polling delays
+        self.app.setCoalescing(4096)  # subscription bursts go out in few writes
+        self.app.setPacing()  # stay under the TWS message rate without sleeping
+        self.app.setHistoricalBatch(True)  # bars arrive as numpy arrays
+        self.app.setConflation(True, 10000)  # a stalled loop only sees the latest ticks
+        self.app.setOrderSummary(True)  # openOrder only reads the order summary
         self.settings = settings
         self.app.setting = self.settings
+        # with connection_data_clients the market data goes over its own
+        # connections, orders always stay on the app's
+        self.pool = EClientPool(self.app, int(self.settings.DATACONNECTIONS),
+                                self.settings.DATAPORTS or None)
+        self.app.marketData = self.pool
         self.stocks_data_from_server = []
         self.last_worker_execution_time=None
 
@@ -29,7 +49,7 @@ class IBKRWorker():
                 print("Could not connect to TWS ....processing skept..")
                 return False
         except Exception as e:
-            self.app.disconnect()
+            self.pool.disconnect()
             self.app.reset()
             if hasattr(e, 'message'):
                 print("Error in IBKR processing : " + str(e.message))
@@ -49,8 +69,7 @@ class IBKRWorker():
                             print("Closing " + s)
                             contract = createContract(s)
                             order = createMktSellOrder(p['stocks'])
-                            self.app.placeOrder(self.app.nextorderId, contract, order)
-                            self.app.nextorderId = self.app.nextorderId + 1
+                            self.app.placeOrder(self.app.requests.nextOrderId(), contract, order)
                             print("Created a Market Sell order for " + s)
 
                         else:
@@ -62,7 +81,7 @@ class IBKRWorker():
                 print("Could not connect to TWS ....processing skept..")
                 return False
         except Exception as e:
-            self.app.disconnect()
+            self.pool.disconnect()
             self.app.reset()
             if hasattr(e, 'message'):
                 print("Error in closing all positions : " + str(e.message))
@@ -115,34 +134,28 @@ Connecting to IBKR API and initiating the connection instance
 Creates the connection - starts listner for events
         """
 
-        self.app.nextorderId = None
-        # while not isinstance(self.app.nextorderId, int):
-        retries = 0
         print("Restarting connection to IBKR")
-        self.app.disconnect()
+        self.pool.disconnect()
         #self.app.reset()
-        self.app.connect('127.0.0.1', int(self.settings.PORT), 123)
+        ready = self.app.requests.request(NEXT_VALID_ID)
+        self.pool.connect('127.0.0.1', int(self.settings.PORT), 123)
 
         # Start the socket in a thread
         api_thread = threading.Thread(target=self.run_loop, name='ibkrConnection', daemon=True)
         api_thread.start()
 
-        # Check if the API is connected via orderid
-
-        while True:
-            if isinstance(self.app.nextorderId, int):
+        # The API is connected once it sent the next order id
+        connected = False
+        if self.app.isConnected():
+            try:
+                ready.result(timeout=10)
                 print('Successfully connected to API')
-                connected=True
-                break
-            else:
-                print('Waiting for connection...attempt:' + str(retries))
-                time.sleep(1)
-                retries = retries + 1
-                if retries > 10:
-                    connected = False
-                    break
+                connected = True
+            except (concurrent.futures.TimeoutError, ConnectionError):
+                pass
         if not connected:
-            self.app.disconnect()
+            print('Could not connect to API')
+            self.pool.disconnect()
             self.app.reset()
         return connected
 
@@ -150,45 +163,42 @@ Creates the connection - starts listner for events
         """
 Starts tracking the Candidates and adds the statistics
         """
-        time.sleep(1) # clearing messages
         stock_names = [o['ticker'] for o in self.stocks_data_from_server]
         print("Requesting data for " +str(len(stock_names)) + " Candidates")
 
         # stock_names=stock_names[0:80]   #trimming 90 queries to track less than 100
-        self.app.CandidatesLiveDataRequests = {}  # reset candidates requests dictionary
+        in_flight = []  # requests still waiting for their first prices
 
         # starting querry
         trackedStockN = 1
-        message_number=0
+        self.app.quotes.reserve(len(self.app.quotes) + len(stock_names))  # no growing while ticks arrive
+        self.pool.reqMarketDataType(1)
         for s in stock_names:
-            if len(self.app.CandidatesLiveDataRequests)>90:
-                time.sleep(0.5)
-                print("Requested more than 90 candidates - waiting to be cleared...")
-            id = self.app.nextorderId
+            in_flight = [r for r in in_flight if not r.done()]
+            if len(in_flight) > CANDIDATES_IN_FLIGHT:
+                print("Requested more than " + str(CANDIDATES_IN_FLIGHT) + " candidates - waiting to be cleared...")
+                concurrent.futures.wait(in_flight, timeout=0.5, return_when=concurrent.futures.FIRST_COMPLETED)
+            request = self.app.requests.request()
+            id = request.reqId
             print(
                 "starting to track: " + str(trackedStockN) + " of " + str(
                     len(stock_names)) + " " + s +
                 " traking with Id:" +
                 str(id))
             c = createContract(s)
-            self.app.CandidatesLiveDataRequests[id]='requested'
+            in_flight.append(request)
             self.app.candidatesLive[id] = {"Stock": s,
-                                           "Close": 0,
-                                           "Open": 0,
-                                           "Bid": 0,
-                                           "Ask": 0,
                                            "averagePriceDropP": 0,
                                            "averagePriceSpreadP": 0,
-                                           "tipranksRank": 0,
-                                           "LastUpdate": 0}
-            self.app.reqMarketDataType(1)
-            self.app.reqMktData(id, c, '', False, False, [])
-            self.app.nextorderId += 1
+                                           "tipranksRank": 0}
+            self.app.quotes.add(id, s)
+            self.pool.reqMktData(id, c, '', False, False, [])
             trackedStockN += 1
-            message_number+=1
-            if message_number % 10==0:
-                time.sleep(1)
-                print("Waiting to clear messages buffer")
+        self.pool.flush()
+        # the last requests still need their prices before the candidates are evaluated
+        (done, not_done) = concurrent.futures.wait(in_flight, timeout=CANDIDATES_WAIT)
+        if not_done:
+            print(str(len(not_done)) + " candidates got no data in " + str(CANDIDATES_WAIT) + " seconds")
 
 
         have_empty = True
@@ -237,8 +247,7 @@ Processes the positions to identify Profit/Loss
                             contract = createContract(s)
                             order = createTrailingStopOrder(p["stocks"], self.settings.TRAIL)
 
-                            self.app.placeOrder(self.app.nextorderId, contract, order)
-                            self.app.nextorderId = self.app.nextorderId + 1
+                            self.app.placeOrder(self.app.requests.nextOrderId(), contract, order)
                             print("Created a Trailing Stop order for " + s + " at level of " +
                                                        str(self.settings.TRAIL) + "%")
                     elif profit < float(self.settings.LOSS):
@@ -250,8 +259,7 @@ Processes the positions to identify Profit/Loss
                                                        "Creating a Market Sell Order to minimize the Loss")
                             contract = createContract(s)
                             order = createMktSellOrder(p['stocks'])
-                            self.app.placeOrder(self.app.nextorderId, contract, order)
-                            self.app.nextorderId = self.app.nextorderId + 1
+                            self.app.placeOrder(self.app.requests.nextOrderId(), contract, order)
                             print("Created a Market Sell order for " + s)
 
                 else:
@@ -271,9 +279,9 @@ Evaluates stock for buying
         print("Evaluating " + s + "for a Buy")
         result='evaluating'
         # finding stock in Candidates
-        for c in self.app.candidatesLive.values():
+        for i, c in self.app.candidatesLive.items():
             if c["Stock"] == s:
-                ask_price = c["Ask"]
+                ask_price = self.app.quotes.price(i, ASK)
                 average_daily_dropP = c["averagePriceDropP"]
                 tipRank = c["tipranksRank"]
                 target_price = c["target_price"]
@@ -300,25 +308,25 @@ Update target price for all tracked stocks
         :return:
         """
         print("Updating target prices for Candidates")
-        for c in self.app.candidatesLive.values():
+        quotes = self.app.quotes.snapshot()
+        drops = np.array([self.app.candidatesLive[i]["averagePriceDropP"] for i in quotes["reqId"]], dtype=float)
+        # open if the market is open, close of the day before otherwise
+        bases = np.where(quotes["open"] != 0, quotes["open"], quotes["close"])
+        targets = bases - bases / 100 * drops
+        for (q, target) in zip(quotes, targets):
+            c = self.app.candidatesLive[int(q["reqId"])]
             print("Updating target price for " + c["Stock"])
-            close = c["Close"]
-            open = c["Open"]
-            average_daily_dropP = c["averagePriceDropP"]
-
-            if open != 0:  # market is open
-                c["target_price"] = open - open / 100 * average_daily_dropP
+            if q["open"] != 0:
+                c["target_price"] = float(target)
                 print("Target price for " + str(c["Stock"]) + " updated to " + str(
                     c["target_price"]) + " based on Open price")
-            elif close != 0:  # market is closed - figured from day before
-                c["target_price"] = close - close / 100 * average_daily_dropP
+            elif q["close"] != 0:
+                c["target_price"] = float(target)
                 print("Target price for " + str(c["Stock"]) + " updated to " + str(
                     c["target_price"]) + " based on Close price")
             else:
-
                 c["target_price"] = 0
                 print("Skept target price for " + str(c["Stock"]) + "Closing price missing")
-                continue
 
     def buy_the_stock(self, price, s):
         """
@@ -332,9 +340,7 @@ Creates order to buy a stock at specific price
             if stocksToBuy > 0:  # very important - check for available trades everywhere!!!
 
                 order = create_limit_buy_order(stocksToBuy, price)
-                self.app.placeOrder(self.app.nextorderId, contract, order)
-
-                self.app.nextorderId = self.app.nextorderId + 1
+                self.app.placeOrder(self.app.requests.nextOrderId(), contract, order)
                 print(
                     "Issued the BUY order at " + str(price) + "for " + str(stocksToBuy) + " Stocks of " + s)
 
@@ -396,7 +402,7 @@ Process Open positions and Candidates
 
             print(
                 "...............Worker finished....EST Time: " + est_time + "...................")
-            self.app.disconnect()
+            self.pool.disconnect()
             #self.app.reset()
         except Exception as e:
             if hasattr(e, 'message'):
@@ -417,23 +423,20 @@ updating all openPositions, refreshed on each worker- to include changes from ne
         self.app.openPositions = {}  # reset open positions
         self.app.temp_positions = {}
 
-        self.app.finishedPostitionsGeneral = False  # flag to ensure all positions received
+        positions = self.app.requests.request(POSITIONS)  # completed when all positions received
         self.app.reqPositions()  # requesting open positions
-        time.sleep(0.1)
-        counter = 0
-        while (self.app.finishedPostitionsGeneral != True):
-            time.sleep(1)
-            counter += 1
+        positions.result(timeout=REQUEST_TIMEOUT)
+        requests = []
         for s, p in self.app.temp_positions.items():  # start tracking one by one
-            id = self.app.nextorderId
+            request = self.app.requests.request()
+            id = request.reqId
             self.app.openPositionsLiveDataRequests[id] = s
             self.app.reqPnLSingle(id, self.settings.ACCOUNT, "", p["conId"])
             print("Requested details for " + s + " position PnL with reqest : "+str(id))
-            self.app.nextorderId += 1
+            requests.append(request)
 
-        while (len(self.app.openPositionsLiveDataRequests) != 0):
-            time.sleep(1)
-            print('Waiting to get all open positions....')
+        print('Waiting to get all open positions....')
+        waitAll(requests, timeout=REQUEST_TIMEOUT)
         print(str(len(self.app.openPositions)) + " open positions completely updated")
 
     def update_open_orders(self):
@@ -442,11 +445,10 @@ Requests all open orders
         """
         print("Updating all open orders")
         self.app.openOrders = {}
-        self.app.finishedReceivingOrders = False
+        orders = self.app.requests.request(OPEN_ORDERS)
         self.app.reqAllOpenOrders()
-        while(self.app.finishedReceivingOrders!=True):
-            print('Waiting to receive all open orders....')
-            time.sleep(1)
+        print('Waiting to receive all open orders....')
+        orders.result(timeout=REQUEST_TIMEOUT)
 
         print(str(len(self.app.openOrders)) + " open orders found ")
 
@@ -456,20 +458,17 @@ Start tracking excess liquidity - the value is updated every 3 minutes
         """
         # todo: add safety to not buy faster than every 3 minutes
         print("Starting to track Excess liquidity")
-        id = self.app.nextorderId
+        id = self.app.requests.nextReqId()
         self.app.reqAccountSummary(id, "All", "ExcessLiquidity,DayTradesRemaining,NetLiquidation,SMA")
-        self.app.nextorderId += 1
 
     def request_current_PnL(self):
         """
 Creating a PnL request the result will be stored in generalStarus
         """
         global id, status
-        id = self.app.nextorderId
+        id = self.app.requests.nextReqId()
         print("Requesting Daily PnL")
         self.app.reqPnL(id, self.settings.ACCOUNT, "")
-        # time.sleep(0.5)
-        self.app.nextorderId = self.app.nextorderId + 1
         print(self.app.generalStatus)
 
     def get_required_cushion_for_open_positions(self):
@@ -490,23 +489,17 @@ Creating a PnL request the result will be stored in generalStarus
         # todo implement ticker data functionality
 
         contract = createContract(ticker)
-        id = self.app.nextorderId
-        self.app.contract_processing = True
-        self.app.reqContractDetails(self.app.nextorderId, contract)
-        self.app.nextorderId = self.app.nextorderId + 1
-        while self.app.contract_processing:
-            time.sleep(0.1)
-        cd = self.app.contractDetailsList[id]
-        i = 5
-        return cd
+        request = self.app.requests.request()
+        self.app.reqContractDetails(request.reqId, contract)
+        cd = request.result(timeout=REQUEST_TIMEOUT)
+        return cd[0] if cd else None
 
     def check_if_holiday(self):
-        id = self.app.nextorderId
+        request = self.app.requests.request()
         c = createContract('AAPL')# checked always with AAPL - can be no candidates
-        self.app.reqContractDetails(id, c)
-        while (self.app.trading_hours_received != True):
-            time.sleep(1)
-        session_info_to_parse = self.app.trading_session
+        self.app.reqContractDetails(request.reqId, c)
+        details = request.result(timeout=REQUEST_TIMEOUT)
+        session_info_to_parse = details[0].tradingHours
         today_string = session_info_to_parse.split(";")[0]
         if 'CLOSED' in today_string:
             self.trading_session_holiday = True
@@ -514,8 +507,6 @@ Creating a PnL request the result will be stored in generalStarus
             self.trading_session_holiday = False
             self.check_session_state()
 
-        self.app.nextorderId += 1
-
     def add_market_data_to_live_candidates(self):
         for k, v in self.app.candidatesLive.items():
             for dt in self.stocks_data_from_server:
@@ -546,13 +537,9 @@ Creating a PnL request the result will be stored in generalStarus
         self.app.trading_session_state = self.trading_session_state
 
     def check_todays_executions(self):
-        self.app.executions_received=False
-        id = self.app.nextorderId
-        self.app.reqExecutions(id, ExecutionFilter())
-        while (self.app.executions_received != True):
-            time.sleep(1)
-
-        self.app.nextorderId += 1
+        request = self.app.requests.request()
+        self.app.reqExecutions(request.reqId, ExecutionFilter())
+        request.result(timeout=REQUEST_TIMEOUT)
 
 
 def time_in_range(start, end, x):
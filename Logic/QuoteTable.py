@@ -0,0 +1,191 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+
+from twsapi.ibapi.ticktype import TickTypeEnum
+
+# columns of QuoteTable.prices
+(BID, ASK, LAST, OPEN, CLOSE) = range(5)
+# columns of QuoteTable.sizes
+(BID_SIZE, ASK_SIZE, LAST_SIZE, VOLUME) = range(4)
+
+# tick type: column, live and delayed ticks go to the same one
+PRICE_COLUMNS = {TickTypeEnum.BID: BID, TickTypeEnum.DELAYED_BID: BID,
+                 TickTypeEnum.ASK: ASK, TickTypeEnum.DELAYED_ASK: ASK,
+                 TickTypeEnum.LAST: LAST, TickTypeEnum.DELAYED_LAST: LAST,
+                 TickTypeEnum.OPEN: OPEN, TickTypeEnum.DELAYED_OPEN: OPEN,
+                 TickTypeEnum.CLOSE: CLOSE, TickTypeEnum.DELAYED_CLOSE: CLOSE}
+SIZE_COLUMNS = {TickTypeEnum.BID_SIZE: BID_SIZE, TickTypeEnum.DELAYED_BID_SIZE: BID_SIZE,
+                TickTypeEnum.ASK_SIZE: ASK_SIZE, TickTypeEnum.DELAYED_ASK_SIZE: ASK_SIZE,
+                TickTypeEnum.LAST_SIZE: LAST_SIZE, TickTypeEnum.DELAYED_LAST_SIZE: LAST_SIZE,
+                TickTypeEnum.VOLUME: VOLUME, TickTypeEnum.DELAYED_VOLUME: VOLUME}
+
+# a row of QuoteTable.snapshot(), 0 stands for a price or size not received yet;
+# the symbols are kept as str objects, a fixed width would cut the long ones
+QUOTE_DTYPE = np.dtype([("reqId", np.int64), ("symbol", object),
+                        ("bid", np.float64), ("ask", np.float64), ("last", np.float64),
+                        ("open", np.float64), ("close", np.float64),
+                        ("bidSize", np.float64), ("askSize", np.float64),
+                        ("lastSize", np.float64), ("volume", np.float64),
+                        ("updated", np.int64)])
+
+# keys of QuoteTable.quote(), the ones the candidates had as dicts: array, column
+QUOTE_KEYS = (("Bid", "prices", BID), ("Ask", "prices", ASK), ("Last", "prices", LAST),
+              ("Open", "prices", OPEN), ("Close", "prices", CLOSE),
+              ("BidSize", "sizes", BID_SIZE), ("AskSize", "sizes", ASK_SIZE),
+              ("LastSize", "sizes", LAST_SIZE), ("Volume", "sizes", VOLUME))
+
+
+class QuoteTable():
+    """
+Live quotes of the tracked stocks in preallocated numpy arrays, one row (slot) per market data request.
+A tick is a couple of array stores, the strategy and the reporter read the whole book at once with snapshot().
+Ticks of the secondary connections come from other threads: reserve() the rows before subscribing,
+growing the arrays while ticks arrive could lose them.
+    """
+
+    def __init__(self, capacity=256):
+        self.lock = threading.Lock()
+        self.slots = {}  # reqId: row
+        self.reqIds = np.zeros(capacity, dtype=np.int64)
+        self.symbols = []
+        self.prices = np.zeros((capacity, 5))
+        self.sizes = np.zeros((capacity, 4))
+        self.updated = np.zeros(capacity, dtype=np.int64)  # time.monotonic_ns() of the last tick, 0 for none
+        self._views()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, reqId):
+        return reqId in self.slots
+
+    def reserve(self, capacity):
+        """
+Grows the arrays to hold capacity rows
+        """
+        with self.lock:
+            self._grow(capacity)
+
+    def _grow(self, capacity):
+        if capacity > len(self.updated):
+            n = len(self.symbols)
+            for name in ("reqIds", "prices", "sizes", "updated"):
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:n] = old[:n]
+                setattr(self, name, new)
+            self._views()
+
+    def _views(self):
+        # a tick is stored through memoryviews of the arrays, cheaper to index than the arrays
+        self.priceView = memoryview(self.prices)
+        self.sizeView = memoryview(self.sizes)
+        self.updatedView = memoryview(self.updated)
+
+    def add(self, reqId, symbol):
+        """
+Gives the market data request reqId of symbol a row, its prices are 0 until its ticks arrive
+        :return: the row
+        """
+        with self.lock:
+            slot = len(self.symbols)
+            if slot == len(self.updated):
+                self._grow(max(2 * slot, 16))
+            self.reqIds[slot] = reqId
+            self.symbols.append(symbol)
+            self.slots[reqId] = slot
+            return slot
+
+    def clear(self):
+        with self.lock:
+            self.slots = {}
+            self.symbols = []
+            self.prices[:] = 0
+            self.sizes[:] = 0
+            self.updated[:] = 0
+
+    def slot(self, reqId):
+        return self.slots.get(reqId)
+
+    def setPrice(self, reqId, tickType, price):
+        """
+Stores a tickPrice
+        :return: the row of reqId, None if the request or the tick type is not tracked
+        """
+        slot = self.slots.get(reqId)
+        column = PRICE_COLUMNS.get(tickType)
+        if slot is None or column is None:
+            return None
+        self.priceView[slot, column] = price
+        self.updatedView[slot] = time.monotonic_ns()
+        return slot
+
+    def setSize(self, reqId, tickType, size):
+        """
+Stores a tickSize
+        :return: the row of reqId, None if the request or the tick type is not tracked
+        """
+        slot = self.slots.get(reqId)
+        column = SIZE_COLUMNS.get(tickType)
+        if slot is None or column is None:
+            return None
+        self.sizeView[slot, column] = size
+        self.updatedView[slot] = time.monotonic_ns()
+        return slot
+
+    def price(self, reqId, column):
+        """
+One price of reqId, eg price(reqId, ASK)
+        """
+        return float(self.prices[self.slots[reqId], column])
+
+    def hasQuote(self, slot, needOpen=False):
+        """
+True once the bid, ask and close (and the open if needOpen) of the row are received
+        """
+        row = self.prices[slot]
+        return row[BID] != 0 and row[ASK] != 0 and row[CLOSE] != 0 and (row[OPEN] != 0 or not needOpen)
+
+    def snapshot(self):
+        """
+A copy of all the rows as a numpy structured array of QUOTE_DTYPE, columns are read with snapshot["ask"] etc.
+        """
+        with self.lock:
+            n = len(self.symbols)
+            rows = np.zeros(n, dtype=QUOTE_DTYPE)
+            rows["reqId"] = self.reqIds[:n]
+            rows["symbol"] = self.symbols
+            for (name, column) in (("bid", BID), ("ask", ASK), ("last", LAST), ("open", OPEN), ("close", CLOSE)):
+                rows[name] = self.prices[:n, column]
+            for (name, column) in (("bidSize", BID_SIZE), ("askSize", ASK_SIZE), ("lastSize", LAST_SIZE),
+                                   ("volume", VOLUME)):
+                rows[name] = self.sizes[:n, column]
+            rows["updated"] = self.updated[:n]
+        return rows
+
+    def ages(self):
+        """
+Seconds since the last tick of every row, inf for the rows that have none
+        """
+        n = len(self.symbols)
+        updated = self.updated[:n]
+        ages = (time.monotonic_ns() - updated) / 1e9
+        ages[updated == 0] = np.inf
+        return ages
+
+    def quote(self, reqId):
+        """
+The quote of reqId as a dict with the keys the candidates used to have (Bid, Ask, Close, Open, LastUpdate...)
+        """
+        slot = self.slots[reqId]
+        quote = {key: float(getattr(self, array)[slot, column]) for (key, array, column) in QUOTE_KEYS}
+        updated = int(self.updated[slot])
+        if updated:
+            age = datetime.timedelta(microseconds=(time.monotonic_ns() - updated) // 1000)
+            quote["LastUpdate"] = datetime.datetime.now() - age
+        else:
+            quote["LastUpdate"] = 0
+        return quote
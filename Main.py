@@ -86,6 +86,10 @@ class TraderSettings():
         self.INTERVALSERVER = retrieved['server_report_interval_sec']
         self.ALLOWBUY = retrieved['algo_allow_buy']
         self.AUTORESTART = retrieved['station_autorestart']
+        # extra connections for the market data, optionally to other Gateway ports;
+        # none by default, everything then goes over the main connection
+        self.DATACONNECTIONS = int(retrieved.get('connection_data_clients', 0))
+        self.DATAPORTS = [int(p) for p in retrieved.get('connection_data_ports', [])]
 
     def set_autorestart_task(self):
         print("Autorestart setting applied- validating OS Setting")
@@ -181,7 +185,7 @@ class Algotrader:
         all_positions_value = 0
         open_positions = self.ibkrworker.app.openPositions
         open_orders = self.ibkrworker.app.openOrders
-        candidates_live=self.ibkrworker.app.candidatesLive
+        candidates_live=self.ibkrworker.app.candidates_with_quotes()
         dailyPnl = self.ibkrworker.app.dailyPnl
         tradinng_session_state = self.trading_session_state
         worker_last_execution = self.ibkrworker.last_worker_execution_time
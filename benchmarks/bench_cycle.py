@@ -0,0 +1,87 @@
+"""
+Time of a full worker cycle, IBKRWorker.run_full_cycle(), against the local
+TWS simulator of twsapi for a growing number of candidates. For every size a
+new simulator and a new worker are started, the worker gets made up
+candidates as if they came from the server and the wall time of the cycle is
+reported with the number of candidates that got their prices. The worker's
+own output is swallowed. From the repository root, with the ibapi package
+installed (twsapi/installLinux.sh):
+
+    python -m benchmarks.bench_cycle --sizes 100 1000 5000 --json cycle.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+import types
+
+from twsapi.ibapi.simulator import (TwsSimulator, symbols)
+from Logic.IBKRWorker import IBKRWorker
+
+
+DEFAULT_SIZES = (100, 1000, 5000)
+
+
+def makeSettings(port, dataConnections):
+    """ the settings read_config() makes, for a worker that does not buy """
+    return types.SimpleNamespace(PORT=port, ACCOUNT="DU1234567", USEMARGIN=True,
+                                 PROFIT=2, LOSS=-5, TRAIL=1, ALLOWBUY=False,
+                                 BULCKAMOUNT=1000, DATACONNECTIONS=dataConnections,
+                                 DATAPORTS=[])
+
+
+def makeCandidates(n):
+    """ the candidates as the server sends them """
+    return [{"ticker": symbol, "yahoo_avdropP": 1, "yahoo_avspreadP": 1,
+             "tipranks": 9, "fmp_rating": 1} for symbol in symbols(n)]
+
+
+def runCycle(n, tickRate, dataConnections):
+    simulator = TwsSimulator(positions={symbol: 100 for symbol in symbols(5)},
+                             tickRate=tickRate).start()
+    try:
+        worker = IBKRWorker(makeSettings(simulator.port, dataConnections))
+        worker.stocks_data_from_server = makeCandidates(n)
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            connected = worker.run_full_cycle()
+        seconds = time.monotonic() - start
+        quotes = worker.app.quotes.snapshot()
+        priced = int((quotes["close"] != 0).sum())
+    finally:
+        simulator.stop()
+    return {"connected": bool(connected), "seconds": seconds, "priced": priced}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="worker cycle benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="numbers of candidates")
+    parser.add_argument("--tick-rate", type=int, default=5000,
+                        help="ticks per second of every simulated connection")
+    parser.add_argument("--data-connections", type=int, default=0,
+                        help="connection_data_clients of the worker")
+    parser.add_argument("--json", help="also write the results there")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print("%-12s %10s %10s %14s" % ("candidates", "seconds", "priced", "ms/candidate"))
+    for n in args.sizes:
+        result = runCycle(n, args.tick_rate, args.data_connections)
+        results[n] = result
+        if not result["connected"]:
+            print("%-12d could not connect to the simulator" % n)
+            continue
+        print("%-12d %10.2f %10d %14.2f" % (n, result["seconds"], result["priced"],
+                                            1000 * result["seconds"] / n))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+if "__main__" == __name__:
+    main()
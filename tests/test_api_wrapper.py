@@ -0,0 +1,82 @@
+import unittest
+
+from Logic.ApiWrapper import IBapi, createContract
+from twsapi.ibapi.contract import ContractDetails
+from twsapi.ibapi.registry import NEXT_VALID_ID, POSITIONS
+
+
+class ApiWrapperTestCase(unittest.TestCase):
+    """ the callbacks of IBapi end the RequestHandles of its registry """
+
+    def setUp(self):
+        self.app = IBapi()
+        self.requests = self.app.requests
+
+
+    def test_nextValidId(self):
+        handle = self.requests.request(NEXT_VALID_ID)
+
+        self.app.nextValidId(7)
+
+        self.assertEqual(handle.result(timeout=0), 7)
+        self.assertEqual(self.app.nextorderId, 7)
+        self.assertEqual(self.requests.nextOrderId(timeout=0), 7)
+
+
+    def test_positionEnd(self):
+        handle = self.requests.request(POSITIONS)
+        contract = createContract("AAPL")
+        contract.conId = 265598
+
+        self.app.position("DU1234567", contract, 10, 120.5)
+        self.assertFalse(handle.done())
+        self.app.positionEnd()
+
+        self.assertEqual(handle.result(timeout=0),
+                         {"AAPL": {"stocks": 10, "cost": 120.5, "conId": 265598,
+                                   "HistoricalData": []}})
+
+
+    def test_contractDetailsEnd(self):
+        handle = self.requests.request()
+        details = ContractDetails()
+        details.contract = createContract("AAPL")
+        details.tradingHours = "20260101:0930-20260101:1600"
+
+        # the rows of another request are not mixed in
+        self.app.contractDetails(handle.reqId + 1, ContractDetails())
+        self.app.contractDetails(handle.reqId, details)
+        self.app.contractDetailsEnd(handle.reqId)
+
+        self.assertEqual(handle.result(timeout=0), [details])
+        self.assertEqual(self.app.trading_session, details.tradingHours)
+
+
+    def test_error(self):
+        handle = self.requests.request()
+        other = self.requests.request()
+
+        # a warning does not end the request
+        self.app.error(handle.reqId, 2104, "Market data farm connection is OK")
+        self.assertFalse(handle.done())
+        self.app.error(handle.reqId, 200, "No security definition has been found")
+
+        exc = handle.exception(timeout=0)
+        self.assertEqual((exc.reqId, exc.code, exc.msg),
+                         (handle.reqId, 200, "No security definition has been found"))
+        self.assertFalse(other.done())
+
+
+    def test_connectionClosed(self):
+        handles = [self.requests.request(), self.requests.request(POSITIONS),
+                   self.requests.request(NEXT_VALID_ID)]
+
+        self.app.connectionClosed()
+
+        for handle in handles:
+            self.assertIsInstance(handle.exception(timeout=0), ConnectionError)
+        self.assertFalse(self.requests.isPending(POSITIONS))
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import datetime
+
+from Logic.QuoteTable import (QuoteTable, QUOTE_DTYPE, ASK, BID, VOLUME)
+from twsapi.ibapi.ticktype import TickTypeEnum
+
+
+class QuoteTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = QuoteTable(capacity=2)
+
+
+    def test_slots(self):
+        table = self.table
+        self.assertEqual([table.add(reqId, "S%d" % reqId) for reqId in (10, 11, 12)], [0, 1, 2])
+
+        self.assertEqual(len(table), 3)
+        self.assertIn(11, table)
+        self.assertNotIn(13, table)
+        self.assertEqual((table.slot(12), table.slot(13)), (2, None))
+        self.assertGreaterEqual(len(table.updated), 3)
+
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.add(13, "S13"), 0)
+        self.assertEqual(table.price(13, BID), 0)
+
+
+    def test_reserve(self):
+        table = self.table
+        table.add(10, "AAPL")
+        table.setPrice(10, TickTypeEnum.ASK, 1.5)
+        prices = table.prices
+
+        table.reserve(100)
+        self.assertEqual(len(table.updated), 100)
+        self.assertIsNot(table.prices, prices)
+        self.assertEqual(table.price(10, ASK), 1.5)
+        for reqId in range(11, 110):
+            table.add(reqId, "S%d" % reqId)
+        # the ticks go to the new arrays through the new views
+        self.assertEqual(table.setPrice(109, TickTypeEnum.BID, 2.5), 99)
+        self.assertEqual(table.price(109, BID), 2.5)
+        self.assertEqual(table.price(10, ASK), 1.5)
+        # never shrinks
+        table.reserve(10)
+        self.assertEqual(len(table.updated), 100)
+
+
+    def test_ticks(self):
+        table = self.table
+        table.add(10, "AAPL")
+
+        self.assertEqual(table.setPrice(10, TickTypeEnum.BID, 1.5), 0)
+        self.assertEqual(table.setPrice(10, TickTypeEnum.DELAYED_ASK, 1.75), 0)
+        self.assertEqual(table.setSize(10, TickTypeEnum.DELAYED_VOLUME, 300), 0)
+        self.assertIsNone(table.setPrice(10, TickTypeEnum.HIGH, 2))
+        self.assertIsNone(table.setPrice(11, TickTypeEnum.BID, 2))
+        self.assertIsNone(table.setSize(11, TickTypeEnum.VOLUME, 2))
+
+        self.assertEqual((table.price(10, BID), table.price(10, ASK)), (1.5, 1.75))
+        self.assertEqual(table.sizes[0, VOLUME], 300)
+        self.assertEqual(table.setPrice(10, TickTypeEnum.DELAYED_BID, 1.25), 0)
+        self.assertEqual(table.price(10, BID), 1.25)
+        self.assertNotEqual(table.updated[0], 0)
+
+
+    def test_hasQuote(self):
+        table = self.table
+        slot = table.add(10, "AAPL")
+        for (tickType, price) in ((TickTypeEnum.BID, 1.5), (TickTypeEnum.ASK, 1.75)):
+            table.setPrice(10, tickType, price)
+            self.assertFalse(table.hasQuote(slot))
+
+        table.setPrice(10, TickTypeEnum.CLOSE, 1.6)
+        self.assertTrue(table.hasQuote(slot))
+        self.assertFalse(table.hasQuote(slot, needOpen=True))
+        table.setPrice(10, TickTypeEnum.DELAYED_OPEN, 1.55)
+        self.assertTrue(table.hasQuote(slot, needOpen=True))
+
+
+    def test_snapshot(self):
+        table = self.table
+        table.add(10, "AAPL")
+        table.add(11, "A_LONG_SYMBOL_NAME")
+        table.setPrice(11, TickTypeEnum.ASK, 2.5)
+        table.setSize(11, TickTypeEnum.BID_SIZE, 7)
+
+        rows = table.snapshot()
+        self.assertEqual(rows.dtype, QUOTE_DTYPE)
+        self.assertEqual(list(rows["reqId"]), [10, 11])
+        self.assertEqual(list(rows["symbol"]), ["AAPL", "A_LONG_SYMBOL_NAME"])
+        self.assertEqual(list(rows["ask"]), [0, 2.5])
+        self.assertEqual(list(rows["bidSize"]), [0, 7])
+        self.assertEqual(rows["updated"][0], 0)
+        self.assertNotEqual(rows["updated"][1], 0)
+
+        ages = table.ages()
+        self.assertEqual(ages[0], float("inf"))
+        self.assertLess(ages[1], 5)
+
+        # a copy, later ticks do not change it
+        table.setPrice(10, TickTypeEnum.ASK, 3)
+        self.assertEqual(rows["ask"][0], 0)
+
+
+    def test_quote(self):
+        table = self.table
+        table.add(10, "AAPL")
+        # the keys the candidates had when they were plain dicts
+        live = {"Close": 0, "Open": 0, "Bid": 0, "Ask": 0, "LastUpdate": 0}
+
+        quote = table.quote(10)
+        self.assertLessEqual(set(live), set(quote))
+        self.assertEqual({key: quote[key] for key in live}, live)
+
+        table.setPrice(10, TickTypeEnum.BID, 1.5)
+        table.setPrice(10, TickTypeEnum.CLOSE, 1.6)
+        quote = table.quote(10)
+        self.assertEqual((quote["Bid"], quote["Close"], quote["Ask"]), (1.5, 1.6, 0))
+        self.assertIsInstance(quote["Bid"], float)
+        self.assertIsInstance(quote["LastUpdate"], datetime.datetime)
+        self.assertLess(datetime.datetime.now() - quote["LastUpdate"], datetime.timedelta(seconds=5))
+
+
+if "__main__" == __name__:
+    unittest.main()
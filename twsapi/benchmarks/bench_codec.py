@@ -0,0 +1,234 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Throughput of the wire codec and of Decoder.interpret on the hot messages.
+Every benchmark runs a list of inputs through one function and reports the
+messages per second of the best of --repeat runs, and the bytes allocated at
+the peak of one call as traced by tracemalloc, averaged over a sample. The
+inputs are synthetic messages made for MAX_CLIENT_VER and, with --recorded,
+the messages of a recorder.WireRecorder capture grouped by message type.
+The decoder options are set by flags, so the numbers before and after a
+decoder change can be compared with --json. From the twsapi directory:
+
+    python -m benchmarks.bench_codec --recorded open.wire --json after.json
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from ibapi import comm
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.order import Order
+from ibapi.order_state import OrderState
+from ibapi.orderdecoder import ORDER_SUMMARY
+from ibapi.recorder import (WireReplayer, SESSION)
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.simulator import (openOrderLayout, openOrderVals, stockContract)
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+class NullWrapper(EWrapper):
+    """ ignores every callback, so that only the decoding is measured """
+
+
+def ignore(self, *args):
+    pass
+
+
+for (name, meth) in vars(EWrapper).items():
+    if callable(meth) and not name.startswith("_"):
+        setattr(NullWrapper, name, ignore)
+
+
+MSG_NAMES = {msgId: name for (name, msgId) in vars(IN).items()
+             if not name.startswith("_")}
+
+BARS_PER_MSG = 100
+
+
+def make_payload(*vals):
+    return "".join(comm.make_field(val) for val in vals).encode()
+
+
+def openOrderPayload(layout, orderId, symbol):
+    contract = stockContract(symbol, 100000 + orderId)
+    order = Order()
+    order.orderId = orderId
+    order.action = "BUY"
+    order.totalQuantity = 100
+    order.orderType = "LMT"
+    order.lmtPrice = 10.25 + orderId % 100
+    order.tif = "GTC"
+    order.account = "DU1234567"
+    order.permId = 1000000 + orderId
+    orderState = OrderState()
+    orderState.status = "Submitted"
+    return make_payload(IN.OPEN_ORDER,
+                        *openOrderVals(layout, contract, order, orderState))
+
+
+def syntheticMessages(n):
+    """ {name: [payload]} with n messages of every hot type """
+
+    layout = openOrderLayout(MAX_CLIENT_VER)
+    bar = lambda i: ("20240102 %02d:%02d:00" % (9 + i // 60, i % 60), 10.5 + i,
+                     11.25 + i, 10.25 + i, 11 + i, 1000 + i, 10.75 + i, 10 + i)
+    bars = [field for i in range(BARS_PER_MSG) for field in bar(i)]
+    return {
+        "TICK_PRICE": [make_payload(IN.TICK_PRICE, 6, i % 500,
+            (TickTypeEnum.BID, TickTypeEnum.ASK)[i % 2], 100 + i * 0.01, 300, 1)
+            for i in range(n)],
+        "TICK_SIZE": [make_payload(IN.TICK_SIZE, 6, i % 500, TickTypeEnum.BID_SIZE, 100 + i)
+            for i in range(n)],
+        "ORDER_STATUS": [make_payload(IN.ORDER_STATUS, i, "Submitted", 0, 100,
+            0, 1000000 + i, 0, 0, 1, "", 0) for i in range(n)],
+        "OPEN_ORDER": [openOrderPayload(layout, i, "S%04d" % (i % 1000))
+            for i in range(n)],
+        "HISTORICAL_DATA": [make_payload(IN.HISTORICAL_DATA, i, "20240102 09:00:00",
+            "20240102 10:40:00", BARS_PER_MSG, *bars) for i in range(n // 10 or 1)],
+        "PNL_SINGLE": [make_payload(IN.PNL_SINGLE, i, 100, 12.5 + i, 250.25, 0, 10025.5)
+            for i in range(n)],
+        "ACCOUNT_SUMMARY": [make_payload(IN.ACCOUNT_SUMMARY, 1, i, "DU1234567",
+            ("NetLiquidation", "SMA", "ExcessLiquidity")[i % 3], "100000.50", "USD")
+            for i in range(n)],
+    }
+
+
+def recordedMessages(path):
+    """ (serverVersion, {name: [payload]}, [payload]) of a wire recording,
+    the last list has all the messages in the order they were received """
+
+    serverVersion = MAX_CLIENT_VER
+    byName = {}
+    payloads = []
+    with WireReplayer(path) as replayer:
+        for (_, kind, payload) in replayer.records():
+            if kind == SESSION:
+                serverVersion = int(comm.read_fields(payload)[0])
+                continue
+            msgId = int(payload[:payload.index(b"\0")])
+            byName.setdefault(MSG_NAMES.get(msgId, str(msgId)), []).append(payload)
+            payloads.append(payload)
+    return (serverVersion, byName, payloads)
+
+
+def measure(fn, inputs, repeat, sampleSize=100):
+    """ (calls per second, peak bytes allocated per call) of fn on inputs """
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    sample = inputs[:sampleSize]
+    tracemalloc.start()
+    try:
+        total = 0
+        for item in sample:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(item)
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return (len(inputs) / best if best else float("inf"), total / len(sample))
+
+
+def makeDecoder(serverVersion, args):
+    decoder = Decoder(NullWrapper(), serverVersion)
+    decoder.compactObjects = args.compact
+    decoder.rawTickAttribs = args.raw_tick_attribs
+    decoder.historicalBatch = args.historical_batch
+    decoder.orderProjection = ORDER_SUMMARY if args.order_summary else None
+    decoder.compile()
+    return decoder
+
+
+def codecBenchmarks(messages):
+    payloads = [payload for name in sorted(messages) for payload in messages[name]]
+    texts = [payload.decode() for payload in payloads]
+    framed = [comm.make_msg(text) for text in texts]
+    values = [value for i in range(len(payloads))
+              for value in (i, i * 0.25, "SMART", True)]
+    return [
+        ("make_field", comm.make_field, values),
+        ("make_msg", comm.make_msg, texts),
+        ("read_msg", comm.read_msg, framed),
+        ("read_fields", comm.read_fields, payloads),
+        ("read_fields_lazy", comm.read_fields_lazy, payloads),
+    ]
+
+
+def decoderBenchmarks(decoder, messages, prefix, lazy):
+    benchmarks = []
+    for (name, payloads) in sorted(messages.items()):
+        if lazy:
+            # a LazyFields keeps what it has split, so it is made in the loop
+            benchmarks.append(("%sinterpret lazy %s" % (prefix, name),
+                lambda payload: decoder.interpret(comm.read_fields_lazy(payload)),
+                payloads))
+        else:
+            benchmarks.append(("%sinterpret %s" % (prefix, name), decoder.interpret,
+                               [comm.read_fields(payload) for payload in payloads]))
+    return benchmarks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="wire codec benchmarks")
+    parser.add_argument("--number", type=int, default=2000,
+                        help="synthetic messages of every type")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--recorded", action="append", default=[],
+                        help="a wire recording to benchmark too")
+    parser.add_argument("--filter", default="",
+                        help="only run the benchmarks whose name contains it")
+    parser.add_argument("--lazy", action="store_true",
+                        help="interpret comm.LazyFields, their making included")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--raw-tick-attribs", action="store_true")
+    parser.add_argument("--historical-batch", action="store_true")
+    parser.add_argument("--order-summary", action="store_true")
+    parser.add_argument("--json", help="also write the results there")
+    args = parser.parse_args(argv)
+
+    readFields = comm.read_fields_lazy if args.lazy else comm.read_fields
+    messages = syntheticMessages(args.number)
+    benchmarks = codecBenchmarks(messages)
+    benchmarks += decoderBenchmarks(makeDecoder(MAX_CLIENT_VER, args), messages,
+                                    "", args.lazy)
+    for path in args.recorded:
+        (serverVersion, byName, payloads) = recordedMessages(path)
+        decoder = makeDecoder(serverVersion, args)
+        benchmarks += decoderBenchmarks(decoder, byName, path + ": ", args.lazy)
+        benchmarks.append(("%s: replay" % path,
+                           lambda payload: decoder.interpret(readFields(payload)),
+                           payloads))
+
+    results = {}
+    print("%-40s %12s %14s" % ("benchmark", "msgs/s", "alloc B/msg"))
+    for (name, fn, inputs) in benchmarks:
+        if args.filter not in name or not inputs:
+            continue
+        (rate, allocated) = measure(fn, inputs, args.repeat)
+        results[name] = {"msgsPerSec": rate, "allocBytesPerMsg": allocated}
+        print("%-40s %12.0f %14.0f" % (name, rate, allocated))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+if "__main__" == __name__:
+    main()
@@ -0,0 +1,313 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+asyncio flavour of the EClient.
+The socket is driven by the event loop: inbound bytes are framed in place and
+decoded on the loop thread, so there is neither a reader thread nor a message
+queue. The usual request methods still work (they just write to the transport)
+and the most common request/end pairs are also offered as awaitables, eg:
+
+    positions = await app.reqPositionsAsync()
+"""
+
+import asyncio
+import logging
+
+from ibapi import (decoder, comm)
+from ibapi.client import EClient
+from ibapi.connection import Connection
+from ibapi.common import NO_VALID_ID
+from ibapi.errors import CONNECT_FAIL
+from ibapi.server_versions import MIN_CLIENT_VER, MAX_CLIENT_VER
+from ibapi.utils import RequestError
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncConnection:
+    """ the interface of Connection over a transport, everything EClient
+    uses on its conn. The protocol does the reading, so the read side of
+    the interface never has data """
+
+    eventDriven = False
+    recvSize = Connection.DEFAULT_RECV_SIZE
+    # the transport buffers the writes itself, nothing is coalesced here
+    coalesceSize = 0
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.wrapper = None
+
+    def connect(self):
+        raise RuntimeError("an AsyncConnection is connected by AsyncEClient.connectAsync()")
+
+    def isConnected(self):
+        return self.transport is not None
+
+    def sendMsg(self, msg):
+        if self.transport is None:
+            logger.debug("sendMsg attempted while not connected")
+            return 0
+        self.transport.write(msg)
+        return len(msg)
+
+    def flush(self):
+        # the event loop writes the transport's buffer as soon as it can
+        return 0
+
+    def disconnect(self):
+        if self.transport is not None:
+            logger.debug("disconnecting")
+            self.transport.close()
+            self.transport = None
+
+    def recvMsg(self):
+        return b""
+
+    def recvMsgInto(self, framer):
+        return 0
+
+
+class EClientProtocol(asyncio.BufferedProtocol):
+    """ frames the inbound stream straight in the framer's buffer and hands
+    every payload to the client """
+
+    def __init__(self, client, bufSize=comm.MsgFramer.DEFAULT_SIZE):
+        self.client = client
+        self.framer = comm.MsgFramer(bufSize)
+        self.recorder = None
+
+    def get_buffer(self, sizehint):
+        return self.framer.writable(max(sizehint, 4096))
+
+    def buffer_updated(self, nbytes):
+        self.framer.commit(nbytes)
+        msgs = [bytes(msg) for msg in self.framer.frames()]
+        if self.recorder is not None:
+            self.recorder.record(msgs)
+        for msg in msgs:
+            self.client.msgReceived(self.client.readFields(msg))
+
+    def connection_lost(self, exc):
+        logger.debug("connection lost %s", exc)
+        if self.recorder is not None:
+            self.recorder.close()
+        self.client.connectionLost(self)
+
+
+class AwaitingWrapper:
+    """ Sits between the decoder and the user's wrapper: every callback is
+    forwarded and the ones that belong to an awaited request also feed the
+    pending future. """
+
+    def __init__(self, client, wrapper):
+        self.client = client
+        self.wrapper = wrapper
+
+    def __getattr__(self, name):
+        return getattr(self.wrapper, name)
+
+    def position(self, account, contract, position, avgCost):
+        self.client.addResult("positions", None, (account, contract, position, avgCost))
+        self.wrapper.position(account, contract, position, avgCost)
+
+    def positionEnd(self):
+        self.client.endRequest("positions", None)
+        self.wrapper.positionEnd()
+
+    def openOrder(self, orderId, contract, order, orderState):
+        self.client.addResult("openOrders", None, (orderId, contract, order, orderState))
+        self.wrapper.openOrder(orderId, contract, order, orderState)
+
+    def openOrderEnd(self):
+        self.client.endRequest("openOrders", None)
+        self.wrapper.openOrderEnd()
+
+    def execDetails(self, reqId, contract, execution):
+        self.client.addResult("executions", reqId, (contract, execution))
+        self.wrapper.execDetails(reqId, contract, execution)
+
+    def execDetailsEnd(self, reqId):
+        self.client.endRequest("executions", reqId)
+        self.wrapper.execDetailsEnd(reqId)
+
+    def contractDetails(self, reqId, contractDetails):
+        self.client.addResult("contractDetails", reqId, contractDetails)
+        self.wrapper.contractDetails(reqId, contractDetails)
+
+    def bondContractDetails(self, reqId, contractDetails):
+        self.client.addResult("contractDetails", reqId, contractDetails)
+        self.wrapper.bondContractDetails(reqId, contractDetails)
+
+    def contractDetailsEnd(self, reqId):
+        self.client.endRequest("contractDetails", reqId)
+        self.wrapper.contractDetailsEnd(reqId)
+
+    def error(self, reqId, errorCode, errorString):
+        self.client.failRequest(reqId, RequestError(reqId, errorCode, errorString))
+        self.wrapper.error(reqId, errorCode, errorString)
+
+
+class AsyncEClient(EClient):
+    """ EClient whose socket is served by an asyncio event loop. Use
+    connectAsync() instead of connect() and do not call run(). """
+
+    def __init__(self, wrapper):
+        EClient.__init__(self, AwaitingWrapper(self, wrapper))
+        self.pending = {}
+        self.handshake = None
+        self.protocol = None
+
+    async def connectAsync(self, host, port, clientId):
+        """Same as connect() but the socket is served by the running event
+        loop. Returns once the server version is known and startApi was
+        sent."""
+
+        loop = asyncio.get_running_loop()
+        self.host = host
+        self.port = port
+        self.clientId = clientId
+        logger.debug("Connecting to %s:%d w/ id:%d", self.host, self.port, self.clientId)
+
+        try:
+            (transport, self.protocol) = await loop.create_connection(
+                lambda: EClientProtocol(self), self.host, self.port)
+        except OSError:
+            self.wrapper.error(NO_VALID_ID, CONNECT_FAIL.code(), CONNECT_FAIL.msg())
+            logger.info("could not connect")
+            return
+
+        self.conn = AsyncConnection(transport)
+        self.decoder = decoder.Decoder(self.wrapper, self.serverVersion())
+        self.decoder.rawTickAttribs = self.rawTickAttribs
+        self.decoder.compactObjects = self.compactObjects
+        self.decoder.historicalBatch = self.historicalBatch
+        self.decoder.historicalTicksBatch = self.historicalTicksBatch
+        self.decoder.orderProjection = self.orderProjection
+        self.handshake = loop.create_future()
+        self.setConnState(EClient.CONNECTING)
+
+        v100prefix = "API\0"
+        v100version = "v%d..%d" % (MIN_CLIENT_VER, MAX_CLIENT_VER)
+        if self.connectionOptions:
+            v100version = v100version + " " + self.connectionOptions
+        self.conn.sendMsg(str.encode(v100prefix, 'ascii') + comm.make_msg(v100version))
+
+        (server_version, conn_time) = await self.handshake
+        logger.debug("ANSWER Version:%d time:%s", server_version, conn_time)
+        self.connTime = conn_time
+        self.serverVersion_ = server_version
+        self.decoder.serverVersion = self.serverVersion()
+        self.protocol.recorder = self.makeRecorder()
+
+        self.setConnState(EClient.CONNECTED)
+        self.startApi()
+        self.wrapper.connectAck()
+
+    def msgReceived(self, fields):
+        """ called on the loop thread for every inbound message """
+
+        if self.connState == EClient.CONNECTING:
+            #sometimes I get news before the server version
+            if len(fields) == 2:
+                if not self.handshake.done():
+                    self.handshake.set_result((int(fields[0]), fields[1]))
+                return
+        self.decoder.interpret(fields)
+
+    def connectionLost(self, protocol):
+        if protocol is not self.protocol:
+            return
+        self.protocol = None
+        if self.handshake is not None and not self.handshake.done():
+            self.handshake.set_exception(ConnectionError("connection lost during handshake"))
+        if self.conn is not None:
+            self.disconnect()
+
+    def disconnect(self):
+        EClient.disconnect(self)
+        pending = self.pending
+        self.pending = {}
+        for (future, _) in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("disconnected"))
+
+    def run(self):
+        raise RuntimeError("AsyncEClient is driven by the event loop; do not call run()")
+
+    ######################################################################
+
+    def startRequest(self, kind, key):
+        """ returns the future of the pending kind/key request and True if
+        it was created by this call """
+        entry = self.pending.get((kind, key))
+        if entry is not None:
+            return (entry[0], False)
+        future = asyncio.get_running_loop().create_future()
+        if not self.isConnected():
+            future.set_exception(ConnectionError("not connected"))
+            return (future, False)
+        self.pending[(kind, key)] = (future, [])
+        return (future, True)
+
+    def addResult(self, kind, key, result):
+        entry = self.pending.get((kind, key))
+        if entry is not None:
+            entry[1].append(result)
+
+    def endRequest(self, kind, key):
+        entry = self.pending.pop((kind, key), None)
+        if entry is not None and not entry[0].done():
+            entry[0].set_result(entry[1])
+
+    def failRequest(self, reqId, exc):
+        if reqId == NO_VALID_ID:
+            return
+        # every kind of request made with this reqId
+        for pendingKey in [pendingKey for pendingKey in self.pending if pendingKey[1] == reqId]:
+            (future, _) = self.pending.pop(pendingKey)
+            if not future.done():
+                future.set_exception(exc)
+
+    def reqPositionsAsync(self):
+        """Awaitable reqPositions(), resolves to a list of
+        (account, contract, position, avgCost) on positionEnd. Concurrent
+        calls share the same request."""
+
+        (future, created) = self.startRequest("positions", None)
+        if created:
+            self.reqPositions()
+        return future
+
+    def reqAllOpenOrdersAsync(self):
+        """Awaitable reqAllOpenOrders(), resolves to a list of
+        (orderId, contract, order, orderState) on openOrderEnd."""
+
+        (future, created) = self.startRequest("openOrders", None)
+        if created:
+            self.reqAllOpenOrders()
+        return future
+
+    def reqExecutionsAsync(self, reqId, execFilter):
+        """Awaitable reqExecutions(), resolves to a list of
+        (contract, execution) on execDetailsEnd."""
+
+        (future, created) = self.startRequest("executions", reqId)
+        if created:
+            self.reqExecutions(reqId, execFilter)
+        return future
+
+    def reqContractDetailsAsync(self, reqId, contract):
+        """Awaitable reqContractDetails(), resolves to a list of
+        ContractDetails on contractDetailsEnd or fails with RequestError
+        if TWS answers with an error for reqId."""
+
+        (future, created) = self.startRequest("contractDetails", reqId)
+        if created:
+            self.reqContractDetails(reqId, contract)
+        return future
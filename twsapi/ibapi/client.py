@@ -17,8 +17,12 @@ import logging
 import queue
 import socket
 
-from ibapi import (decoder, reader, comm)
+from ibapi import (decoder, reader, comm, utils, columnar, recorder)
+from ibapi.conflation import ConflatingQueue
 from ibapi.connection import Connection
+from ibapi.encoder import ContractEncoder
+from ibapi.orderdecoder import ORDER_SUMMARY
+from ibapi.pacing import (Pacer, msgPriority, ORDER_PRIORITY)
 from ibapi.message import OUT
 from ibapi.common import * # @UnusedWildImport
 from ibapi.contract import Contract
@@ -38,6 +42,7 @@ logger = logging.getLogger(__name__)
 
 class EClient(object):
     (DISCONNECTED, CONNECTING, CONNECTED, REDIRECT) = range(4)
+    (QUEUE_DISPATCH, INLINE_DISPATCH, BATCH_DISPATCH) = range(3)
 
     #TODO: support redirect !!
 
@@ -45,6 +50,25 @@ class EClient(object):
         self.msg_queue = queue.Queue()
         self.wrapper = wrapper
         self.decoder = None
+        self.framerBufSize = 0
+        self.recvSize = Connection.DEFAULT_RECV_SIZE
+        self.eventDriven = False
+        self.dispatchMode = EClient.QUEUE_DISPATCH
+        self.rawTickAttribs = False
+        self.compactObjects = False
+        self.historicalBatch = False
+        self.historicalTicksBatch = False
+        self.orderProjection = None
+        self.lazyFields = False
+        self.coalesceSize = 0
+        self.coalesceDelay = 0.005
+        self.conflateTicks = False
+        self.queueLimit = 0
+        self.pacingRate = 0
+        self.pacingBurst = Pacer.DEFAULT_BURST
+        self.recordPath = None
+        self.contractEncoder = ContractEncoder()
+        self.resetMsgLoopStats()
         self.reset()
 
 
@@ -61,6 +85,7 @@ class EClient(object):
         self.optCapab = ""
         self.asynchronous = False
         self.reader = None
+        self.pacer = None
         self.decode = None
         self.setConnState(EClient.DISCONNECTED)
         self.connectionOptions = None
@@ -69,13 +94,21 @@ class EClient(object):
     def setConnState(self, connState):
         _connState = self.connState
         self.connState = connState
-        logger.debug("%s connState: %s -> %s" % (id(self), _connState,
-                                                 self.connState))
+        logger.debug("%s connState: %s -> %s", id(self), _connState,
+                     self.connState)
 
     def sendMsg(self, msg):
         full_msg = comm.make_msg(msg)
-        logger.info("%s %s %s", "SENDING", current_fn_name(1), full_msg)
-        self.conn.sendMsg(full_msg)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s %s %s", "SENDING", current_fn_name(1), full_msg)
+        priority = msgPriority(msg)
+        if self.pacer is not None:
+            self.pacer.sendMsg(full_msg, priority)
+        else:
+            self.conn.sendMsg(full_msg)
+            if priority == ORDER_PRIORITY and self.conn.coalesceSize:
+                # orders do not wait for the coalescing delay
+                self.conn.flush()
 
 
     def logRequest(self, fnName, fnParams):
@@ -138,9 +171,16 @@ class EClient(object):
             self.clientId = clientId
             logger.debug("Connecting to %s:%d w/ id:%d", self.host, self.port, self.clientId)
 
-            self.conn = Connection(self.host, self.port)
+            self.conn = Connection(self.host, self.port, self.recvSize,
+                                   self.eventDriven, self.coalesceSize,
+                                   self.coalesceDelay)
 
             self.conn.connect()
+            if self.pacingRate:
+                self.pacer = Pacer(self.conn.sendMsg, self.pacingRate,
+                                   self.pacingBurst,
+                                   self.conn.flush if self.coalesceSize else None,
+                                   self.conn.disconnect)
             self.setConnState(EClient.CONNECTING)
 
             #TODO: support async mode
@@ -157,8 +197,14 @@ class EClient(object):
             msg2 = str.encode(v100prefix, 'ascii') + msg
             logger.debug("REQUEST %s", msg2)
             self.conn.sendMsg(msg2)
+            self.flush()
 
             self.decoder = decoder.Decoder(self.wrapper, self.serverVersion())
+            self.decoder.rawTickAttribs = self.rawTickAttribs
+            self.decoder.compactObjects = self.compactObjects
+            self.decoder.historicalBatch = self.historicalBatch
+            self.decoder.historicalTicksBatch = self.historicalTicksBatch
+            self.decoder.orderProjection = self.orderProjection
             fields = []
 
             #sometimes I get news before the server version, thus the loop
@@ -189,7 +235,15 @@ class EClient(object):
 
             self.setConnState(EClient.CONNECTED)
 
-            self.reader = reader.EReader(self.conn, self.msg_queue)
+            framer = comm.MsgFramer(self.framerBufSize) if self.framerBufSize else None
+            dispatch = self.dispatchMsg if self.dispatchMode == EClient.INLINE_DISPATCH else None
+            if self.conflateTicks:
+                self.msg_queue = ConflatingQueue(self.queueLimit)
+            elif type(self.msg_queue) is not queue.Queue:
+                self.msg_queue = queue.Queue()
+            self.reader = reader.EReader(self.conn, self.msg_queue, framer, dispatch,
+                                         self.dispatchMode == EClient.BATCH_DISPATCH,
+                                         self.makeRecorder())
             self.reader.start()   # start thread
             logger.info("sent startApi")
             self.startApi()
@@ -206,10 +260,27 @@ class EClient(object):
         Calling this function does not cancel orders that have already been
         sent."""
 
+        pacer = self.pacer
+        if pacer is not None and self.isConnected():
+            # the messages waiting for the pace, orders first, go out before
+            # the socket is closed. The pacing thread sends them; when this
+            # is called from the message loop (run(), or the reader thread
+            # in INLINE_DISPATCH mode) no incoming message is handled meanwhile
+            if not pacer.drain(Pacer.DRAIN_TIMEOUT):
+                logger.warning("disconnecting with %d paced messages not sent",
+                               pacer.pending())
+
         self.setConnState(EClient.DISCONNECTED)
-        if self.conn is not None:
+        # run() also disconnects when it ends, possibly at the same time
+        (conn, pacer) = (self.conn, self.pacer)
+        if conn is not None:
             logger.info("disconnecting")
-            self.conn.disconnect()
+            if pacer is not None:
+                pacer.stop()
+            conn.disconnect()
+            if conn.eventDriven:
+                # run() blocks on the queue without a timeout, wake it up
+                self.msg_queue.put(b"")
             self.wrapper.connectionClosed()
             self.reset()
 
@@ -218,8 +289,9 @@ class EClient(object):
         """Call this function to check if there is a connection with TWS"""
 
         connConnected = self.conn and self.conn.isConnected()
-        logger.debug("%s isConn: %s, connConnected: %s" % (id(self),
-            self.connState, str(connConnected)))
+        if utils.TRACE:
+            logger.debug("%s isConn: %s, connConnected: %s", id(self),
+                         self.connState, connConnected)
         return EClient.CONNECTED == self.connState and connConnected
 
     def keyboardInterrupt(self):
@@ -234,6 +306,141 @@ class EClient(object):
     def setConnectionOptions(self, opts):
         self.connectionOptions = opts
 
+    def setFramerBufSize(self, bufSize:int):
+        """Frames the inbound stream in a preallocated buffer of bufSize
+        bytes instead of concatenating and re-slicing bytes objects. Takes
+        effect on the next connect(); 0 restores the default framing."""
+        self.framerBufSize = bufSize
+
+    def setRecvSize(self, recvSize:int):
+        """Sets how many bytes a single socket read may return when the
+        inbound stream is framed in place (see setFramerBufSize)."""
+        self.recvSize = recvSize
+
+    def setEventDriven(self, eventDriven:bool):
+        """In event driven mode the reader blocks in a selector instead of
+        polling the socket every second and run() blocks on the queue
+        without a timeout, so both wake up as soon as data arrives or the
+        connection is closed. msgLoopTmo() is never called in this mode.
+        Takes effect on the next connect()."""
+        self.eventDriven = eventDriven
+
+    def setDispatchMode(self, dispatchMode):
+        """QUEUE_DISPATCH (default): the reader thread queues every frame and
+        run() decodes it.
+        INLINE_DISPATCH: the reader thread decodes and calls the wrapper
+        itself, there is no queue hop; run() only waits for the reader to
+        finish. The wrapper callbacks then run on the reader thread.
+        BATCH_DISPATCH: like QUEUE_DISPATCH but all the frames of one socket
+        read are queued as a single list.
+        Takes effect on the next connect()."""
+        self.dispatchMode = dispatchMode
+
+    def setRawTickAttribs(self, rawTickAttribs:bool):
+        """With rawTickAttribs tickPrice receives the attribute bit mask as
+        an int (1: canAutoExecute, 2: pastLimit, 4: preOpen) instead of a
+        TickAttrib object allocated for every tick. Takes effect on the next
+        connect()."""
+        self.rawTickAttribs = rawTickAttribs
+
+    def setCompactObjects(self, compactObjects:bool):
+        """With compactObjects the decoder builds the __slots__ based
+        variants of ibapi.compact for contracts, orders, executions, bars,
+        ticks and tick attributes. They have the same attributes but take
+        a fraction of the memory; no other attribute can be added to them.
+        Takes effect on the next connect()."""
+        self.compactObjects = compactObjects
+
+    def setHistoricalBatch(self, historicalBatch:bool):
+        """With historicalBatch the bars of a historical data answer are
+        decoded into numpy arrays and delivered by a single
+        historicalDataBatch() call instead of one historicalData() call per
+        bar. historicalDataUpdate() is not affected. Requires numpy. Takes
+        effect on the next connect()."""
+        if historicalBatch:
+            columnar.requireNumpy("setHistoricalBatch")
+        self.historicalBatch = historicalBatch
+
+    def setHistoricalTicksBatch(self, historicalTicksBatch:bool):
+        """With historicalTicksBatch every page of historical ticks is
+        decoded into a numpy structured array and delivered by
+        historicalTicksBatch(), historicalTicksBidAskBatch() or
+        historicalTicksLastBatch() instead of a list of HistoricalTick*
+        objects. Requires numpy. Takes effect on the next connect()."""
+        if historicalTicksBatch:
+            columnar.requireNumpy("setHistoricalTicksBatch")
+        self.historicalTicksBatch = historicalTicksBatch
+
+    def setOrderSummary(self, orderSummary:bool, projection=ORDER_SUMMARY):
+        """With orderSummary openOrder() and completedOrder() only get the
+        contract, order and order state attributes named by projection
+        (by default the identity, side, type, prices and status of the
+        order), the other fields of the message are skipped and those
+        attributes keep their default value. Takes effect on the next
+        connect()."""
+        self.orderProjection = frozenset(projection) if orderSummary else None
+
+    def setLazyFields(self, lazyFields:bool):
+        """With lazyFields the message loop hands the decoder a
+        comm.LazyFields view instead of splitting every payload, so the
+        fields of a message are only built when a handler reads them."""
+        self.lazyFields = lazyFields
+
+    def setCoalescing(self, coalesceSize:int, coalesceDelay:float=0.005):
+        """Gathers outbound messages and writes them with a single sendall
+        once coalesceSize bytes are pending or coalesceDelay seconds after
+        the first one, whichever comes first. Call flush() to write them
+        right away. Takes effect on the next connect(); 0 sends every
+        message as it is made."""
+        self.coalesceSize = coalesceSize
+        self.coalesceDelay = coalesceDelay
+
+    def setConflation(self, conflateTicks:bool, queueLimit:int=0):
+        """With conflateTicks the message loop reads from a
+        conflation.ConflatingQueue: a tick price, size, generic or string
+        still queued is replaced by a newer one of the same reqId and tick
+        type, the other messages are always kept. More than queueLimit
+        queued messages are counted in msg_queue.stats() as overflows, 0
+        counts none. No effect in INLINE_DISPATCH mode, which has no queue.
+        Takes effect on the next connect()."""
+        self.conflateTicks = conflateTicks
+        self.queueLimit = queueLimit
+
+    def setPacing(self, rate:int=Pacer.DEFAULT_RATE, burst:int=Pacer.DEFAULT_BURST):
+        """Paces the outbound messages with a token bucket of burst tokens
+        refilled at rate tokens per second, so the TWS limit of 50 messages
+        per second is never exceeded and requests can be made back to back
+        without sleeping. Messages over the pace are queued and sent by a
+        pacing thread, orders and order cancellations first. Takes effect on
+        the next connect(); a rate of 0 sends every message right away."""
+        self.pacingRate = rate
+        self.pacingBurst = burst
+
+    def setWireRecording(self, path):
+        """Appends every inbound message, with the time it was received at,
+        to the file at path, see recorder.WireReplayer to play it back.
+        Takes effect on the next connect(); None stops recording."""
+        self.recordPath = path
+
+    def makeRecorder(self):
+        if self.recordPath is None:
+            return None
+        wireRecorder = recorder.WireRecorder(self.recordPath)
+        wireRecorder.startSession(self.serverVersion(), self.connTime)
+        return wireRecorder
+
+    def flush(self):
+        """Writes the messages gathered by the coalescing layer now. It does
+        not wait for the messages held by the pacing, they are written as
+        the pace allows."""
+        if self.conn is not None and self.conn.isConnected():
+            self.conn.flush()
+
+    def readFields(self, text):
+        if self.lazyFields:
+            return comm.read_fields_lazy(text)
+        return comm.read_fields(text)
+
     def msgLoopTmo( self ):
         #intended to be overloaded
         pass
@@ -242,36 +449,112 @@ class EClient(object):
         #intended to be overloaded
         pass
 
+    def processMsg(self, text):
+        """Decodes one frame and calls the wrapper. Returns False if the
+        frame is too long, the message loop stops then."""
+
+        if len(text) > MAX_MSG_LEN:
+            self.wrapper.error(NO_VALID_ID, BAD_LENGTH.code(),
+                "%s:%d:%s" % (BAD_LENGTH.msg(), len(text), text))
+            return False
+        if not text:
+            # wake-up after disconnect in event driven mode
+            return True
+        try:
+            fields = self.readFields(text)
+            if utils.TRACE:
+                logger.debug("fields %s", fields)
+            self.decoder.interpret(fields)
+            self.msgLoopRec()
+        except BadMessage:
+            logger.info("BadMessage")
+        return True
+
+    def dispatchMsg(self, text):
+        """Runs on the reader thread in INLINE_DISPATCH mode."""
+
+        if not self.processMsg(text):
+            self.disconnect()
+
     def run(self):
         """This is the function that has the message loop."""
 
+        if self.dispatchMode == EClient.INLINE_DISPATCH:
+            self.waitForReader()
+            return
+
         try:
             while self.isConnected() or not self.msg_queue.empty():
                 try:
                     try:
-                        text = self.msg_queue.get(block=True, timeout=0.2)
-                        if len(text) > MAX_MSG_LEN:
-                            self.wrapper.error(NO_VALID_ID, BAD_LENGTH.code(),
-                                "%s:%d:%s" % (BAD_LENGTH.msg(), len(text), text))
-                            break
+                        text = self.msg_queue.get(block=True,
+                            timeout=None if self.eventDriven else 0.2)
                     except queue.Empty:
                         logger.debug("queue.get: empty")
                         self.msgLoopTmo()
                     else:
-                        fields = comm.read_fields(text)
-                        logger.debug("fields %s", fields)
-                        self.decoder.interpret(fields)
-                        self.msgLoopRec()
+                        if not self.drainMsgQueue(text):
+                            break
                 except (KeyboardInterrupt, SystemExit):
                     logger.info("detected KeyboardInterrupt, SystemExit")
                     self.keyboardInterrupt()
                     self.keyboardInterruptHard()
-                except BadMessage:
-                    logger.info("BadMessage")
 
-                logger.debug("conn:%d queue.sz:%d",
-                             self.isConnected(),
-                             self.msg_queue.qsize())
+                if utils.TRACE:
+                    logger.debug("conn:%d queue.sz:%d",
+                                 self.isConnected(),
+                                 self.msg_queue.qsize())
+        finally:
+            self.disconnect()
+
+    def drainMsgQueue(self, text):
+        """Decodes text and then everything already queued behind it,
+        back to back, without going through the loop bookkeeping again.
+        Returns False if the message loop has to stop."""
+
+        nMsgs = 0
+        try:
+            while True:
+                for msg in (text if type(text) is list else (text,)):
+                    nMsgs += 1
+                    if not self.processMsg(msg):
+                        return False
+                text = self.msg_queue.get_nowait()
+        except queue.Empty:
+            return True
+        finally:
+            self.msgLoopWakeups += 1
+            self.msgLoopMsgs += nMsgs
+            if nMsgs > self.msgLoopMaxMsgs:
+                self.msgLoopMaxMsgs = nMsgs
+
+    def resetMsgLoopStats(self):
+        self.msgLoopWakeups = 0     # times run() woke up with messages
+        self.msgLoopMsgs = 0        # messages decoded by run()
+        self.msgLoopMaxMsgs = 0     # most messages decoded in one wake-up
+
+    def msgsPerWake(self):
+        """Average number of messages run() decoded per wake-up."""
+
+        if self.msgLoopWakeups == 0:
+            return 0.
+        return self.msgLoopMsgs / self.msgLoopWakeups
+
+    def waitForReader(self):
+        """The message loop of INLINE_DISPATCH mode: the reader thread does
+        the work, this just waits for it to end."""
+
+        reader = self.reader
+        try:
+            while reader is not None and reader.is_alive():
+                try:
+                    reader.join(None if self.eventDriven else 0.2)
+                    if reader.is_alive():
+                        self.msgLoopTmo()
+                except (KeyboardInterrupt, SystemExit):
+                    logger.info("detected KeyboardInterrupt, SystemExit")
+                    self.keyboardInterrupt()
+                    self.keyboardInterruptHard()
         finally:
             self.disconnect()
 
@@ -395,22 +678,7 @@ class EClient(object):
                 make_field(reqId)]
     
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_REQ_MKT_DATA_CONID:
-                flds += [make_field(contract.conId),]
-    
-            flds += [make_field(contract.symbol),
-                make_field(contract.secType),
-                make_field(contract.lastTradeDateOrContractMonth),
-                make_field(contract.strike),
-                make_field(contract.right),
-                make_field(contract.multiplier), # srv v15 and above
-                make_field(contract.exchange),
-                make_field(contract.primaryExchange), # srv v14 and above
-                make_field(contract.currency),
-                make_field(contract.localSymbol) ] # srv v2 and above
-    
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds += [make_field(contract.tradingClass),]
+            flds.append(self.contractEncoder.mktDataFields(contract, self.serverVersion()))
     
             # Send combo legs for BAG requests (srv v8 and above)
             if contract.secType == "BAG":
@@ -1113,24 +1381,7 @@ class EClient(object):
             flds += [make_field(orderId)]
     
             # send contract fields
-            if self.serverVersion() >= MIN_SERVER_VER_PLACE_ORDER_CONID:
-                flds.append(make_field( contract.conId))
-            flds += [make_field( contract.symbol),
-                make_field( contract.secType),
-                make_field( contract.lastTradeDateOrContractMonth),
-                make_field( contract.strike),
-                make_field( contract.right),
-                make_field( contract.multiplier), # srv v15 and above
-                make_field( contract.exchange),
-                make_field( contract.primaryExchange), # srv v14 and above
-                make_field( contract.currency),
-                make_field( contract.localSymbol)] # srv v2 and above
-            if self.serverVersion() >= MIN_SERVER_VER_TRADING_CLASS:
-                flds.append(make_field( contract.tradingClass))
-    
-            if self.serverVersion() >= MIN_SERVER_VER_SEC_ID_TYPE:
-                flds += [make_field( contract.secIdType),
-                    make_field( contract.secId)]
+            flds.append(self.contractEncoder.placeOrderFields(contract, self.serverVersion()))
     
             # send main order fields
             flds.append(make_field( order.action))
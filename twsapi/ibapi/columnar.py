@@ -0,0 +1,127 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Columnar decoding of the messages that carry many records at once.
+The repeated fields of such a message are laid out as a 2d array of byte
+strings and every column is converted in one go by numpy, so a message of
+N records costs a handful of array operations instead of N objects.
+Records come out either as one array per attribute (HistoricalBars) or as a
+structured array with one named field per attribute (the historical ticks).
+numpy is an optional dependency, only needed by these decoders.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ibapi.object_implem import Object
+from ibapi.utils import BadMessage
+
+
+def requireNumpy(feature):
+    if numpy is None:
+        raise ImportError("%s requires numpy, pip install numpy" % feature)
+
+
+class HistoricalBars(Object):
+    """ the bars of a HISTORICAL_DATA message, one array per BarData
+    attribute """
+
+    def __init__(self, date, open_, high, low, close, volume, average, barCount):
+        self.date = date
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.average = average
+        self.barCount = barCount
+
+    def __len__(self):
+        return len(self.date)
+
+    def __str__(self):
+        return "HistoricalBars: %d bars" % len(self)
+
+
+def recordTable(fields, first, nRecords, width):
+    """ fields[first:] as nRecords rows of width byte strings """
+
+    end = first + nRecords * width
+    if nRecords < 0:
+        raise BadMessage("no more fields")
+    try:
+        fields[end - 1]
+    except IndexError:
+        raise BadMessage("no more fields")
+    return numpy.array(fields[first:end], dtype=bytes).reshape(nRecords, width)
+
+
+def column(table, idx, dtype):
+    """ converts a column of byte strings, empty ones count as 0 like
+    decode() does """
+
+    col = table[:, idx]
+    empty = col == b""
+    if empty.any():
+        col = numpy.where(empty, b"0", col)
+    try:
+        return col.astype(dtype)
+    except ValueError as ex:
+        raise BadMessage("bad column %d: %s" % (idx, ex))
+
+
+def decodeRecords(fields, first, nRecords, columns):
+    """ the nRecords records starting at fields[first] as a structured
+    array. columns gives the (name, dtype) of every field of a record, the
+    fields named None are skipped and the str ones keep their widest
+    value's width. """
+
+    table = recordTable(fields, first, nRecords, len(columns))
+    arrays = []
+    for (idx, (name, dtype)) in enumerate(columns):
+        if name is not None:
+            if dtype is str:
+                arrays.append((name, table[:, idx].astype(str)))
+            else:
+                arrays.append((name, column(table, idx, dtype)))
+
+    records = numpy.empty(nRecords, [(name, array.dtype) for (name, array) in arrays])
+    for (name, array) in arrays:
+        records[name] = array
+    return records
+
+
+# HISTORICAL_TICKS, the field after time is unused
+HISTORICAL_TICK_COLUMNS = (("time", "i8"), (None, None), ("price", "f8"),
+    ("size", "i8"))
+
+# HISTORICAL_TICKS_BID_ASK, attribs bit 0: askPastHigh, bit 1: bidPastLow
+HISTORICAL_TICK_BID_ASK_COLUMNS = (("time", "i8"), ("attribs", "i4"),
+    ("priceBid", "f8"), ("priceAsk", "f8"), ("sizeBid", "i8"), ("sizeAsk", "i8"))
+
+# HISTORICAL_TICKS_LAST, attribs bit 0: pastLimit, bit 1: unreported
+HISTORICAL_TICK_LAST_COLUMNS = (("time", "i8"), ("attribs", "i4"),
+    ("price", "f8"), ("size", "i8"), ("exchange", str),
+    ("specialConditions", str))
+
+
+def decodeBars(fields, first, nBars, hasGaps=False) -> HistoricalBars:
+    """ the nBars bars starting at fields[first], with hasGaps the bars
+    carry the hasGaps field of the old servers before barCount """
+
+    table = recordTable(fields, first, nBars, 9 if hasGaps else 8)
+    return HistoricalBars(
+        table[:, 0].astype(str),
+        column(table, 1, numpy.float64),
+        column(table, 2, numpy.float64),
+        column(table, 3, numpy.float64),
+        column(table, 4, numpy.float64),
+        column(table, 5, numpy.int64),
+        column(table, 6, numpy.float64),
+        column(table, 8 if hasGaps else 7, numpy.int64))
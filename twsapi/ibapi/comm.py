@@ -9,17 +9,22 @@ This module has tools for implementing the IB low level messaging.
 """
 
 
+import re
 import struct
 import logging
 import sys
 
 from ibapi.common import UNSET_INTEGER, UNSET_DOUBLE
+from ibapi import utils
 from ibapi.utils import ClientException
 from ibapi.utils import isAsciiPrintable
 from ibapi.errors import INVALID_SYMBOL
 
 logger = logging.getLogger(__name__)
 
+# memoryview has no find(), LazyFields looks for the terminators with this
+NULL_SEARCH = re.compile(b"\0").search
+
 
 def make_msg(text) -> bytes:
     """ adds the length prefix """
@@ -61,7 +66,8 @@ def read_msg(buf:bytes) -> tuple:
     if len(buf) < 4:
         return (0, "", buf)
     size = struct.unpack("!I", buf[0:4])[0]
-    logger.debug("read_msg: size: %d", size)
+    if utils.TRACE:
+        logger.debug("read_msg: size: %d", size)
     if len(buf) - 4 >= size:
         text = struct.unpack("!%ds" % size, buf[4:4+size])[0]
         return (size, text, buf[4+size:])
@@ -79,4 +85,163 @@ def read_fields(buf:bytes) -> tuple:
     return tuple(fields[0:-1])   #last one is empty; this may slow dow things though, TODO
 
 
-
+class LazyFields(object):
+    """ Tuple-like view of a msg payload that only looks for the NULL
+    terminators it needs and only builds the fields that are accessed. It
+    yields the same items as read_fields(), so the decoder can use either.
+    A payload that is not bytes, e.g. a MsgFramer view, is indexed in place
+    through a memoryview and only the accessed fields are copied out of it;
+    it must not change while the fields are read. """
+
+    __slots__ = ("buf", "inPlace", "ends", "count")
+
+    def __init__(self, buf):
+        if isinstance(buf, str):
+            buf = buf.encode()
+        self.inPlace = not isinstance(buf, bytes)
+        self.buf = memoryview(buf) if self.inPlace else buf
+        self.ends = []      # offsets of the NULL terminators found so far
+        self.count = None   # known once the last terminator is found
+
+    def _scan(self, idx):
+        """ finds terminators up to the one of field idx """
+        ends = self.ends
+        buf = self.buf
+        pos = ends[-1] + 1 if ends else 0
+        while len(ends) <= idx:
+            if self.inPlace:
+                match = NULL_SEARCH(buf, pos)
+                end = match.start() if match is not None else -1
+            else:
+                end = buf.find(b"\0", pos)
+            if end < 0:
+                self.count = len(ends)
+                break
+            ends.append(end)
+            pos = end + 1
+
+    def __len__(self):
+        if self.count is None:
+            self._scan(sys.maxsize)
+        return self.count
+
+    def hasLength(self, nFields):
+        """ len(self) == nFields, looking no further than field nFields """
+        if self.count is None:
+            self._scan(nFields)
+        return len(self.ends) == nFields
+
+    def __bool__(self):
+        if not self.ends:
+            self._scan(0)
+        return len(self.ends) > 0
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            if (idx.stop is not None and idx.stop >= 0 and (idx.start or 0) >= 0
+                    and (idx.step or 1) > 0):
+                # only the fields up to the stop are looked for
+                self._scan(idx.stop - 1)
+                return tuple(self[i] for i in range(*idx.indices(len(self.ends))))
+            return tuple(self[i] for i in range(*idx.indices(len(self))))
+        if idx < 0:
+            idx += len(self)
+            if idx < 0:
+                raise IndexError("field index out of range")
+        ends = self.ends
+        if idx >= len(ends):
+            self._scan(idx)
+            if idx >= len(ends):
+                raise IndexError("field index out of range")
+        field = self.buf[ends[idx - 1] + 1 if idx else 0:ends[idx]]
+        return bytes(field) if self.inPlace else field
+
+    def __iter__(self):
+        idx = 0
+        while True:
+            try:
+                yield self[idx]
+            except IndexError:
+                return
+            idx += 1
+
+    def __repr__(self):
+        return repr(tuple(self))
+
+
+def has_fields(fields, nFields) -> bool:
+    """ len(fields) == nFields, without counting the terminators of the
+    whole payload of a LazyFields """
+    if isinstance(fields, LazyFields):
+        return fields.hasLength(nFields)
+    return len(fields) == nFields
+
+
+def read_fields_lazy(buf) -> LazyFields:
+    """ same as read_fields() but the fields are only split out on access """
+    return LazyFields(buf)
+
+
+class MsgFramer(object):
+    """ Splits the inbound byte stream into frames in place.
+
+    Incoming bytes are written into a preallocated bytearray; length prefixes
+    are read where they lie and every complete payload is handed out as a
+    memoryview over the buffer, so the unread tail is never re-sliced. Only a
+    trailing partial frame is moved back to the front of the buffer, and
+    only when there is no room left for the next read. The views returned by
+    frames() stay valid until the next call to writable() or feed(). """
+
+    DEFAULT_SIZE = 1024 * 1024
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0      # first unread byte
+        self.end = 0        # one past the last written byte
+
+    def __len__(self):
+        return self.end - self.start
+
+    def capacity(self):
+        return len(self.buf)
+
+    def writable(self, minSize):
+        """ returns a view with room for at least minSize new bytes """
+
+        if len(self.buf) - self.end < minSize:
+            pending = self.end - self.start
+            if len(self.buf) - pending < minSize:
+                # grow; views already handed out keep the old buffer alive
+                buf = bytearray(max(2 * len(self.buf), pending + minSize))
+                buf[0:pending] = self.view[self.start:self.end]
+                self.buf = buf
+                self.view = memoryview(buf)
+            elif pending:
+                self.buf[0:pending] = bytes(self.view[self.start:self.end])
+            self.start = 0
+            self.end = pending
+        return self.view[self.end:]
+
+    def commit(self, nBytes):
+        """ marks nBytes written into the last writable() view as received """
+        self.end += nBytes
+
+    def feed(self, data):
+        nBytes = len(data)
+        self.writable(nBytes)[0:nBytes] = data
+        self.commit(nBytes)
+
+    def frames(self):
+        """ yields the payload of every complete frame as a memoryview """
+
+        while self.end - self.start >= 4:
+            size = struct.unpack_from("!I", self.buf, self.start)[0]
+            begin = self.start + 4
+            if self.end - begin < size:
+                break
+            self.start = begin + size
+            yield self.view[begin:self.start]
+
+        if self.start == self.end:
+            self.start = self.end = 0
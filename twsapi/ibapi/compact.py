@@ -0,0 +1,86 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Memory compact variants of the data objects the decoder builds in bulk.
+A compact class has the same attributes, constructor and methods as the class
+it is made from, but it stores the attributes in __slots__ instead of a per
+instance __dict__, which makes every object several times smaller and its
+attribute access a bit faster. No attribute other than the ones set by the
+original constructor can be added and the objects are not instances of the
+original class, eg CompactContract is not a Contract. The objects a compact
+constructor nests, like the contract of a CompactContractDetails, are compact
+too.
+"""
+
+from ibapi.object_implem import Object
+from ibapi.common import (BarData, RealTimeBar, TickAttrib, TickAttribBidAsk,
+    TickAttribLast, HistoricalTick, HistoricalTickBidAsk, HistoricalTickLast)
+from ibapi.contract import (Contract, ContractDetails)
+from ibapi.execution import Execution
+from ibapi.order import Order
+from ibapi.order_state import OrderState
+from ibapi.softdollartier import SoftDollarTier
+
+
+def compactClass(cls, extraSlots=(), nested=None):
+    """ makes the slotted variant of cls, whose constructor must not take
+    mandatory arguments, with room for the attributes it sets and the
+    extraSlots ones. nested maps the attributes the constructor sets to an
+    object to the compact class that replaces it """
+
+    slots = tuple(vars(cls())) + tuple(extraSlots)
+    namespace = {name: value for (name, value) in vars(cls).items()
+                 if name not in slots and name not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = slots
+    if nested:
+        init = cls.__init__
+        def __init__(self, *args, **kwargs):
+            init(self, *args, **kwargs)
+            for (name, nestedCls) in nested.items():
+                setattr(self, name, nestedCls())
+        namespace["__init__"] = __init__
+    namespace["__module__"] = __name__
+    namespace["__qualname__"] = "Compact" + cls.__name__
+    return type("Compact" + cls.__name__, (Object,), namespace)
+
+
+CompactBarData = compactClass(BarData)
+CompactRealTimeBar = compactClass(RealTimeBar)
+CompactTickAttrib = compactClass(TickAttrib)
+CompactTickAttribBidAsk = compactClass(TickAttribBidAsk)
+CompactTickAttribLast = compactClass(TickAttribLast)
+CompactHistoricalTick = compactClass(HistoricalTick)
+CompactHistoricalTickBidAsk = compactClass(HistoricalTickBidAsk,
+    nested={"tickAttribBidAsk": CompactTickAttribBidAsk})
+CompactHistoricalTickLast = compactClass(HistoricalTickLast,
+    nested={"tickAttribLast": CompactTickAttribLast})
+CompactContract = compactClass(Contract)
+CompactContractDetails = compactClass(ContractDetails,
+    nested={"contract": CompactContract})
+CompactExecution = compactClass(Execution)
+CompactSoftDollarTier = compactClass(SoftDollarTier)
+# only set by the decoder for old servers
+CompactOrder = compactClass(Order, ("notSuppScaleNumComponents",),
+    nested={"softDollarTier": CompactSoftDollarTier})
+CompactOrderState = compactClass(OrderState)
+
+COMPACT_CLASSES = {
+    BarData: CompactBarData,
+    RealTimeBar: CompactRealTimeBar,
+    TickAttrib: CompactTickAttrib,
+    TickAttribBidAsk: CompactTickAttribBidAsk,
+    TickAttribLast: CompactTickAttribLast,
+    HistoricalTick: CompactHistoricalTick,
+    HistoricalTickBidAsk: CompactHistoricalTickBidAsk,
+    HistoricalTickLast: CompactHistoricalTickLast,
+    Contract: CompactContract,
+    ContractDetails: CompactContractDetails,
+    Execution: CompactExecution,
+    Order: CompactOrder,
+    OrderState: CompactOrderState,
+    SoftDollarTier: CompactSoftDollarTier,
+}
@@ -0,0 +1,124 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+An inbound message queue that conflates the market data ticks.
+A tick that is still waiting in the queue is replaced in place by a newer tick
+of the same request and tick type, so a message loop that falls behind only
+ever finds the latest price, size or string of each field of a subscription
+and catches up in one pass. Every other message, order status, executions,
+account and position updates, errors, ends of snapshots, is queued as is and
+never dropped, and the order of the messages is kept but for the replaced
+ticks.
+
+get() hands out everything queued in one list, the message loop decodes it
+while the reader fills the next one.
+"""
+
+import logging
+import queue
+import threading
+
+from ibapi.message import IN
+
+
+logger = logging.getLogger(__name__)
+
+
+# messages that carry the current value of one field of a subscription,
+# laid out as msgId, version, reqId, tickType, ...
+CONFLATED_MSG_IDS = frozenset(str(msgId).encode() for msgId in (IN.TICK_PRICE,
+    IN.TICK_SIZE, IN.TICK_GENERIC, IN.TICK_STRING))
+
+
+def conflationKey(msg):
+    """ (msgId, reqId, tickType) of a tick message payload, None for the
+    messages that are never conflated """
+
+    fields = msg.split(b"\0", 4)
+    if len(fields) < 5 or fields[0] not in CONFLATED_MSG_IDS:
+        return None
+    return (fields[0], fields[2], fields[3])
+
+
+class ConflatingQueue:
+    """ used in place of the queue.Queue of the message loop. maxsize is not
+    a hard limit, a put over it is counted as an overflow and the message is
+    queued anyway since only the ticks may be conflated """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.cond = threading.Condition(threading.Lock())
+        self.msgs = []
+        self.slots = {}             # conflation key: index of its tick in msgs
+        self.overflowing = False
+        self.resetStats()
+
+    def resetStats(self):
+        self.nPut = 0               # messages put
+        self.nConflated = 0         # ticks replaced by a newer one
+        self.nOverflows = 0         # puts that left more than maxsize queued
+        self.highWater = 0          # most messages queued at once
+
+    def put(self, msg, block=True, timeout=None):
+        """ queues msg, or every message of the list msg, never blocks """
+
+        msgs = msg if type(msg) is list else (msg,)
+        with self.cond:
+            queued = self.msgs
+            slots = self.slots
+            for msg in msgs:
+                key = conflationKey(msg)
+                if key is not None:
+                    idx = slots.get(key)
+                    if idx is not None:
+                        queued[idx] = msg
+                        self.nConflated += 1
+                        continue
+                    slots[key] = len(queued)
+                queued.append(msg)
+            self.nPut += len(msgs)
+
+            size = len(queued)
+            if size > self.highWater:
+                self.highWater = size
+            if self.maxsize and size > self.maxsize:
+                self.nOverflows += 1
+                if not self.overflowing:
+                    self.overflowing = True
+                    logger.warning("inbound queue over %d messages", self.maxsize)
+            self.cond.notify()
+
+    def put_nowait(self, msg):
+        self.put(msg, False)
+
+    def get(self, block=True, timeout=None):
+        """ the list of all the queued messages, raises queue.Empty if there
+        is none after timeout """
+
+        with self.cond:
+            if not self.msgs:
+                if not block or not self.cond.wait_for(lambda: self.msgs, timeout):
+                    raise queue.Empty
+            msgs = self.msgs
+            self.msgs = []
+            self.slots = {}
+            self.overflowing = False
+            return msgs
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def qsize(self):
+        return len(self.msgs)
+
+    def empty(self):
+        return not self.msgs
+
+    def stats(self):
+        return {"put": self.nPut, "conflated": self.nConflated,
+                "overflows": self.nOverflows, "highWater": self.highWater,
+                "queued": len(self.msgs)}
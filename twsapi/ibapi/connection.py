@@ -11,10 +11,13 @@ It allows us to keep some other info along with it.
 
 
 import socket
+import selectors
 import threading
 import logging
 import sys
 
+from ibapi import utils
+
 
 #TODO: support SSL !!
 
@@ -22,12 +25,32 @@ logger = logging.getLogger(__name__)
 
 
 class Connection:
-    def __init__(self, host, port):
+    DEFAULT_RECV_SIZE = 64 * 1024
+
+    def __init__(self, host, port, recvSize=DEFAULT_RECV_SIZE, eventDriven=False,
+                 coalesceSize=0, coalesceDelay=0.005):
         self.host = host
         self.port = port
         self.socket = None
         self.wrapper = None
         self.lock = threading.Lock()
+        self.recvSize = recvSize
+        # in event driven mode reads block in a selector on the socket and a
+        # wakeup socket pair instead of polling with a 1 second timeout
+        self.eventDriven = eventDriven
+        self.selector = None
+        self.wakeupRecv = None
+        self.wakeupSend = None
+        self.waiting = False
+        # with a coalesceSize outbound frames are gathered and written with a
+        # single sendall once coalesceSize bytes are pending, coalesceDelay
+        # seconds after the first one or on flush()
+        self.coalesceSize = coalesceSize
+        self.coalesceDelay = coalesceDelay
+        self.pending = []
+        self.pendingSize = 0
+        self.flushTimer = None
+        self.nFlushes = 0
 
     def connect(self):
         try:
@@ -43,28 +66,81 @@ class Connection:
             if self.wrapper:
                 self.wrapper.error(NO_VALID_ID, CONNECT_FAIL.code(), CONNECT_FAIL.msg())
 
-        self.socket.settimeout(1)   #non-blocking
+        if self.eventDriven:
+            self.socket.settimeout(None)
+            (self.wakeupRecv, self.wakeupSend) = socket.socketpair()
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.socket, selectors.EVENT_READ)
+            self.selector.register(self.wakeupRecv, selectors.EVENT_READ)
+        else:
+            self.socket.settimeout(1)   #non-blocking
 
     def disconnect(self):
         self.lock.acquire()
         try:
             if self.socket is not None:
                 logger.debug("disconnecting")
+                try:
+                    self._flushPending()
+                except OSError:
+                    logger.warning("could not send %d pending bytes before disconnecting: %s",
+                                   self.pendingSize, sys.exc_info()[1])
+                if self.selector is not None:
+                    self.selector.unregister(self.socket)
                 self.socket.close()
                 self.socket = None
+                self.pending = []
+                self.pendingSize = 0
                 logger.debug("disconnected")
+                if self.waiting:
+                    # the reader closes the selector once it wakes up
+                    self.wakeupSend.send(b"\0")
+                else:
+                    self._closeSelector()
                 if self.wrapper:
                     self.wrapper.connectionClosed()
         finally:
             self.lock.release()
 
+    def _closeSelector(self):
+        if self.selector is not None:
+            self.selector.close()
+            self.wakeupRecv.close()
+            self.wakeupSend.close()
+            self.selector = None
+            self.wakeupRecv = None
+            self.wakeupSend = None
+
+    def waitReadable(self):
+        """ blocks until the socket has data or the connection is closed,
+        returns True only in the first case """
+        with self.lock:
+            if self.socket is None:
+                return False
+            self.waiting = True
+            selector = self.selector
+            sock = self.socket
+        try:
+            events = selector.select()
+        finally:
+            with self.lock:
+                self.waiting = False
+                if self.socket is None:
+                    self._closeSelector()
+        return any(key.fileobj is sock for (key, _) in events)
+
     def isConnected(self):
         return self.socket is not None
 
     def sendMsg(self, msg):
-        logger.debug("acquiring lock")
+        if self.coalesceSize:
+            return self._queueMsg(msg)
+
+        if utils.TRACE:
+            logger.debug("acquiring lock")
         self.lock.acquire()
-        logger.debug("acquired lock")
+        if utils.TRACE:
+            logger.debug("acquired lock")
         if not self.isConnected():
             logger.debug("sendMsg attempted while not connected, releasing lock")
             self.lock.release()
@@ -75,19 +151,74 @@ class Connection:
             logger.debug("exception from sendMsg %s", sys.exc_info())
             raise
         finally:
-            logger.debug("releasing lock")
+            if utils.TRACE:
+                logger.debug("releasing lock")
             self.lock.release()
-            logger.debug("release lock")
+            if utils.TRACE:
+                logger.debug("release lock")
 
-        logger.debug("sendMsg: sent: %d", nSent)
+        if utils.TRACE:
+            logger.debug("sendMsg: sent: %d", nSent)
 
         return nSent
 
+    def _queueMsg(self, msg):
+        with self.lock:
+            if not self.isConnected():
+                logger.debug("sendMsg attempted while not connected")
+                return 0
+            self.pending.append(msg)
+            self.pendingSize += len(msg)
+            if self.pendingSize >= self.coalesceSize:
+                self._flushPending()
+            elif self.flushTimer is None:
+                self.flushTimer = threading.Timer(self.coalesceDelay, self._timerFlush)
+                self.flushTimer.daemon = True
+                self.flushTimer.start()
+        return len(msg)
+
+    def flush(self):
+        """ writes the coalesced frames now, returns the number of bytes
+        sent """
+        with self.lock:
+            if not self.isConnected():
+                return 0
+            return self._flushPending()
+
+    def _timerFlush(self):
+        try:
+            self.flush()
+        except OSError:
+            # nobody else sees the error on this thread, close the connection
+            # so that the reader ends and the client gets connectionClosed
+            logger.error("could not send the pending messages, disconnecting: %s",
+                         sys.exc_info()[1])
+            self.disconnect()
+
+    def _flushPending(self):
+        # lock held by the caller
+        if self.flushTimer is not None:
+            self.flushTimer.cancel()
+            self.flushTimer = None
+        if not self.pending:
+            return 0
+        data = b"".join(self.pending)
+        # the frames stay pending until they are sent
+        self.socket.sendall(data)
+        self.pending = []
+        self.pendingSize = 0
+        self.nFlushes += 1
+        if utils.TRACE:
+            logger.debug("flush: sent: %d", len(data))
+        return len(data)
+
     def recvMsg(self):
         if not self.isConnected():
             logger.debug("recvMsg attempted while not connected, releasing lock")
             return b""
         try:
+            if self.eventDriven and not self.waitReadable():
+                return b""
             buf = self._recvAllMsg()
             # receiving 0 bytes outside a timeout means the connection is either
             # closed or broken
@@ -109,16 +240,48 @@ class Connection:
         return buf
 
     def _recvAllMsg(self):
+        if self.eventDriven:
+            # the socket is blocking here, only read what the selector saw
+            sock = self.socket
+            return sock.recv(self.recvSize) if sock is not None else b""
+
         cont = True
         allbuf = b""
 
         while cont and self.isConnected():
             buf = self.socket.recv(4096)
             allbuf += buf
-            logger.debug("len %d raw:%s|", len(buf), buf)
+            if utils.TRACE:
+                logger.debug("len %d raw:%s|", len(buf), buf)
 
             if len(buf) < 4096:
                 cont = False
 
         return allbuf
 
+    def recvMsgInto(self, framer):
+        """ reads up to recvSize bytes straight into the framer's buffer
+        and returns the number of bytes received """
+        sock = self.socket
+        if sock is None:
+            logger.debug("recvMsgInto attempted while not connected")
+            return 0
+        try:
+            if self.eventDriven and not self.waitReadable():
+                return 0
+            nBytes = sock.recv_into(framer.writable(self.recvSize), self.recvSize)
+            # receiving 0 bytes outside a timeout means the connection is either
+            # closed or broken
+            if nBytes == 0:
+                logger.debug("socket either closed or broken, disconnecting")
+                self.disconnect()
+            framer.commit(nBytes)
+        except socket.timeout:
+            logger.debug("socket timeout from recvMsgInto %s", sys.exc_info())
+            nBytes = 0
+        except socket.error:
+            logger.debug("socket broken, disconnecting")
+            self.disconnect()
+            nBytes = 0
+
+        return nBytes
@@ -10,18 +10,24 @@ It will call the corresponding method from the EWrapper so that customer's code
 (eg: class derived from EWrapper) can make further use of the data.
 """
 
+import functools
+
 from ibapi.message import IN
 from ibapi.wrapper import * # @UnusedWildImport
 from ibapi.contract import ContractDescription
 from ibapi.server_versions import * # @UnusedWildImport
 from ibapi.utils import * # @UnusedWildImport
-from ibapi.softdollartier import SoftDollarTier
+from ibapi import (comm, utils)
 from ibapi.ticktype import * # @UnusedWildImport
 from ibapi.tag_value import TagValue
 from ibapi.scanner import ScanData
 from ibapi.errors import BAD_MESSAGE
 from ibapi.common import * # @UnusedWildImport
-from ibapi.orderdecoder import OrderDecoder
+from ibapi.orderdecoder import (OrderDecoder, OrderDecodePlan, compileOrderPlan,
+    runOrderPlan, decodeIntField)
+from ibapi.msgplan import (MessagePlan, MESSAGE_PLANS, compileMessagePlan)
+from ibapi.compact import COMPACT_CLASSES
+from ibapi import columnar
 
 logger = logging.getLogger(__name__)
 
@@ -43,8 +49,14 @@ class HandleInfo(Object):
 class Decoder(Object):
     def __init__(self, wrapper, serverVersion):
         self.wrapper = wrapper
-        self.serverVersion = serverVersion
+        self._serverVersion = serverVersion
+        self.rawTickAttribs = False
+        self.compactObjects = False
+        self.historicalBatch = False
+        self.historicalTicksBatch = False
+        self.orderProjection = None
         self.discoverParams()
+        self.compile()
 
 
     def processTickPriceMsg(self, fields):
@@ -57,7 +69,7 @@ class Decoder(Object):
         size = decode(int, fields) # ver 2 field
         attrMask = decode(int, fields) # ver 3 field
 
-        attrib = TickAttrib()
+        attrib = self.TickAttrib()
 
         attrib.canAutoExecute = attrMask == 1
 
@@ -127,9 +139,9 @@ class Decoder(Object):
 
         next(fields)
         
-        order = Order()
-        contract = Contract()
-        orderState = OrderState()
+        order = self.Order()
+        contract = self.Contract()
+        orderState = self.OrderState()
 
         if self.serverVersion < MIN_SERVER_VER_ORDER_CONTAINER:
             version = decode(int, fields)
@@ -138,79 +150,7 @@ class Decoder(Object):
 
         
         OrderDecoder.__init__(self, contract, order, orderState, version, self.serverVersion)
-
-        # read orderId
-        OrderDecoder.decodeOrderId(self, fields)
-
-        # read contract fields
-        OrderDecoder.decodeContractFields(self, fields)
-
-        # read order fields
-        OrderDecoder.decodeAction(self, fields)
-        OrderDecoder.decodeTotalQuantity(self, fields)
-        OrderDecoder.decodeOrderType(self, fields)
-        OrderDecoder.decodeLmtPrice(self, fields)
-        OrderDecoder.decodeAuxPrice(self, fields)
-        OrderDecoder.decodeTIF(self, fields)
-        OrderDecoder.decodeOcaGroup(self, fields)
-        OrderDecoder.decodeAccount(self, fields)
-        OrderDecoder.decodeOpenClose(self, fields)
-        OrderDecoder.decodeOrigin(self, fields)
-        OrderDecoder.decodeOrderRef(self, fields)
-        OrderDecoder.decodeClientId(self, fields)
-        OrderDecoder.decodePermId(self, fields)
-        OrderDecoder.decodeOutsideRth(self, fields)
-        OrderDecoder.decodeHidden(self, fields)
-        OrderDecoder.decodeDiscretionaryAmt(self, fields)
-        OrderDecoder.decodeGoodAfterTime(self, fields)
-        OrderDecoder.skipSharesAllocation(self, fields)
-        OrderDecoder.decodeFAParams(self, fields)
-        OrderDecoder.decodeModelCode(self, fields)
-        OrderDecoder.decodeGoodTillDate(self, fields)
-        OrderDecoder.decodeRule80A(self, fields)
-        OrderDecoder.decodePercentOffset(self, fields)
-        OrderDecoder.decodeSettlingFirm(self, fields)
-        OrderDecoder.decodeShortSaleParams(self, fields)
-        OrderDecoder.decodeAuctionStrategy(self, fields)
-        OrderDecoder.decodeBoxOrderParams(self, fields)
-        OrderDecoder.decodePegToStkOrVolOrderParams(self, fields)
-        OrderDecoder.decodeDisplaySize(self, fields)
-        OrderDecoder.decodeBlockOrder(self, fields)
-        OrderDecoder.decodeSweepToFill(self, fields)
-        OrderDecoder.decodeAllOrNone(self, fields)
-        OrderDecoder.decodeMinQty(self, fields)
-        OrderDecoder.decodeOcaType(self, fields)
-        OrderDecoder.skipETradeOnly(self, fields)
-        OrderDecoder.skipFirmQuoteOnly(self, fields)
-        OrderDecoder.skipNbboPriceCap(self, fields)
-        OrderDecoder.decodeParentId(self, fields)
-        OrderDecoder.decodeTriggerMethod(self, fields)
-        OrderDecoder.decodeVolOrderParams(self, fields, True)
-        OrderDecoder.decodeTrailParams(self, fields)
-        OrderDecoder.decodeBasisPoints(self, fields)
-        OrderDecoder.decodeComboLegs(self, fields)
-        OrderDecoder.decodeSmartComboRoutingParams(self, fields)
-        OrderDecoder.decodeScaleOrderParams(self, fields)
-        OrderDecoder.decodeHedgeParams(self, fields)
-        OrderDecoder.decodeOptOutSmartRouting(self, fields)
-        OrderDecoder.decodeClearingParams(self, fields)
-        OrderDecoder.decodeNotHeld(self, fields)
-        OrderDecoder.decodeDeltaNeutral(self, fields)
-        OrderDecoder.decodeAlgoParams(self, fields)
-        OrderDecoder.decodeSolicited(self, fields)
-        OrderDecoder.decodeWhatIfInfoAndCommission(self, fields)
-        OrderDecoder.decodeVolRandomizeFlags(self, fields)
-        OrderDecoder.decodePegToBenchParams(self, fields)
-        OrderDecoder.decodeConditions(self, fields)
-        OrderDecoder.decodeAdjustedOrderParams(self, fields)
-        OrderDecoder.decodeSoftDollarTier(self, fields)
-        OrderDecoder.decodeCashQty(self, fields)
-        OrderDecoder.decodeDontUseAutoPriceForHedge(self, fields)
-        OrderDecoder.decodeIsOmsContainers(self, fields)
-        OrderDecoder.decodeDiscretionaryUpToLimitPrice(self, fields)
-        OrderDecoder.decodeUsePriceMgmtAlgo(self, fields)
-        OrderDecoder.decodeDuration(self, fields)
-        OrderDecoder.decodePostToAts(self, fields)
+        runOrderPlan(self, self.orderPlan("openOrder", version), fields)
 
         self.wrapper.openOrder(order.orderId, contract, order, orderState)
 
@@ -221,7 +161,7 @@ class Decoder(Object):
         version = decode(int, fields)
 
         # read contract fields
-        contract = Contract()
+        contract = self.Contract()
         contract.conId = decode(int, fields) # ver 6 field
         contract.symbol = decode(str, fields)
         contract.secType = decode(str, fields)
@@ -268,7 +208,7 @@ class Decoder(Object):
         if version >= 3:
             reqId = decode(int, fields)
 
-        contract = ContractDetails()
+        contract = self.ContractDetails()
         contract.contract.symbol = decode(str, fields)
         contract.contract.secType = decode(str, fields)
         self.readLastTradeDate(fields, contract, False)
@@ -341,7 +281,7 @@ class Decoder(Object):
         if version >= 3:
             reqId = decode(int, fields)
 
-        contract = ContractDetails()
+        contract = self.ContractDetails()
         contract.contract.symbol = decode(str, fields)
         contract.contract.secType = decode(str, fields)
         contract.cusip = decode(str, fields)
@@ -401,7 +341,7 @@ class Decoder(Object):
 
         for _ in range(numberOfElements):
             data = ScanData()
-            data.contract = ContractDetails()
+            data.contract = self.ContractDetails()
 
             data.rank = decode(int, fields)
             data.contract.contract.conId = decode(int, fields) # ver 3 field
@@ -439,7 +379,7 @@ class Decoder(Object):
         orderId = decode(int, fields)
 
         # decode contract fields
-        contract = Contract()
+        contract = self.Contract()
         contract.conId = decode(int, fields) # ver 5 field
         contract.symbol = decode(str, fields)
         contract.secType = decode(str, fields)
@@ -455,7 +395,7 @@ class Decoder(Object):
             contract.tradingClass = decode(str, fields)
 
         # decode execution fields
-        execution = Execution()
+        execution = self.Execution()
         execution.orderId = orderId
         execution.execId = decode(str, fields)
         execution.time = decode(str, fields)
@@ -504,7 +444,7 @@ class Decoder(Object):
         itemCount = decode(int, fields)
 
         for _ in range(itemCount):
-            bar = BarData()
+            bar = self.BarData()
             bar.date = decode(str, fields)
             bar.open = decode(float, fields)
             bar.high = decode(float, fields)
@@ -526,7 +466,7 @@ class Decoder(Object):
     def processHistoricalDataUpdateMsg(self, fields):
         next(fields)
         reqId = decode(int, fields)
-        bar = BarData()
+        bar = self.BarData()
         bar.barCount = decode(int, fields)
         bar.date = decode(str, fields)
         bar.open = decode(float, fields)
@@ -542,7 +482,7 @@ class Decoder(Object):
         decode(int, fields)
         reqId = decode(int, fields)
 
-        bar = RealTimeBar()
+        bar = self.RealTimeBar()
         bar.time = decode(int, fields)
         bar.open = decode(float, fields)
         bar.high = decode(float, fields)
@@ -658,7 +598,7 @@ class Decoder(Object):
         account = decode(str, fields)
 
         # decode contract fields
-        contract = Contract()
+        contract = self.Contract()
         contract.conId = decode(int, fields)
         contract.symbol = decode(str, fields)
         contract.secType = decode(str, fields)
@@ -691,7 +631,7 @@ class Decoder(Object):
         account = decode(str, fields)
 
         # decode contract fields
-        contract = Contract()
+        contract = self.Contract()
         contract.conId = decode(int, fields)
         contract.symbol = decode(str, fields)
         contract.secType = decode(str, fields)
@@ -750,7 +690,7 @@ class Decoder(Object):
 
         tiers = []
         for _ in range(nTiers):
-                tier = SoftDollarTier()
+                tier = self.SoftDollarTier()
                 tier.name = decode(str, fields)
                 tier.val = decode(str, fields)
                 tier.displayName = decode(str, fields)
@@ -977,7 +917,7 @@ class Decoder(Object):
         ticks = []
 
         for _ in range(tickCount):
-            historicalTick = HistoricalTick()
+            historicalTick = self.HistoricalTick()
             historicalTick.time = decode(int, fields)
             next(fields) # for consistency
             historicalTick.price = decode(float, fields)
@@ -996,10 +936,10 @@ class Decoder(Object):
         ticks = []
 
         for _ in range(tickCount):
-            historicalTickBidAsk = HistoricalTickBidAsk()
+            historicalTickBidAsk = self.HistoricalTickBidAsk()
             historicalTickBidAsk.time = decode(int, fields)
             mask = decode(int, fields)
-            tickAttribBidAsk = TickAttribBidAsk()
+            tickAttribBidAsk = self.TickAttribBidAsk()
             tickAttribBidAsk.askPastHigh = mask & 1 != 0
             tickAttribBidAsk.bidPastLow = mask & 2 != 0
             historicalTickBidAsk.tickAttribBidAsk = tickAttribBidAsk
@@ -1021,10 +961,10 @@ class Decoder(Object):
         ticks = []
 
         for _ in range(tickCount):
-            historicalTickLast = HistoricalTickLast()
+            historicalTickLast = self.HistoricalTickLast()
             historicalTickLast.time = decode(int, fields)
             mask = decode(int, fields)
-            tickAttribLast = TickAttribLast()
+            tickAttribLast = self.TickAttribLast()
             tickAttribLast.pastLimit = mask & 1 != 0
             tickAttribLast.unreported = mask & 2 != 0
             historicalTickLast.tickAttribLast = tickAttribLast
@@ -1053,7 +993,7 @@ class Decoder(Object):
             size = decode(int, fields)
             mask = decode(int, fields)
 
-            tickAttribLast = TickAttribLast()
+            tickAttribLast = self.TickAttribLast()
             tickAttribLast.pastLimit = mask & 1 != 0
             tickAttribLast.unreported = mask & 2 != 0
             exchange = decode(str, fields)
@@ -1068,7 +1008,7 @@ class Decoder(Object):
             bidSize = decode(int, fields)
             askSize = decode(int, fields)
             mask = decode(int, fields)
-            tickAttribBidAsk = TickAttribBidAsk()
+            tickAttribBidAsk = self.TickAttribBidAsk()
             tickAttribBidAsk.bidPastLow = mask & 1 != 0
             tickAttribBidAsk.askPastHigh = mask & 2 != 0
 
@@ -1111,76 +1051,12 @@ class Decoder(Object):
     def processCompletedOrderMsg(self, fields):
         next(fields)
         
-        order = Order()
-        contract = Contract()
-        orderState = OrderState()
+        order = self.Order()
+        contract = self.Contract()
+        orderState = self.OrderState()
 
         OrderDecoder.__init__(self, contract, order, orderState, UNSET_INTEGER, self.serverVersion)
-
-        # read contract fields
-        OrderDecoder.decodeContractFields(self, fields)
-
-        # read order fields
-        OrderDecoder.decodeAction(self, fields)
-        OrderDecoder.decodeTotalQuantity(self, fields)
-        OrderDecoder.decodeOrderType(self, fields)
-        OrderDecoder.decodeLmtPrice(self, fields)
-        OrderDecoder.decodeAuxPrice(self, fields)
-        OrderDecoder.decodeTIF(self, fields)
-        OrderDecoder.decodeOcaGroup(self, fields)
-        OrderDecoder.decodeAccount(self, fields)
-        OrderDecoder.decodeOpenClose(self, fields)
-        OrderDecoder.decodeOrigin(self, fields)
-        OrderDecoder.decodeOrderRef(self, fields)
-        OrderDecoder.decodePermId(self, fields)
-        OrderDecoder.decodeOutsideRth(self, fields)
-        OrderDecoder.decodeHidden(self, fields)
-        OrderDecoder.decodeDiscretionaryAmt(self, fields)
-        OrderDecoder.decodeGoodAfterTime(self, fields)
-        OrderDecoder.decodeFAParams(self, fields)
-        OrderDecoder.decodeModelCode(self, fields)
-        OrderDecoder.decodeGoodTillDate(self, fields)
-        OrderDecoder.decodeRule80A(self, fields)
-        OrderDecoder.decodePercentOffset(self, fields)
-        OrderDecoder.decodeSettlingFirm(self, fields)
-        OrderDecoder.decodeShortSaleParams(self, fields)
-        OrderDecoder.decodeBoxOrderParams(self, fields)
-        OrderDecoder.decodePegToStkOrVolOrderParams(self, fields)
-        OrderDecoder.decodeDisplaySize(self, fields)
-        OrderDecoder.decodeSweepToFill(self, fields)
-        OrderDecoder.decodeAllOrNone(self, fields)
-        OrderDecoder.decodeMinQty(self, fields)
-        OrderDecoder.decodeOcaType(self, fields)
-        OrderDecoder.decodeTriggerMethod(self, fields)
-        OrderDecoder.decodeVolOrderParams(self, fields, False)
-        OrderDecoder.decodeTrailParams(self, fields)
-        OrderDecoder.decodeComboLegs(self, fields)
-        OrderDecoder.decodeSmartComboRoutingParams(self, fields)
-        OrderDecoder.decodeScaleOrderParams(self, fields)
-        OrderDecoder.decodeHedgeParams(self, fields)
-        OrderDecoder.decodeClearingParams(self, fields)
-        OrderDecoder.decodeNotHeld(self, fields)
-        OrderDecoder.decodeDeltaNeutral(self, fields)
-        OrderDecoder.decodeAlgoParams(self, fields)
-        OrderDecoder.decodeSolicited(self, fields)
-        OrderDecoder.decodeOrderStatus(self, fields)
-        OrderDecoder.decodeVolRandomizeFlags(self, fields)
-        OrderDecoder.decodePegToBenchParams(self, fields)
-        OrderDecoder.decodeConditions(self, fields)
-        OrderDecoder.decodeStopPriceAndLmtPriceOffset(self, fields)
-        OrderDecoder.decodeCashQty(self, fields)
-        OrderDecoder.decodeDontUseAutoPriceForHedge(self, fields)
-        OrderDecoder.decodeIsOmsContainers(self, fields)
-        OrderDecoder.decodeAutoCancelDate(self, fields)
-        OrderDecoder.decodeFilledQuantity(self, fields)
-        OrderDecoder.decodeRefFuturesConId(self, fields)
-        OrderDecoder.decodeAutoCancelParent(self, fields)
-        OrderDecoder.decodeShareholder(self, fields)
-        OrderDecoder.decodeImbalanceOnly(self, fields)
-        OrderDecoder.decodeRouteMarketableToBbo(self, fields)
-        OrderDecoder.decodeParentPermId(self, fields)
-        OrderDecoder.decodeCompletedTime(self, fields)
-        OrderDecoder.decodeCompletedStatus(self, fields)
+        runOrderPlan(self, self.orderPlan("completedOrder", UNSET_INTEGER), fields)
 
         self.wrapper.completedOrder(contract, order, orderState)
 
@@ -1242,6 +1118,321 @@ class Decoder(Object):
                         logger.debug("\tparam %s %s %s", pname, param.name, param.annotation)
 
 
+    @property
+    def serverVersion(self):
+        return self._serverVersion
+
+    @serverVersion.setter
+    def serverVersion(self, serverVersion):
+        # the decoders are specialized for the version, interpret() does
+        # not look at it; OrderDecoder.__init__ sets it again for every order
+        if serverVersion != self._serverVersion:
+            self._serverVersion = serverVersion
+            self.compile()
+
+    def compile(self):
+        """Builds the per message decoders for the current serverVersion.
+        Setting another serverVersion calls it, changing one of the options,
+        eg compactObjects, needs a call."""
+
+        self.compileObjectClasses()
+        self.compileSignatures()
+        self.compileMessagePlans()
+        self.compileTickDecoders()
+        self.compileDispatch()
+        self.compileBatchDecoders()
+        self.orderPlans = {}
+
+    def orderPlan(self, msgName, version):
+        """The steps decoding an openOrder or completedOrder message of the
+        given version, built on first use. With an orderProjection, eg
+        orderdecoder.ORDER_SUMMARY, only the attributes it names are set and
+        the other ones keep their default value."""
+
+        plan = self.orderPlans.get((msgName, version))
+        if plan is None:
+            builder = OrderDecodePlan(version, self.serverVersion or 0, self.orderProjection)
+            plan = compileOrderPlan(getattr(builder, msgName)())
+            self.orderPlans[(msgName, version)] = plan
+        return plan
+
+    def compileObjectClasses(self):
+        """With compactObjects the contracts, orders, bars, ticks and their
+        attributes handed to the wrapper are the __slots__ based variants
+        of ibapi.compact instead of the regular classes."""
+
+        for (cls, compactCls) in COMPACT_CLASSES.items():
+            setattr(self, cls.__name__, compactCls if self.compactObjects else cls)
+
+    def compileTickDecoders(self):
+        """TICK_PRICE and TICK_SIZE make up most of the inbound traffic, they
+        get dedicated decoders that index the fields directly instead of
+        going through decode(). With rawTickAttribs the attribute mask is
+        passed to tickPrice as an int instead of a new TickAttrib, otherwise
+        the attributes the serverVersion sends are picked once here."""
+
+        serverVersion = self.serverVersion or 0
+        tickPrice = self.wrapper.tickPrice
+        tickSize = self.wrapper.tickSize
+        sizeTickByPriceTick = SIZE_TICK_BY_PRICE_TICK
+        newTickAttrib = self.TickAttrib
+
+        def pastLimitPreOpenAttrib(field):
+            attrMask = int(field or 0)
+            attrib = newTickAttrib()
+            attrib.canAutoExecute = attrMask & 1 != 0
+            attrib.pastLimit = attrMask & 2 != 0
+            attrib.preOpen = attrMask & 4 != 0
+            return attrib
+
+        def pastLimitAttrib(field):
+            attrMask = int(field or 0)
+            attrib = newTickAttrib()
+            attrib.canAutoExecute = attrMask & 1 != 0
+            attrib.pastLimit = attrMask & 2 != 0
+            return attrib
+
+        def canAutoExecuteAttrib(field):
+            attrib = newTickAttrib()
+            attrib.canAutoExecute = int(field or 0) == 1
+            return attrib
+
+        if self.rawTickAttribs:
+            makeAttrib = decodeIntField
+        elif serverVersion >= MIN_SERVER_VER_PRE_OPEN_BID_ASK:
+            makeAttrib = pastLimitPreOpenAttrib
+        elif serverVersion >= MIN_SERVER_VER_PAST_LIMIT:
+            makeAttrib = pastLimitAttrib
+        else:
+            makeAttrib = canAutoExecuteAttrib
+
+        def tickPriceDecoder(fields):
+            try:
+                reqId = int(fields[2] or 0)
+                tickType = int(fields[3] or 0)
+                price = float(fields[4] or 0)
+                size = int(fields[5] or 0) # ver 2 field
+                attrib = makeAttrib(fields[6]) # ver 3 field
+            except IndexError:
+                raise BadMessage("no more fields")
+
+            tickPrice(reqId, tickType, price, attrib)
+
+            sizeTickType = sizeTickByPriceTick.get(tickType)
+            if sizeTickType is not None:
+                tickSize(reqId, sizeTickType, size)
+
+        def tickSizeDecoder(fields):
+            if not comm.has_fields(fields, 5):
+                logger.error("diff len fields and params %d %d for fields: %s",
+                             len(fields), 5, fields)
+                return
+            tickSize(int(fields[2] or 0), int(fields[3] or 0), int(fields[4] or 0))
+
+        self.tickDecoders = {
+            IN.TICK_PRICE: tickPriceDecoder,
+            IN.TICK_SIZE: tickSizeDecoder}
+
+    def compileMessagePlans(self):
+        """The flat messages of msgplan.MESSAGE_PLANS and HISTORICAL_DATA get
+        decoders specialized for the serverVersion, they do not test it
+        again for every message."""
+
+        serverVersion = self.serverVersion or 0
+        planDecoders = {}
+        for (msgId, makePlan, processName) in MESSAGE_PLANS:
+            plan = makePlan(MessagePlan(serverVersion))
+            if plan is not None:
+                planDecoders[msgId] = compileMessagePlan(plan, self,
+                    self.processDecoder(getattr(Decoder, processName)))
+        self.planDecoders = planDecoders
+        self.compileHistoricalData()
+
+    def compileHistoricalData(self):
+
+        oldServer = (self.serverVersion or 0) < MIN_SERVER_VER_SYNT_REALTIME_BARS
+        # msgId, version if old server, reqId, start, end, itemCount, bars
+        reqIdIdx = 2 if oldServer else 1
+        # date, open, high, low, close, volume, average, hasGaps if old server, barCount
+        barWidth = 9 if oldServer else 8
+        newBarData = self.BarData
+        historicalData = self.wrapper.historicalData
+        historicalDataEnd = self.wrapper.historicalDataEnd
+
+        def historicalDataDecoder(fields):
+            try:
+                reqId = int(fields[reqIdIdx])
+                startDateStr = fields[reqIdIdx + 1].decode(errors='backslashreplace') # ver 2 field
+                endDateStr = fields[reqIdIdx + 2].decode(errors='backslashreplace') # ver 2 field
+                itemCount = int(fields[reqIdIdx + 3] or 0)
+            except IndexError:
+                raise BadMessage("no more fields")
+
+            idx = reqIdIdx + 4
+            for _ in range(itemCount):
+                try:
+                    bar = newBarData()
+                    bar.date = fields[idx].decode(errors='backslashreplace')
+                    bar.open = float(fields[idx + 1] or 0)
+                    bar.high = float(fields[idx + 2] or 0)
+                    bar.low = float(fields[idx + 3] or 0)
+                    bar.close = float(fields[idx + 4] or 0)
+                    bar.volume = int(fields[idx + 5] or 0)
+                    bar.average = float(fields[idx + 6] or 0)
+                    bar.barCount = int(fields[idx + barWidth - 1] or 0) # ver 3 field
+                except IndexError:
+                    raise BadMessage("no more fields")
+                idx += barWidth
+
+                historicalData(reqId, bar)
+
+            # send end of dataset marker
+            historicalDataEnd(reqId, startDateStr, endDateStr)
+
+        self.planDecoders[IN.HISTORICAL_DATA] = historicalDataDecoder
+
+    def compileBatchDecoders(self):
+        """With historicalBatch the bars of a HISTORICAL_DATA message are
+        decoded column by column into a columnar.HistoricalBars and handed
+        to historicalDataBatch() in a single call instead of one BarData and
+        one historicalData() call per bar. With historicalTicksBatch the
+        historical ticks pages are decoded into structured arrays. Both
+        require numpy and replace the regular decoders in msgDecoders."""
+
+        if self.historicalBatch:
+            columnar.requireNumpy("historicalBatch")
+            self.compileHistoricalDataBatch()
+        if self.historicalTicksBatch:
+            columnar.requireNumpy("historicalTicksBatch")
+            self.compileHistoricalTicksBatch()
+
+    def compileHistoricalDataBatch(self):
+
+        oldServer = (self.serverVersion or 0) < MIN_SERVER_VER_SYNT_REALTIME_BARS
+        # msgId, version if old server, reqId, start, end, itemCount
+        reqIdIdx = 2 if oldServer else 1
+        historicalDataBatch = self.wrapper.historicalDataBatch
+        historicalDataEnd = self.wrapper.historicalDataEnd
+
+        def historicalDataDecoder(fields):
+            try:
+                reqId = int(fields[reqIdIdx])
+                startDateStr = fields[reqIdIdx + 1].decode(errors='backslashreplace')
+                endDateStr = fields[reqIdIdx + 2].decode(errors='backslashreplace')
+                itemCount = int(fields[reqIdIdx + 3] or 0)
+            except IndexError:
+                raise BadMessage("no more fields")
+
+            bars = columnar.decodeBars(fields, reqIdIdx + 4, itemCount, oldServer)
+            historicalDataBatch(reqId, bars)
+            # send end of dataset marker
+            historicalDataEnd(reqId, startDateStr, endDateStr)
+
+        self.msgDecoders[IN.HISTORICAL_DATA] = historicalDataDecoder
+
+    def compileHistoricalTicksBatch(self):
+        def ticksDecoder(columns, wrapperMeth):
+            width = len(columns)
+
+            def decoder(fields):
+                # msgId, reqId, tickCount, ticks, done
+                try:
+                    reqId = int(fields[1])
+                    tickCount = int(fields[2])
+                    done = int(fields[3 + tickCount * width] or 0) != 0
+                except (IndexError, ValueError):
+                    raise BadMessage("no more fields")
+
+                ticks = columnar.decodeRecords(fields, 3, tickCount, columns)
+                wrapperMeth(reqId, ticks, done)
+
+            return decoder
+
+        self.msgDecoders[IN.HISTORICAL_TICKS] = ticksDecoder(
+            columnar.HISTORICAL_TICK_COLUMNS,
+            self.wrapper.historicalTicksBatch)
+        self.msgDecoders[IN.HISTORICAL_TICKS_BID_ASK] = ticksDecoder(
+            columnar.HISTORICAL_TICK_BID_ASK_COLUMNS,
+            self.wrapper.historicalTicksBidAskBatch)
+        self.msgDecoders[IN.HISTORICAL_TICKS_LAST] = ticksDecoder(
+            columnar.HISTORICAL_TICK_LAST_COLUMNS,
+            self.wrapper.historicalTicksLastBatch)
+
+    def processDecoder(self, processMeth):
+        def decoder(fields):
+            processMeth(self, iter(fields))
+
+        return decoder
+
+    def compileDispatch(self):
+        """Merges the decoders into msgDecoders, the one table interpret()
+        looks a msgId up in: the dedicated tick decoders first, then the
+        version specialized ones, then the signature and process* decoders
+        of the other messages."""
+
+        msgDecoders = {}
+        for (msgId, handleInfo) in self.msgId2handleInfo.items():
+            if handleInfo.wrapperMeth is not None:
+                sigDecoder = self.sigDecoders.get(msgId, None)
+                if sigDecoder is None:
+                    sigDecoder = functools.partial(self.interpretWithSignature,
+                                                   handleInfo=handleInfo)
+                msgDecoders[msgId] = sigDecoder
+            elif handleInfo.processMeth is not None:
+                msgDecoders[msgId] = self.processDecoder(handleInfo.processMeth)
+
+        msgDecoders.update(self.planDecoders)
+        msgDecoders.update(self.tickDecoders)
+        self.msgDecoders = msgDecoders
+
+    def compileSignatures(self):
+        """Builds, once for the current serverVersion, a converter closure per
+        signature driven message, so that interpret() does not need to walk
+        the wrapper's parameters and re-check the version for every field."""
+
+        serverVersion = self.serverVersion or 0
+        encoding = 'unicode-escape' if serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7 else 'UTF-8'
+
+        def decodeStr(field):
+            try:
+                return field.decode(encoding)
+            except UnicodeDecodeError:
+                return field.decode('latin-1')
+
+        sigDecoders = {}
+        for (msgId, handleInfo) in self.msgId2handleInfo.items():
+            if handleInfo.wrapperMeth is not None and handleInfo.wrapperParams is not None:
+                sigDecoders[msgId] = self.compileSignature(handleInfo, decodeStr)
+
+        self.sigDecoders = sigDecoders
+
+    def compileSignature(self, handleInfo, decodeStr):
+        converters = []
+        for (pname, param) in handleInfo.wrapperParams.items():
+            if pname != "self":
+                if param.annotation is int:
+                    converters.append(int)
+                elif param.annotation is float:
+                    converters.append(float)
+                else:
+                    converters.append(decodeStr)
+        converters = tuple(converters)
+
+        nFields = len(converters) + 2 #msgId and versionId are bypassed
+        steps = tuple(zip(converters, range(2, nFields)))
+        method = getattr(self.wrapper, handleInfo.wrapperMeth.__name__)
+
+        def sigDecoder(fields):
+            # index access only, a comm.LazyFields is not counted nor sliced
+            if not comm.has_fields(fields, nFields):
+                logger.error("diff len fields and params %d %d for fields: %s and handleInfo: %s",
+                             len(fields), len(handleInfo.wrapperParams), fields,
+                             handleInfo)
+                return
+            method(*[convert(fields[idx]) for (convert, idx) in steps])
+
+        return sigDecoder
+
     def interpretWithSignature(self, fields, handleInfo):
         if handleInfo.wrapperParams is None:
             logger.debug("%s: no param info in %s", fields, handleInfo)
@@ -1258,12 +1449,14 @@ class Decoder(Object):
         args = []
         for (pname, param) in handleInfo.wrapperParams.items():
             if pname != "self":
-                logger.debug("field %s ", fields[fieldIdx])
+                if utils.TRACE:
+                    logger.debug("field %s ", fields[fieldIdx])
                 try:
                     arg = fields[fieldIdx].decode('unicode-escape' if self.serverVersion >= MIN_SERVER_VER_ENCODE_MSG_ASCII7 else 'UTF-8')
                 except UnicodeDecodeError:
                     arg = fields[fieldIdx].decode('latin-1')
-                logger.debug("arg %s type %s", arg, param.annotation)
+                if utils.TRACE:
+                    logger.debug("arg %s type %s", arg, param.annotation)
                 if param.annotation is int:
                     arg = int(arg)
                 elif param.annotation is float:
@@ -1273,31 +1466,29 @@ class Decoder(Object):
                 fieldIdx += 1
 
         method = getattr(self.wrapper, handleInfo.wrapperMeth.__name__)
-        logger.debug("calling %s with %s %s", method, self.wrapper, args)
+        if utils.TRACE:
+            logger.debug("calling %s with %s %s", method, self.wrapper, args)
         method(*args)
 
     def interpret(self, fields):
-        if len(fields) == 0:
-            logger.debug("no fields")
+        if not fields:
+            if utils.TRACE:
+                logger.debug("no fields")
             return
 
         sMsgId = fields[0]
         nMsgId = int(sMsgId)
 
-        handleInfo = self.msgId2handleInfo.get(nMsgId, None)
-
-        if handleInfo is None:
-            logger.debug("%s: no handleInfo", fields)
+        msgDecoder = self.msgDecoders.get(nMsgId, None)
+        if msgDecoder is None:
+            if utils.TRACE:
+                logger.debug("%s: no handleInfo", fields)
             return
 
         try:
-            if handleInfo.wrapperMeth is not None:
-                logger.debug("In interpret(), handleInfo: %s", handleInfo)
-                self.interpretWithSignature(fields, handleInfo)
-            elif handleInfo.processMeth is not None:
-                handleInfo.processMeth(self, iter(fields))
+            msgDecoder(fields)
         except BadMessage:
-                theBadMsg = ",".join(fields)
+                theBadMsg = b",".join(fields).decode(errors='backslashreplace')
                 self.wrapper.error(NO_VALID_ID, BAD_MESSAGE.code(),
                                    BAD_MESSAGE.msg() + theBadMsg)
                 raise
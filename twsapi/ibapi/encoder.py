@@ -0,0 +1,104 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Caches the encoded contract part of outbound requests.
+The contract fields of a request only depend on the contract's values and on
+the server version, so once encoded they are reused as is for every request
+that targets the same contract, no matter if the Contract object is new.
+"""
+
+from ibapi.comm import make_field
+from ibapi.object_implem import Object
+from ibapi.server_versions import * # @UnusedWildImport
+
+
+class ContractEncoder(Object):
+    def __init__(self, maxSize=10000):
+        self.maxSize = maxSize
+        self.cache = {}
+
+    def __str__(self):
+        return "ContractEncoder: %d contracts" % len(self.cache)
+
+    def clear(self):
+        self.cache.clear()
+
+    def _lookup(self, key, encode, contract, serverVersion):
+        fields = self.cache.get(key)
+        if fields is None:
+            if len(self.cache) >= self.maxSize:
+                self.cache.clear()
+            fields = encode(contract, serverVersion)
+            self.cache[key] = fields
+        return fields
+
+    def mktDataFields(self, contract, serverVersion) -> str:
+        """ contract fields of REQ_MKT_DATA, combo legs excluded """
+
+        key = ("mktData", serverVersion, contract.conId, contract.symbol,
+               contract.secType, contract.lastTradeDateOrContractMonth,
+               contract.strike, contract.right, contract.multiplier,
+               contract.exchange, contract.primaryExchange, contract.currency,
+               contract.localSymbol, contract.tradingClass)
+        return self._lookup(key, self.encodeMktDataFields, contract, serverVersion)
+
+    def placeOrderFields(self, contract, serverVersion) -> str:
+        """ contract fields of PLACE_ORDER, combo legs excluded """
+
+        key = ("placeOrder", serverVersion, contract.conId, contract.symbol,
+               contract.secType, contract.lastTradeDateOrContractMonth,
+               contract.strike, contract.right, contract.multiplier,
+               contract.exchange, contract.primaryExchange, contract.currency,
+               contract.localSymbol, contract.tradingClass, contract.secIdType,
+               contract.secId)
+        return self._lookup(key, self.encodePlaceOrderFields, contract, serverVersion)
+
+    @staticmethod
+    def encodeMktDataFields(contract, serverVersion) -> str:
+        flds = []
+        if serverVersion >= MIN_SERVER_VER_REQ_MKT_DATA_CONID:
+            flds += [make_field(contract.conId),]
+
+        flds += [make_field(contract.symbol),
+            make_field(contract.secType),
+            make_field(contract.lastTradeDateOrContractMonth),
+            make_field(contract.strike),
+            make_field(contract.right),
+            make_field(contract.multiplier), # srv v15 and above
+            make_field(contract.exchange),
+            make_field(contract.primaryExchange), # srv v14 and above
+            make_field(contract.currency),
+            make_field(contract.localSymbol) ] # srv v2 and above
+
+        if serverVersion >= MIN_SERVER_VER_TRADING_CLASS:
+            flds += [make_field(contract.tradingClass),]
+
+        return "".join(flds)
+
+    @staticmethod
+    def encodePlaceOrderFields(contract, serverVersion) -> str:
+        flds = []
+        if serverVersion >= MIN_SERVER_VER_PLACE_ORDER_CONID:
+            flds.append(make_field( contract.conId))
+        flds += [make_field( contract.symbol),
+            make_field( contract.secType),
+            make_field( contract.lastTradeDateOrContractMonth),
+            make_field( contract.strike),
+            make_field( contract.right),
+            make_field( contract.multiplier), # srv v15 and above
+            make_field( contract.exchange),
+            make_field( contract.primaryExchange), # srv v14 and above
+            make_field( contract.currency),
+            make_field( contract.localSymbol)] # srv v2 and above
+        if serverVersion >= MIN_SERVER_VER_TRADING_CLASS:
+            flds.append(make_field( contract.tradingClass))
+
+        if serverVersion >= MIN_SERVER_VER_SEC_ID_TYPE:
+            flds += [make_field( contract.secIdType),
+                make_field( contract.secId)]
+
+        return "".join(flds)
@@ -0,0 +1,312 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Version specialized decoders of the flat, frequent messages.
+A MessagePlan lists, for one serverVersion, what every field of a message
+goes to, with the serverVersion tests of the matching Decoder.process*
+method already resolved. compileMessagePlan() turns it into a function of
+the fields that runs the steps, indexing the fields directly, and calls the
+wrapper, so that the Decoder does no version comparison for these messages
+once connected.
+
+Some messages also carry their own version. Their plan is made for the
+version the current servers send, the compiled function checks it and
+hands any other version to the process* method.
+
+The process* methods that still test serverVersion are left out on purpose:
+CONTRACT_DATA and BOND_CONTRACT_DATA have a variable length secIdList before
+their version dependent fields, so the fields can not be indexed from a
+plan, and they come once per contract; OPEN_ORDER and COMPLETED_ORDER test
+it once to pick their cached order plan; REPLACE_FA_END and
+MKT_DEPTH_EXCHANGES are one-off answers. TICK_PRICE and HISTORICAL_DATA have
+their own compiled decoders in the Decoder.
+"""
+
+from ibapi.message import IN
+from ibapi.object_implem import Object
+from ibapi.utils import * # @UnusedWildImport
+from ibapi.server_versions import * # @UnusedWildImport
+from ibapi.orderdecoder import (decodeStrField, decodeIntField,
+    decodeFloatField, decodeBoolField)
+
+logger = logging.getLogger(__name__)
+
+
+def decodeImpliedVol(s):
+    impliedVol = float(s or 0)
+    return None if impliedVol < 0 else impliedVol # -1 is the "not computed" indicator
+
+
+def notComputed(indicator):
+    """ a float converter giving None for the "not computed" indicator """
+
+    def decodeField(s):
+        value = float(s or 0)
+        return None if value == indicator else value
+
+    return decodeField
+
+
+class MessagePlan(Object):
+    """ builds the plan of one message for one serverVersion, each method
+    mirrors the Decoder.process* method of the same message and returns the
+    plan or None if the message can not be decoded by a plan """
+
+    def __init__(self, serverVersion):
+        self.serverVersion = serverVersion
+        self.wrapperMeth = None
+        self.args = ()
+        self.objects = []       # (name, Decoder class attribute) made first
+        self.consts = {}        # args that are not on the wire
+        self.steps = [None]     # (target, convert) per field, msgId first
+        self.pinnedVersion = None
+
+    def __str__(self):
+        return "MessagePlan: %s, %d fields" % (self.wrapperMeth, len(self.steps))
+
+    def field(self, target, convert):
+        self.steps.append((target, convert))
+
+    def skip(self):
+        self.steps.append(None)
+
+    def make(self, name, className):
+        self.objects.append((name, className))
+
+    def const(self, name, value):
+        self.consts[name] = value
+
+    def pinVersion(self, version):
+        """ the next field is the message version, the plan is for version """
+        self.pinnedVersion = (len(self.steps), version)
+        self.skip()
+
+    def call(self, wrapperMeth, *args):
+        self.wrapperMeth = wrapperMeth
+        self.args = args
+        return self
+
+    def contractFields(self, name):
+        self.field(name + ".conId", decodeIntField)
+        self.field(name + ".symbol", decodeStrField)
+        self.field(name + ".secType", decodeStrField)
+        self.field(name + ".lastTradeDateOrContractMonth", decodeStrField)
+        self.field(name + ".strike", decodeFloatField)
+        self.field(name + ".right", decodeStrField)
+        self.field(name + ".multiplier", decodeStrField)
+        self.field(name + ".exchange", decodeStrField)
+        self.field(name + ".currency", decodeStrField)
+        self.field(name + ".localSymbol", decodeStrField)
+        self.field(name + ".tradingClass", decodeStrField)
+
+    def positionConvert(self):
+        if self.serverVersion >= MIN_SERVER_VER_FRACTIONAL_POSITIONS:
+            return decodeFloatField
+        return decodeIntField
+
+    def orderStatus(self):
+        if self.serverVersion < MIN_SERVER_VER_MARKET_CAP_PRICE:
+            self.skip()
+        self.field("orderId", decodeIntField)
+        self.field("status", decodeStrField)
+        self.field("filled", self.positionConvert())
+        self.field("remaining", self.positionConvert())
+        self.field("avgFillPrice", decodeFloatField)
+        self.field("permId", decodeIntField)
+        self.field("parentId", decodeIntField)
+        self.field("lastFillPrice", decodeFloatField)
+        self.field("clientId", decodeIntField)
+        self.field("whyHeld", decodeStrField)
+        if self.serverVersion >= MIN_SERVER_VER_MARKET_CAP_PRICE:
+            self.field("mktCapPrice", decodeFloatField)
+        else:
+            self.const("mktCapPrice", None)
+        return self.call("orderStatus", "orderId", "status", "filled",
+            "remaining", "avgFillPrice", "permId", "parentId", "lastFillPrice",
+            "clientId", "whyHeld", "mktCapPrice")
+
+    def portfolioValue(self):
+        self.pinVersion(8)
+        self.make("contract", "Contract")
+        self.field("contract.conId", decodeIntField)
+        self.field("contract.symbol", decodeStrField)
+        self.field("contract.secType", decodeStrField)
+        self.field("contract.lastTradeDateOrContractMonth", decodeStrField)
+        self.field("contract.strike", decodeFloatField)
+        self.field("contract.right", decodeStrField)
+        self.field("contract.multiplier", decodeStrField)
+        self.field("contract.primaryExchange", decodeStrField)
+        self.field("contract.currency", decodeStrField)
+        self.field("contract.localSymbol", decodeStrField)
+        self.field("contract.tradingClass", decodeStrField)
+        self.field("position", self.positionConvert())
+        self.field("marketPrice", decodeFloatField)
+        self.field("marketValue", decodeFloatField)
+        self.field("averageCost", decodeFloatField)
+        self.field("unrealizedPNL", decodeFloatField)
+        self.field("realizedPNL", decodeFloatField)
+        self.field("accountName", decodeStrField)
+        return self.call("updatePortfolio", "contract", "position",
+            "marketPrice", "marketValue", "averageCost", "unrealizedPNL",
+            "realizedPNL", "accountName")
+
+    def executionData(self):
+        if self.serverVersion < MIN_SERVER_VER_LAST_LIQUIDITY:
+            self.pinVersion(10)
+        self.make("contract", "Contract")
+        self.make("execution", "Execution")
+        self.field("reqId", decodeIntField)
+        self.field("execution.orderId", decodeIntField)
+        self.contractFields("contract")
+        self.field("execution.execId", decodeStrField)
+        self.field("execution.time", decodeStrField)
+        self.field("execution.acctNumber", decodeStrField)
+        self.field("execution.exchange", decodeStrField)
+        self.field("execution.side", decodeStrField)
+        self.field("execution.shares", self.positionConvert())
+        self.field("execution.price", decodeFloatField)
+        self.field("execution.permId", decodeIntField)
+        self.field("execution.clientId", decodeIntField)
+        self.field("execution.liquidation", decodeIntField)
+        self.field("execution.cumQty", decodeFloatField)
+        self.field("execution.avgPrice", decodeFloatField)
+        self.field("execution.orderRef", decodeStrField)
+        self.field("execution.evRule", decodeStrField)
+        self.field("execution.evMultiplier", decodeFloatField)
+        if self.serverVersion >= MIN_SERVER_VER_MODELS_SUPPORT:
+            self.field("execution.modelCode", decodeStrField)
+        if self.serverVersion >= MIN_SERVER_VER_LAST_LIQUIDITY:
+            self.field("execution.lastLiquidity", decodeIntField)
+        return self.call("execDetails", "reqId", "contract", "execution")
+
+    def tickOptionComputation(self):
+        if self.serverVersion < MIN_SERVER_VER_PRICE_BASED_VOLATILITY:
+            # which fields follow depends on the message version and tick type
+            return None
+        self.field("reqId", decodeIntField)
+        self.field("tickType", decodeIntField)
+        self.field("tickAttrib", decodeIntField)
+        self.field("impliedVol", decodeImpliedVol)
+        self.field("delta", notComputed(-2))
+        self.field("optPrice", notComputed(-1))
+        self.field("pvDividend", notComputed(-1))
+        self.field("gamma", notComputed(-2))
+        self.field("vega", notComputed(-2))
+        self.field("theta", notComputed(-2))
+        self.field("undPrice", notComputed(-1))
+        return self.call("tickOptionComputation", "reqId", "tickType",
+            "tickAttrib", "impliedVol", "delta", "optPrice", "pvDividend",
+            "gamma", "vega", "theta", "undPrice")
+
+    def positionData(self):
+        self.pinVersion(3)
+        self.make("contract", "Contract")
+        self.field("account", decodeStrField)
+        self.contractFields("contract")
+        self.field("position", self.positionConvert())
+        self.field("avgCost", decodeFloatField)
+        return self.call("position", "account", "contract", "position", "avgCost")
+
+    def pnl(self):
+        self.field("reqId", decodeIntField)
+        self.field("dailyPnL", decodeFloatField)
+        self.pnlFields()
+        return self.call("pnl", "reqId", "dailyPnL", "unrealizedPnL", "realizedPnL")
+
+    def pnlSingle(self):
+        self.field("reqId", decodeIntField)
+        self.field("pos", decodeIntField)
+        self.field("dailyPnL", decodeFloatField)
+        self.pnlFields()
+        self.field("value", decodeFloatField)
+        return self.call("pnlSingle", "reqId", "pos", "dailyPnL",
+            "unrealizedPnL", "realizedPnL", "value")
+
+    def pnlFields(self):
+        if self.serverVersion >= MIN_SERVER_VER_UNREALIZED_PNL:
+            self.field("unrealizedPnL", decodeFloatField)
+        else:
+            self.const("unrealizedPnL", None)
+        if self.serverVersion >= MIN_SERVER_VER_REALIZED_PNL:
+            self.field("realizedPnL", decodeFloatField)
+        else:
+            self.const("realizedPnL", None)
+
+    def marketDepthL2(self):
+        self.skip()
+        self.field("reqId", decodeIntField)
+        self.field("position", decodeIntField)
+        self.field("marketMaker", decodeStrField)
+        self.field("operation", decodeIntField)
+        self.field("side", decodeIntField)
+        self.field("price", decodeFloatField)
+        self.field("size", decodeIntField)
+        if self.serverVersion >= MIN_SERVER_VER_SMART_DEPTH:
+            self.field("isSmartDepth", decodeBoolField)
+        else:
+            self.const("isSmartDepth", False)
+        return self.call("updateMktDepthL2", "reqId", "position", "marketMaker",
+            "operation", "side", "price", "size", "isSmartDepth")
+
+
+def compileMessagePlan(plan, decoder, fallback):
+    """ turns the plan into a function of the fields that calls the wrapper
+    of decoder, fallback(fields) decodes the messages of another version """
+
+    argIdxs = {name: idx for (idx, name) in enumerate(plan.args)}
+    # the wrapper arguments, with the consts in place
+    template = [plan.consts.get(name) for name in plan.args]
+    objects = tuple((argIdxs[name], getattr(decoder, className))
+                    for (name, className) in plan.objects)
+    # (field index, argument index, convert) of the fields that are
+    # arguments, (field index, argument index, attribute, convert) of the
+    # attributes of the objects
+    argSteps = []
+    attrSteps = []
+    for (idx, step) in enumerate(plan.steps):
+        if step is not None:
+            (target, convert) = step
+            (name, _, attr) = target.partition(".")
+            if attr:
+                attrSteps.append((idx, argIdxs[name], attr, convert))
+            else:
+                argSteps.append((idx, argIdxs[name], convert))
+    argSteps = tuple(argSteps)
+    attrSteps = tuple(attrSteps)
+    pinnedVersion = plan.pinnedVersion
+    wrapperMeth = getattr(decoder.wrapper, plan.wrapperMeth)
+
+    def decodeMsg(fields):
+        args = template.copy()
+        try:
+            if pinnedVersion is not None and \
+                    int(fields[pinnedVersion[0]] or 0) != pinnedVersion[1]:
+                return fallback(fields)
+            for (argIdx, cls) in objects:
+                args[argIdx] = cls()
+            for (idx, argIdx, convert) in argSteps:
+                args[argIdx] = convert(fields[idx])
+            for (idx, argIdx, attr, convert) in attrSteps:
+                setattr(args[argIdx], attr, convert(fields[idx]))
+        except IndexError:
+            raise BadMessage("no more fields")
+        wrapperMeth(*args)
+
+    decodeMsg.__name__ = "decode_" + plan.wrapperMeth
+    return decodeMsg
+
+
+MESSAGE_PLANS = (
+    (IN.ORDER_STATUS, MessagePlan.orderStatus, "processOrderStatusMsg"),
+    (IN.PORTFOLIO_VALUE, MessagePlan.portfolioValue, "processPortfolioValueMsg"),
+    (IN.EXECUTION_DATA, MessagePlan.executionData, "processExecutionDataMsg"),
+    (IN.TICK_OPTION_COMPUTATION, MessagePlan.tickOptionComputation, "processTickOptionComputationMsg"),
+    (IN.POSITION_DATA, MessagePlan.positionData, "processPositionDataMsg"),
+    (IN.PNL, MessagePlan.pnl, "processPnLMsg"),
+    (IN.PNL_SINGLE, MessagePlan.pnlSingle, "processPnLSingleMsg"),
+    (IN.MARKET_DEPTH_L2, MessagePlan.marketDepthL2, "processMarketDepthL2Msg"),
+)
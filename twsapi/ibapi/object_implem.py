@@ -5,6 +5,9 @@ Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is su
 
 
 class Object(object):
+    # lets subclasses that declare __slots__ do without a __dict__
+    __slots__ = ()
+
     def __str__(self):
         return "Object"
 
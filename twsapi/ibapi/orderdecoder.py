@@ -11,7 +11,6 @@ from ibapi.order import OrderComboLeg
 from ibapi.contract import ComboLeg
 from ibapi.tag_value import TagValue
 from ibapi.wrapper import DeltaNeutralContract
-from ibapi.softdollartier import SoftDollarTier
 
 logger = logging.getLogger(__name__)
 
@@ -390,7 +389,8 @@ class OrderDecoder(Object):
             name = decode(str, fields)
             value = decode(str, fields)
             displayName = decode(str, fields)
-            self.order.softDollarTier = SoftDollarTier(name, value, displayName)
+            # keeps the compact class of a compact order
+            self.order.softDollarTier = type(self.order.softDollarTier)(name, value, displayName)
 
     def decodeCashQty(self, fields):
         if self.serverVersion >= MIN_SERVER_VER_CASH_QTY:
@@ -449,3 +449,328 @@ class OrderDecoder(Object):
     def decodePostToAts(self, fields):
         if self.serverVersion >= MIN_SERVER_VER_POST_TO_ATS:
             self.order.postToAts = decode(int, fields, SHOW_UNSET)
+
+
+######################################################################
+# Table driven decoding of OPEN_ORDER and COMPLETED_ORDER.
+#
+# The field layout of both messages only depends on the message version and
+# the server version, so it is compiled once into a flat plan: a list of
+# (target, attr, convert) steps. The steps whose layout depends on the values
+# received (combo legs, algo params, conditions, ...) stay with the
+# OrderDecoder methods above and are run as COMPLEX steps. With a projection
+# only the attributes it names are converted, the other fields are skipped.
+
+(PLAN_CONTRACT, PLAN_ORDER, PLAN_ORDER_STATE, PLAN_SKIP, PLAN_COMPLEX) = range(5)
+
+# what IBapi-like callers look at: the contract's identity, the order's
+# identity, side, type and prices and the order's status
+ORDER_SUMMARY = frozenset(("orderId", "conId", "symbol", "secType",
+    "exchange", "currency", "localSymbol", "action", "totalQuantity",
+    "orderType", "lmtPrice", "auxPrice", "tif", "account", "clientId",
+    "permId", "parentId", "trailStopPrice", "trailingPercent",
+    "percentOffset", "adjustedOrderType", "triggerPrice",
+    "adjustedStopPrice", "adjustedStopLimitPrice", "adjustedTrailingAmount",
+    "status"))
+
+
+def decodeStrField(s):
+    return s.decode(errors='backslashreplace') if type(s) is bytes else s
+
+def decodeIntField(s):
+    return int(s or 0)
+
+def decodeIntOrUnset(s):
+    return int(s) if s else UNSET_INTEGER
+
+def decodeFloatField(s):
+    return float(s or 0)
+
+def decodeFloatOrUnset(s):
+    return float(s) if s else UNSET_DOUBLE
+
+def decodeBoolField(s):
+    return int(s or 0) != 0
+
+
+class OrderDecodePlan(Object):
+    """ builds the plan of one message for one (version, serverVersion)
+    pair, each method mirrors the OrderDecoder method of the same name """
+
+    def __init__(self, version, serverVersion, projection=None):
+        self.version = version
+        self.serverVersion = serverVersion
+        if projection is not None:
+            # decodePegToBenchParams looks at it
+            projection = projection | {"orderType"}
+        self.projection = projection
+        self.steps = []
+
+    def __str__(self):
+        return "OrderDecodePlan: %d steps" % len(self.steps)
+
+    def field(self, target, attr, convert):
+        if self.projection is None or attr in self.projection:
+            self.steps.append((target, attr, convert))
+        else:
+            self.skip()
+
+    def skip(self):
+        self.steps.append((PLAN_SKIP, None, None))
+
+    def complex(self, meth, *args):
+        self.steps.append((PLAN_COMPLEX, meth, args))
+
+    def orderField(self, attr, convert):
+        self.field(PLAN_ORDER, attr, convert)
+
+    def decodeOrderId(self):
+        self.orderField("orderId", decodeIntField)
+
+    def decodeContractFields(self):
+        self.field(PLAN_CONTRACT, "conId", decodeIntField)
+        self.field(PLAN_CONTRACT, "symbol", decodeStrField)
+        self.field(PLAN_CONTRACT, "secType", decodeStrField)
+        self.field(PLAN_CONTRACT, "lastTradeDateOrContractMonth", decodeStrField)
+        self.field(PLAN_CONTRACT, "strike", decodeFloatField)
+        self.field(PLAN_CONTRACT, "right", decodeStrField)
+        if self.version >= 32:
+            self.field(PLAN_CONTRACT, "multiplier", decodeStrField)
+        self.field(PLAN_CONTRACT, "exchange", decodeStrField)
+        self.field(PLAN_CONTRACT, "currency", decodeStrField)
+        self.field(PLAN_CONTRACT, "localSymbol", decodeStrField)
+        if self.version >= 32:
+            self.field(PLAN_CONTRACT, "tradingClass", decodeStrField)
+
+    def decodeMainOrderFields(self):
+        # action through goodAfterTime, clientId is not in COMPLETED_ORDER
+        self.orderField("action", decodeStrField)
+        if self.serverVersion >= MIN_SERVER_VER_FRACTIONAL_POSITIONS:
+            self.orderField("totalQuantity", decodeFloatField)
+        else:
+            self.orderField("totalQuantity", decodeIntField)
+        self.orderField("orderType", decodeStrField)
+        self.orderField("lmtPrice", decodeFloatField if self.version < 29 else decodeFloatOrUnset)
+        self.orderField("auxPrice", decodeFloatField if self.version < 30 else decodeFloatOrUnset)
+        self.orderField("tif", decodeStrField)
+        self.orderField("ocaGroup", decodeStrField)
+        self.orderField("account", decodeStrField)
+        self.orderField("openClose", decodeStrField)
+        self.orderField("origin", decodeIntField)
+        self.orderField("orderRef", decodeStrField)
+
+    def decodeFAParams(self):
+        self.orderField("faGroup", decodeStrField)
+        self.orderField("faMethod", decodeStrField)
+        self.orderField("faPercentage", decodeStrField)
+        self.orderField("faProfile", decodeStrField)
+        if self.serverVersion >= MIN_SERVER_VER_MODELS_SUPPORT:
+            self.orderField("modelCode", decodeStrField)
+
+    def decodeShortSaleParams(self):
+        self.orderField("shortSaleSlot", decodeIntField)
+        self.orderField("designatedLocation", decodeStrField)
+        if self.serverVersion == MIN_SERVER_VER_SSHORTX_OLD:
+            self.skip()
+        elif self.version >= 23:
+            self.orderField("exemptCode", decodeIntField)
+
+    def decodeBoxAndPegToStkParams(self):
+        self.orderField("startingPrice", decodeFloatOrUnset)
+        self.orderField("stockRefPrice", decodeFloatOrUnset)
+        self.orderField("delta", decodeFloatOrUnset)
+        self.orderField("stockRangeLower", decodeFloatOrUnset)
+        self.orderField("stockRangeUpper", decodeFloatOrUnset)
+        self.orderField("displaySize", decodeIntOrUnset)
+
+    def decodeTrailParams(self):
+        self.orderField("trailStopPrice", decodeFloatOrUnset)
+        if self.version >= 30:
+            self.orderField("trailingPercent", decodeFloatOrUnset)
+
+    def decodeComboToAlgoParams(self, withOptOutSmartRouting):
+        self.complex(OrderDecoder.decodeComboLegs)
+        self.complex(OrderDecoder.decodeSmartComboRoutingParams)
+        self.complex(OrderDecoder.decodeScaleOrderParams)
+        self.complex(OrderDecoder.decodeHedgeParams)
+        if withOptOutSmartRouting and self.version >= 25:
+            self.orderField("optOutSmartRouting", decodeBoolField)
+        self.orderField("clearingAccount", decodeStrField)
+        self.orderField("clearingIntent", decodeStrField)
+        if self.version >= 22:
+            self.orderField("notHeld", decodeBoolField)
+        self.complex(OrderDecoder.decodeDeltaNeutral)
+        self.complex(OrderDecoder.decodeAlgoParams)
+        if self.version >= 33:
+            self.orderField("solicited", decodeBoolField)
+
+    def decodeWhatIfInfoAndCommission(self):
+        self.orderField("whatIf", decodeBoolField)
+        self.field(PLAN_ORDER_STATE, "status", decodeStrField)
+        if self.serverVersion >= MIN_SERVER_VER_WHAT_IF_EXT_FIELDS:
+            for attr in ("initMarginBefore", "maintMarginBefore",
+                         "equityWithLoanBefore", "initMarginChange",
+                         "maintMarginChange", "equityWithLoanChange"):
+                self.field(PLAN_ORDER_STATE, attr, decodeStrField)
+        for attr in ("initMarginAfter", "maintMarginAfter", "equityWithLoanAfter"):
+            self.field(PLAN_ORDER_STATE, attr, decodeStrField)
+        for attr in ("commission", "minCommission", "maxCommission"):
+            self.field(PLAN_ORDER_STATE, attr, decodeFloatOrUnset)
+        self.field(PLAN_ORDER_STATE, "commissionCurrency", decodeStrField)
+        self.field(PLAN_ORDER_STATE, "warningText", decodeStrField)
+
+    def decodeVolRandomizeToConditions(self):
+        if self.version >= 34:
+            self.orderField("randomizeSize", decodeBoolField)
+            self.orderField("randomizePrice", decodeBoolField)
+        if self.serverVersion >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
+            self.complex(OrderDecoder.decodePegToBenchParams)
+            self.complex(OrderDecoder.decodeConditions)
+
+    def decodeAdjustedOrderParams(self):
+        if self.serverVersion >= MIN_SERVER_VER_PEGGED_TO_BENCHMARK:
+            self.orderField("adjustedOrderType", decodeStrField)
+            self.orderField("triggerPrice", decodeFloatField)
+            self.orderField("trailStopPrice", decodeFloatField)
+            self.orderField("lmtPriceOffset", decodeFloatField)
+            self.orderField("adjustedStopPrice", decodeFloatField)
+            self.orderField("adjustedStopLimitPrice", decodeFloatField)
+            self.orderField("adjustedTrailingAmount", decodeFloatField)
+            self.orderField("adjustableTrailingUnit", decodeIntField)
+
+    def decodeCashQtyToOmsContainers(self):
+        if self.serverVersion >= MIN_SERVER_VER_CASH_QTY:
+            self.orderField("cashQty", decodeFloatField)
+        if self.serverVersion >= MIN_SERVER_VER_AUTO_PRICE_FOR_HEDGE:
+            self.orderField("dontUseAutoPriceForHedge", decodeBoolField)
+        if self.serverVersion >= MIN_SERVER_VER_ORDER_CONTAINER:
+            self.orderField("isOmsContainer", decodeBoolField)
+
+    def openOrder(self):
+        """ same layout as Decoder.processOpenOrder, after the version """
+
+        self.decodeOrderId()
+        self.decodeContractFields()
+        self.decodeMainOrderFields()
+        self.orderField("clientId", decodeIntField)
+        self.orderField("permId", decodeIntField)
+        self.orderField("outsideRth", decodeBoolField)
+        self.orderField("hidden", decodeBoolField)
+        self.orderField("discretionaryAmt", decodeFloatField)
+        self.orderField("goodAfterTime", decodeStrField)
+        self.skip() # sharesAllocation, deprecated
+        self.decodeFAParams()
+        self.orderField("goodTillDate", decodeStrField)
+        self.orderField("rule80A", decodeStrField)
+        self.orderField("percentOffset", decodeFloatOrUnset)
+        self.orderField("settlingFirm", decodeStrField)
+        self.decodeShortSaleParams()
+        self.orderField("auctionStrategy", decodeIntField)
+        self.decodeBoxAndPegToStkParams()
+        self.orderField("blockOrder", decodeBoolField)
+        self.orderField("sweepToFill", decodeBoolField)
+        self.orderField("allOrNone", decodeBoolField)
+        self.orderField("minQty", decodeIntOrUnset)
+        self.orderField("ocaType", decodeIntField)
+        self.skip() # eTradeOnly, deprecated
+        self.skip() # firmQuoteOnly, deprecated
+        self.skip() # nbboPriceCap, deprecated
+        self.orderField("parentId", decodeIntField)
+        self.orderField("triggerMethod", decodeIntField)
+        self.complex(OrderDecoder.decodeVolOrderParams, True)
+        self.decodeTrailParams()
+        self.orderField("basisPoints", decodeFloatOrUnset)
+        self.orderField("basisPointsType", decodeIntOrUnset)
+        self.decodeComboToAlgoParams(True)
+        self.decodeWhatIfInfoAndCommission()
+        self.decodeVolRandomizeToConditions()
+        self.decodeAdjustedOrderParams()
+        if self.serverVersion >= MIN_SERVER_VER_SOFT_DOLLAR_TIER:
+            self.complex(OrderDecoder.decodeSoftDollarTier)
+        self.decodeCashQtyToOmsContainers()
+        if self.serverVersion >= MIN_SERVER_VER_D_PEG_ORDERS:
+            self.orderField("discretionaryUpToLimitPrice", decodeBoolField)
+        if self.serverVersion >= MIN_SERVER_VER_PRICE_MGMT_ALGO:
+            self.orderField("usePriceMgmtAlgo", decodeBoolField)
+        if self.serverVersion >= MIN_SERVER_VER_DURATION:
+            self.orderField("duration", decodeIntOrUnset)
+        if self.serverVersion >= MIN_SERVER_VER_POST_TO_ATS:
+            self.orderField("postToAts", decodeIntOrUnset)
+        return self.steps
+
+    def completedOrder(self):
+        """ same layout as Decoder.processCompletedOrderMsg """
+
+        self.decodeContractFields()
+        self.decodeMainOrderFields()
+        self.orderField("permId", decodeIntField)
+        self.orderField("outsideRth", decodeBoolField)
+        self.orderField("hidden", decodeBoolField)
+        self.orderField("discretionaryAmt", decodeFloatField)
+        self.orderField("goodAfterTime", decodeStrField)
+        self.decodeFAParams()
+        self.orderField("goodTillDate", decodeStrField)
+        self.orderField("rule80A", decodeStrField)
+        self.orderField("percentOffset", decodeFloatOrUnset)
+        self.orderField("settlingFirm", decodeStrField)
+        self.decodeShortSaleParams()
+        self.decodeBoxAndPegToStkParams()
+        self.orderField("sweepToFill", decodeBoolField)
+        self.orderField("allOrNone", decodeBoolField)
+        self.orderField("minQty", decodeIntOrUnset)
+        self.orderField("ocaType", decodeIntField)
+        self.orderField("triggerMethod", decodeIntField)
+        self.complex(OrderDecoder.decodeVolOrderParams, False)
+        self.decodeTrailParams()
+        self.decodeComboToAlgoParams(False)
+        self.field(PLAN_ORDER_STATE, "status", decodeStrField)
+        self.decodeVolRandomizeToConditions()
+        self.orderField("trailStopPrice", decodeFloatField)
+        self.orderField("lmtPriceOffset", decodeFloatField)
+        self.decodeCashQtyToOmsContainers()
+        self.orderField("autoCancelDate", decodeStrField)
+        self.orderField("filledQuantity", decodeFloatField)
+        self.orderField("refFuturesConId", decodeIntField)
+        self.orderField("autoCancelParent", decodeBoolField)
+        self.orderField("shareholder", decodeStrField)
+        self.orderField("imbalanceOnly", decodeBoolField)
+        self.orderField("routeMarketableToBbo", decodeBoolField)
+        self.orderField("parentPermId", decodeIntField)
+        self.field(PLAN_ORDER_STATE, "completedTime", decodeStrField)
+        self.field(PLAN_ORDER_STATE, "completedStatus", decodeStrField)
+        return self.steps
+
+
+# the OrderDecoder attributes of PLAN_CONTRACT, PLAN_ORDER and PLAN_ORDER_STATE
+PLAN_TARGET_NAMES = ("contract", "order", "orderState")
+
+
+def compileOrderPlan(plan):
+    """ turns the plan steps into a function of (orderDecoder, fields) that
+    runs them in turn on the contract, order and orderState of
+    orderDecoder """
+
+    steps = tuple(plan)
+
+    def runPlan(orderDecoder, fields):
+        targets = (orderDecoder.contract, orderDecoder.order, orderDecoder.orderState)
+        for (target, attr, convert) in steps:
+            if target < PLAN_SKIP:
+                setattr(targets[target], attr, convert(next(fields)))
+            elif target == PLAN_SKIP:
+                next(fields)
+            else:
+                # attr is the OrderDecoder method, convert its arguments
+                attr(orderDecoder, fields, *convert)
+
+    return runPlan
+
+
+def runOrderPlan(orderDecoder, runPlan, fields):
+    """ runs a compiled plan on fields, an iterator, with the contract,
+    order and orderState of orderDecoder """
+
+    try:
+        runPlan(orderDecoder, fields)
+    except StopIteration:
+        raise BadMessage("no more fields")
@@ -0,0 +1,165 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Paces the outbound messages so the client never exceeds the number of
+messages per second TWS accepts (50 by default).
+Messages are sent straight away while the token bucket has tokens, the others
+wait in a priority queue served by a pacing thread: order placement and
+cancellation go first, everything else keeps its FIFO order. Cancellations of
+subscriptions stay in the FIFO so they are never sent before the request they
+cancel. The client's flush() and disconnect() wait a bounded time for the
+queue to drain, so orders placed right before a disconnect still go out.
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+from ibapi.message import OUT
+
+
+logger = logging.getLogger(__name__)
+
+
+(ORDER_PRIORITY, DATA_PRIORITY) = range(2)
+
+ORDER_MSG_IDS = frozenset(str(msgId) for msgId in (OUT.PLACE_ORDER,
+    OUT.CANCEL_ORDER, OUT.REQ_GLOBAL_CANCEL))
+
+
+def msgPriority(msg):
+    """ priority class of the message text, before its length prefix is
+    added """
+    return ORDER_PRIORITY if msg[:msg.find("\0")] in ORDER_MSG_IDS else DATA_PRIORITY
+
+
+class Pacer:
+    # at most burst + rate messages go out in any 1 second window
+    DEFAULT_RATE = 40
+    DEFAULT_BURST = 10
+    # how long flush() and disconnect() wait for the waiting messages
+    DRAIN_TIMEOUT = 5
+
+    def __init__(self, send, rate=DEFAULT_RATE, burst=DEFAULT_BURST, flush=None,
+                 disconnect=None):
+        self.send = send
+        # called after an order is sent, so that it does not wait in a
+        # coalescing buffer
+        self.flush = flush
+        # called on the pacing thread when a send fails
+        self.disconnect = disconnect
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.queue = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.thread = None
+        self.done = False
+        self.sending = False        # the pacing thread is sending a message
+        self.nDelayed = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def sendMsg(self, msg, priority=DATA_PRIORITY):
+        """ sends msg now if the pace allows it and nothing is waiting,
+        queues it otherwise """
+        with self.cond:
+            if self.done:
+                return
+            self._refill()
+            if not self.queue and not self.sending and self.tokens >= 1:
+                self.tokens -= 1
+                self._send(msg, priority)
+                return
+            heapq.heappush(self.queue, (priority, self.seq, msg))
+            self.seq += 1
+            self.nDelayed += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="Pacer",
+                                               daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _send(self, msg, priority):
+        self.send(msg)
+        if priority == ORDER_PRIORITY and self.flush is not None:
+            self.flush()
+
+    def pending(self):
+        return len(self.queue)
+
+    def run(self):
+        while True:
+            with self.cond:
+                self.sending = False
+                self.cond.notify_all()
+                while not self.done:
+                    if not self.queue:
+                        self.cond.wait()
+                        continue
+                    self._refill()
+                    if self.tokens < 1:
+                        self.cond.wait((1 - self.tokens) / self.rate)
+                        continue
+                    break
+                if self.done:
+                    return
+                self.tokens -= 1
+                (priority, _, msg) = heapq.heappop(self.queue)
+                self.sending = True
+            # callers of sendMsg do not wait for the socket
+            try:
+                self._send(msg, priority)
+            except OSError as exc:
+                self._sendFailed(exc)
+                return
+
+    def _sendFailed(self, exc):
+        with self.cond:
+            dropped = self.queue
+            self.queue = []
+            self.done = True
+            self.sending = False
+            self.cond.notify_all()
+        logger.error("pacer could not send, disconnecting: %s; %d waiting messages "
+                     "dropped, %d of them orders", exc, len(dropped), countOrders(dropped))
+        if self.disconnect is not None:
+            self.disconnect()
+
+    def drain(self, timeout=None):
+        """ waits up to timeout seconds for the waiting messages to be sent,
+        returns True if none is left """
+        with self.cond:
+            self.cond.wait_for(lambda: self.done or not (self.queue or self.sending),
+                               timeout)
+            return not (self.queue or self.sending)
+
+    def stop(self, timeout=0):
+        """ ends the pacing thread once the waiting messages are sent or
+        after timeout seconds, the ones still waiting then are dropped """
+        if timeout:
+            self.drain(timeout)
+        with self.cond:
+            self.done = True
+            dropped = self.queue
+            self.queue = []
+            self.cond.notify_all()
+        if dropped:
+            nOrders = countOrders(dropped)
+            logger.log(logging.ERROR if nOrders else logging.WARNING,
+                       "pacer stopped with %d messages not sent, %d of them orders",
+                       len(dropped), nOrders)
+
+
+def countOrders(queue):
+    return sum(1 for (priority, _, _) in queue if priority == ORDER_PRIORITY)
@@ -0,0 +1,242 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Several API connections used as one client.
+An EClientPool keeps the application's own EClient as the primary connection,
+which places the orders and makes every request the pool does not route,
+and opens secondary connections with the next clientIds, optionally to other
+Gateway ports, for the market data. Every connection has its own socket,
+reader thread, decoder and pacing budget, so a flood of ticks does not delay
+the order traffic and the number of subscriptions scales with the number of
+connections.
+
+The market data subscriptions are spread over the secondaries, a new one
+going to the connection with the fewest, and their cancel goes to the
+connection that made them. All the callbacks end up in the primary's
+wrapper, the ones of the secondaries come from their own threads.
+"""
+
+import logging
+import threading
+
+from ibapi.client import EClient
+
+
+logger = logging.getLogger(__name__)
+
+
+# what a secondary connection copies from the primary before it connects
+CLIENT_OPTIONS = ("framerBufSize", "recvSize", "eventDriven", "dispatchMode",
+    "rawTickAttribs", "compactObjects", "historicalBatch",
+    "historicalTicksBatch", "orderProjection", "lazyFields", "coalesceSize",
+    "coalesceDelay", "conflateTicks", "queueLimit", "pacingRate", "pacingBurst")
+
+
+class SecondaryWrapper(object):
+    """ the wrapper of a secondary connection, it forwards the callbacks to
+    the primary's wrapper but for nextValidId, managedAccounts and
+    connectionClosed: the order ids, accounts and the application's
+    connection are the primary's business """
+
+    def __init__(self, wrapper, pool):
+        self.wrapper = wrapper
+        self.pool = pool
+        self.nextId = None
+        self.ready = threading.Event()
+
+    def __getattr__(self, name):
+        return getattr(self.wrapper, name)
+
+    def nextValidId(self, orderId:int):
+        # the API is started on this connection
+        self.nextId = orderId
+        self.ready.set()
+
+    def managedAccounts(self, accountsList:str):
+        pass
+
+    def connectionClosed(self):
+        # the application's connection is the primary's, the pool stops
+        # giving subscriptions to this one
+        logger.info("secondary connection closed")
+        self.pool.dropSecondary(self)
+
+    def tickSnapshotEnd(self, reqId:int):
+        self.pool.release(reqId)
+        self.wrapper.tickSnapshotEnd(reqId)
+
+
+class EClientPool(object):
+    """ primary is the application's EClient, nSecondaries connections are
+    opened next to it for the market data. ports are the ports of the
+    secondaries, used in turn, by default they connect to the primary's. """
+
+    def __init__(self, primary, nSecondaries=1, ports=None, readyTimeout=10):
+        self.primary = primary
+        self.ports = ports
+        self.readyTimeout = readyTimeout
+        self.secondaries = [EClient(SecondaryWrapper(primary.wrapper, self))
+                            for _ in range(nSecondaries)]
+        self.threads = []
+        self.dataClients = [primary]
+        self.lock = threading.Lock()
+        self.owners = {}            # reqId of a subscription: its connection
+        self.loads = {}             # connection: number of subscriptions
+
+    def __getattr__(self, name):
+        # orders, account and every other request go to the primary
+        return getattr(self.primary, name)
+
+    def connect(self, host, port, clientId):
+        """ connects the primary with clientId and the secondaries with the
+        next ones. The primary's message loop is still for the application
+        to run(), the secondaries run theirs on their own threads. A
+        secondary that is not ready after readyTimeout is left out. """
+
+        self.primary.connect(host, port, clientId)
+        if not self.primary.isConnected():
+            return
+
+        for (idx, secondary) in enumerate(self.secondaries):
+            for option in CLIENT_OPTIONS:
+                setattr(secondary, option, getattr(self.primary, option))
+            secondary.wrapper.ready.clear()
+            secondaryPort = self.ports[idx % len(self.ports)] if self.ports else port
+            secondary.connect(host, secondaryPort, clientId + 1 + idx)
+            if secondary.isConnected():
+                thread = threading.Thread(target=secondary.run, daemon=True,
+                                          name="ibapiPool%d" % (clientId + 1 + idx))
+                thread.start()
+                self.threads.append(thread)
+
+        dataClients = []
+        for secondary in self.secondaries:
+            if secondary.isConnected() and secondary.wrapper.ready.wait(self.readyTimeout):
+                dataClients.append(secondary)
+            elif secondary.conn is not None:
+                logger.warning("secondary connection %s:%s is not ready, leaving it out",
+                               secondary.host, secondary.port)
+                secondary.disconnect()
+
+        with self.lock:
+            self.dataClients = dataClients or [self.primary]
+            self.owners = {}
+            self.loads = {client: 0 for client in self.dataClients}
+        if dataClients:
+            logger.info("pool connected with %d market data connections",
+                        len(dataClients))
+        else:
+            logger.info("pool connected, market data goes over the primary connection")
+
+    def disconnect(self):
+        for secondary in self.secondaries:
+            secondary.disconnect()
+        for thread in self.threads:
+            thread.join(2)
+        self.threads = []
+        self.primary.disconnect()
+        with self.lock:
+            self.dataClients = [self.primary]
+            self.owners = {}
+            self.loads = {}
+
+    def isConnected(self):
+        return self.primary.isConnected()
+
+    def flush(self):
+        for client in self.clients():
+            client.flush()
+
+    def clients(self):
+        return [self.primary] + [secondary for secondary in self.secondaries
+                                 if secondary.isConnected()]
+
+    def dropSecondary(self, wrapper):
+        """ leaves the secondary of wrapper out once its connection is
+        closed; its subscriptions are lost with it and are forgotten, the
+        new ones go to the other connections, or the primary if none is
+        left """
+
+        with self.lock:
+            dropped = [client for client in self.dataClients if client.wrapper is wrapper]
+            if not dropped:
+                return
+            (client, ) = dropped
+            self.dataClients = [other for other in self.dataClients if other is not client]
+            self.loads.pop(client, None)
+            lost = [reqId for (reqId, owner) in self.owners.items() if owner is client]
+            for reqId in lost:
+                del self.owners[reqId]
+            if not self.dataClients:
+                self.dataClients = [self.primary]
+                self.loads[self.primary] = 0
+        logger.warning("secondary connection %s:%s dropped with %d subscriptions",
+                       client.host, client.port, len(lost))
+
+    def acquire(self, reqId):
+        """ the connection of the subscription reqId, a new one goes to the
+        least loaded connection """
+
+        with self.lock:
+            client = self.owners.get(reqId)
+            if client is None:
+                client = min(self.dataClients, key=lambda c: self.loads.get(c, 0))
+                self.owners[reqId] = client
+                self.loads[client] = self.loads.get(client, 0) + 1
+            return client
+
+    def release(self, reqId):
+        """ forgets the subscription reqId and returns its connection, the
+        primary if it is unknown """
+
+        with self.lock:
+            client = self.owners.pop(reqId, None)
+            if client is None:
+                return self.primary
+            self.loads[client] -= 1
+            return client
+
+    def connectionOf(self, reqId):
+        with self.lock:
+            return self.owners.get(reqId, self.primary)
+
+    def reqMarketDataType(self, marketDataType:int):
+        # it is a setting of each connection
+        for client in self.clients():
+            client.reqMarketDataType(marketDataType)
+
+    def reqMktData(self, reqId, contract, genericTickList:str, snapshot:bool,
+                   regulatorySnapshot:bool, mktDataOptions):
+        self.acquire(reqId).reqMktData(reqId, contract, genericTickList,
+            snapshot, regulatorySnapshot, mktDataOptions)
+
+    def cancelMktData(self, reqId):
+        self.release(reqId).cancelMktData(reqId)
+
+    def reqTickByTickData(self, reqId:int, contract, tickType:str,
+                          numberOfTicks:int, ignoreSize:bool):
+        self.acquire(reqId).reqTickByTickData(reqId, contract, tickType,
+            numberOfTicks, ignoreSize)
+
+    def cancelTickByTickData(self, reqId:int):
+        self.release(reqId).cancelTickByTickData(reqId)
+
+    def reqMktDepth(self, reqId, contract, numRows:int, isSmartDepth:bool,
+                    mktDepthOptions):
+        self.acquire(reqId).reqMktDepth(reqId, contract, numRows,
+            isSmartDepth, mktDepthOptions)
+
+    def cancelMktDepth(self, reqId, isSmartDepth:bool):
+        self.release(reqId).cancelMktDepth(reqId, isSmartDepth)
+
+    def reqRealTimeBars(self, reqId, contract, barSize:int, whatToShow:str,
+                        useRTH:bool, realTimeBarsOptions):
+        self.acquire(reqId).reqRealTimeBars(reqId, contract, barSize,
+            whatToShow, useRTH, realTimeBarsOptions)
+
+    def cancelRealTimeBars(self, reqId):
+        self.release(reqId).cancelRealTimeBars(reqId)
@@ -14,41 +14,94 @@ remove the size prefix and put the rest in a Queue.
 import logging
 from threading import Thread
 
-from ibapi import comm
+from ibapi import (comm, utils)
 
 
 logger = logging.getLogger(__name__)
 
 
 class EReader(Thread):
-    def __init__(self, conn, msg_queue):
+    def __init__(self, conn, msg_queue, framer=None, dispatch=None, batch=False,
+                 recorder=None):
         super().__init__()
         self.conn = conn
         self.msg_queue = msg_queue
+        self.framer = framer
+        # if dispatch is given the frames are handed to it on this thread
+        # instead of going through msg_queue; in batch mode all the frames of
+        # one read go through msg_queue as a single list
+        self.dispatch = dispatch
+        self.batch = batch
+        # a recorder.WireRecorder capturing the frames, closed when the
+        # thread ends
+        self.recorder = recorder
 
     def run(self):
         try:
             logger.debug("EReader thread started")
-            buf = b""
-            while self.conn.isConnected():
+            if self.framer is not None:
+                self.readFramed()
+            else:
+                self.readBuffered()
+            logger.debug("EReader thread finished")
+        except:
+            logger.exception('unhandled exception in EReader thread')
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.conn.eventDriven:
+                # the message loop blocks without a timeout, wake it up
+                self.msg_queue.put(b"")
+
+    def deliver(self, msgs):
+        if self.recorder is not None:
+            self.recorder.record(msgs)
+        if self.dispatch is not None:
+            for msg in msgs:
+                self.dispatch(msg)
+        elif self.batch:
+            if msgs:
+                self.msg_queue.put(msgs)
+        else:
+            for msg in msgs:
+                self.msg_queue.put(msg)
+
+    def readBuffered(self):
+        buf = b""
+        while self.conn.isConnected():
 
-                data = self.conn.recvMsg()
+            data = self.conn.recvMsg()
+            if utils.TRACE:
                 logger.debug("reader loop, recvd size %d", len(data))
-                buf += data
+            buf += data
 
-                while len(buf) > 0:
-                    (size, msg, buf) = comm.read_msg(buf)
-                    #logger.debug("resp %s", buf.decode('ascii'))
+            msgs = []
+            while len(buf) > 0:
+                (size, msg, buf) = comm.read_msg(buf)
+                #logger.debug("resp %s", buf.decode('ascii'))
+                if utils.TRACE:
                     logger.debug("size:%d msg.size:%d msg:|%s| buf:%s|", size,
                         len(msg), buf, "|")
 
-                    if msg:
-                        self.msg_queue.put(msg)
-                    else:
+                if msg:
+                    msgs.append(msg)
+                else:
+                    if utils.TRACE:
                         logger.debug("more incoming packet(s) are needed ")
-                        break
+                    break
+            self.deliver(msgs)
 
-            logger.debug("EReader thread finished")
-        except:
-            logger.exception('unhandled exception in EReader thread')
+    def readFramed(self):
+        """ same as readBuffered() but the socket reads straight into
+        self.framer's buffer, so a burst of N frames no longer copies the tail
+        N times and no bytes object is allocated per read """
+
+        while self.conn.isConnected():
+
+            nBytes = self.conn.recvMsgInto(self.framer)
+            if utils.TRACE:
+                logger.debug("reader loop, recvd size %d", nBytes)
 
+            # the views are only valid until the next read, the payloads are
+            # copied before they leave this loop
+            self.deliver([bytes(msg) for msg in self.framer.frames()])
@@ -0,0 +1,147 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Capture and replay of the inbound wire traffic.
+The WireRecorder appends every framed message the EReader receives to a file,
+with the monotonic time it was read at. The WireReplayer memory maps such a
+file and feeds the messages to a Decoder, either at the recorded pace or as
+fast as possible, which gives a reproducible load without a TWS connection.
+
+A recording is the MAGIC header followed by records made of a RECORD_HEADER
+(receive time in ns, kind, payload size) and the payload. A SESSION record
+carries the server version and connection time of the handshake, the MESSAGE
+records carry the payload of one inbound message without its size prefix.
+Sessions of later connections are appended to the same file.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import time
+
+from ibapi import comm
+
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"IBWIRE\0\1"
+RECORD_HEADER = struct.Struct("<qBI")
+
+SESSION = 0
+MESSAGE = 1
+
+
+class WireRecorder(object):
+    """ appends the messages handed to record() to path, it is only written
+    from the EReader thread """
+
+    def __init__(self, path, bufSize=1 << 16):
+        self.path = path
+        self.file = open(path, "ab", buffering=bufSize)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.nMsgs = 0
+
+    def startSession(self, serverVersion, connTime):
+        # connTime is the handshake field as received, bytes
+        if isinstance(connTime, bytes):
+            connTime = connTime.decode(errors="backslashreplace")
+        payload = comm.make_field(serverVersion) + comm.make_field(connTime)
+        self.writeRecord(time.monotonic_ns(), SESSION, payload.encode())
+
+    def record(self, msgs):
+        """ records the messages of one read, they share its receive time """
+
+        now = time.monotonic_ns()
+        for msg in msgs:
+            self.writeRecord(now, MESSAGE, msg)
+        self.nMsgs += len(msgs)
+
+    def writeRecord(self, timestamp, kind, payload):
+        self.file.write(RECORD_HEADER.pack(timestamp, kind, len(payload)))
+        self.file.write(payload)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            logger.info("recorded %d msgs to %s", self.nMsgs, self.path)
+
+
+class WireReplayer(object):
+    """ reads a recording made by WireRecorder, use it as a context manager
+    or close() it """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if size else b""
+        if self.buf[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a wire recording" % path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+    def records(self):
+        """ generates (timestamp, kind, payload) for every complete record """
+
+        buf = self.buf
+        pos = len(MAGIC)
+        end = len(buf)
+        while pos + RECORD_HEADER.size <= end:
+            (timestamp, kind, size) = RECORD_HEADER.unpack_from(buf, pos)
+            pos += RECORD_HEADER.size
+            if pos + size > end:
+                # the recorder was stopped in the middle of a write
+                logger.warning("truncated record at %d in %s", pos, self.path)
+                break
+            yield (timestamp, kind, buf[pos:pos + size])
+            pos += size
+
+    def replay(self, decoder, speed=None, lazyFields=False):
+        """ feeds the recorded messages to decoder.interpret() and returns how
+        many were fed. With speed None they go as fast as possible, otherwise
+        the recorded gaps are kept, divided by speed. A session record sets
+        the decoder's serverVersion. """
+
+        readFields = comm.read_fields_lazy if lazyFields else comm.read_fields
+        nMsgs = 0
+        start = None
+        for (timestamp, kind, payload) in self.records():
+            if kind == SESSION:
+                fields = comm.read_fields(payload)
+                decoder.serverVersion = int(fields[0])
+                # the clock of another session is unrelated to this one
+                start = None
+                continue
+
+            if speed is not None:
+                if start is None:
+                    start = (timestamp, time.monotonic_ns())
+                due = start[1] + (timestamp - start[0]) / speed
+                delay = due - time.monotonic_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+
+            decoder.interpret(readFields(payload))
+            nMsgs += 1
+        return nMsgs
@@ -0,0 +1,158 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+Request and order ids, and the answers to the requests, shared by the
+thread making the requests and the one running the wrapper callbacks.
+The RequestRegistry hands out request ids and order ids from separate
+ranges, so that an id in an error() callback names either a request or an
+order. A request gets a RequestHandle, a concurrent.futures.Future that the
+wrapper completes from the end or response callback of the request, so the
+requesting thread waits on it with a timeout instead of polling a flag.
+Requests without an id, like reqPositions, are keyed by a name.
+"""
+
+import concurrent.futures
+import itertools
+import logging
+import threading
+
+from ibapi.utils import RequestError
+
+
+logger = logging.getLogger(__name__)
+
+
+# far above the order ids, that count up from the first nextValidId
+REQ_ID_BASE = 1 << 30
+
+# keys of the answers that have no request id
+NEXT_VALID_ID = "nextValidId"
+POSITIONS = "positions"
+OPEN_ORDERS = "openOrders"
+
+NO_RESULT = object()
+
+
+def isWarning(errorCode):
+    """ the error codes that do not mean the request failed """
+    return 2100 <= errorCode < 2200 or errorCode in (399, 10167)
+
+
+class RequestHandle(concurrent.futures.Future):
+    """ the future of one request, rows gathers the rows of a multi row
+    answer and is its result unless the callback gives another one """
+
+    def __init__(self, reqId):
+        concurrent.futures.Future.__init__(self)
+        self.reqId = reqId
+        self.rows = []
+
+    def __str__(self):
+        return "RequestHandle: %s, %d rows, done %s" % (self.reqId, len(self.rows), self.done())
+
+
+class RequestRegistry(object):
+    def __init__(self, firstReqId=REQ_ID_BASE):
+        self.lock = threading.Lock()
+        self.reqIds = itertools.count(firstReqId)
+        self.orderId = None
+        self.orderIdReady = threading.Event()
+        self.pending = {}
+
+    def nextReqId(self):
+        with self.lock:
+            return next(self.reqIds)
+
+    def setNextOrderId(self, orderId):
+        """ from nextValidId, order ids never go back """
+
+        with self.lock:
+            if self.orderId is None or orderId > self.orderId:
+                self.orderId = orderId
+        self.orderIdReady.set()
+        self.complete(NEXT_VALID_ID, orderId)
+
+    def nextOrderId(self, timeout=None):
+        """ the next order id, waits up to timeout for the first nextValidId """
+
+        if not self.orderIdReady.wait(timeout):
+            raise concurrent.futures.TimeoutError("no nextValidId yet")
+        with self.lock:
+            orderId = self.orderId
+            self.orderId += 1
+        return orderId
+
+    def request(self, key=None):
+        """ registers a request and returns its handle, key is a new request
+        id unless given, eg POSITIONS """
+
+        with self.lock:
+            if key is None:
+                key = next(self.reqIds)
+            handle = RequestHandle(key)
+            previous = self.pending.get(key)
+            self.pending[key] = handle
+        if previous is not None:
+            # an answer never comes twice, the old waiter gets a timeout
+            logger.warning("request %s made again before its answer", key)
+        return handle
+
+    def isPending(self, key):
+        with self.lock:
+            return key in self.pending
+
+    def add(self, key, row):
+        """ a row of the answer to key, ignored if key is not pending """
+
+        with self.lock:
+            handle = self.pending.get(key)
+            if handle is not None:
+                handle.rows.append(row)
+
+    def complete(self, key, result=NO_RESULT):
+        """ ends the request key with result, its rows if not given """
+
+        with self.lock:
+            handle = self.pending.pop(key, None)
+        if handle is not None:
+            handle.set_result(handle.rows if result is NO_RESULT else result)
+        return handle
+
+    def fail(self, key, exc):
+        with self.lock:
+            handle = self.pending.pop(key, None)
+        if handle is not None:
+            handle.set_exception(exc)
+        return handle
+
+    def error(self, reqId, errorCode, errorString):
+        """ fails the request reqId from the error() callback, warnings
+        and errors of no request do not """
+
+        if not isWarning(errorCode) and self.isPending(reqId):
+            self.fail(reqId, RequestError(reqId, errorCode, errorString))
+
+    def cancelAll(self, reason):
+        """ fails every pending request, eg when the connection is closed """
+
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.orderIdReady.clear()
+        for handle in pending.values():
+            handle.set_exception(ConnectionError(reason))
+
+
+def waitAll(handles, timeout=None):
+    """ waits for all the handles, raises concurrent.futures.TimeoutError if
+    some are not done after timeout, returns their results """
+
+    (done, notDone) = concurrent.futures.wait(handles, timeout)
+    if notDone:
+        raise concurrent.futures.TimeoutError("%d of %d requests not answered"
+                                              % (len(notDone), len(handles)))
+    return [handle.result() for handle in handles]
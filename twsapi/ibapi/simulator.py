@@ -0,0 +1,714 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+
+"""
+A local stand-in for TWS, to load and latency test the clients without a live
+session.
+TwsSimulator listens on a local port and serves every client connection with
+a SimulatorSession thread: it performs the handshake and answers the
+positions, open orders, executions, contract details, account summary and PnL
+requests from a simulated account. Market orders fill right away at the
+simulated price, other orders stay Submitted until they are cancelled.
+Market data subscriptions get an initial quote and then a stream of synthetic
+ticks, the tickRate of a session (ticks per second over all its
+subscriptions) is spread round robin over the subscribed symbols.
+
+Only servers from MIN_SIMULATED_VER up are simulated. Run it with
+
+    python -m ibapi.simulator --port 7497 --positions 10 --tick-rate 5000
+"""
+
+import datetime
+import logging
+import random
+import socket
+import threading
+import time
+import zlib
+
+from ibapi import comm
+from ibapi.common import UNSET_DOUBLE
+from ibapi.comm import (make_field, make_field_handle_empty)
+from ibapi.contract import Contract
+from ibapi.execution import Execution
+from ibapi.message import (IN, OUT)
+from ibapi.object_implem import Object
+from ibapi.order import Order
+from ibapi.order_state import OrderState
+from ibapi.orderdecoder import (OrderDecoder, OrderDecodePlan, PLAN_SKIP,
+    PLAN_COMPLEX, PLAN_TARGET_NAMES)
+from ibapi.server_versions import * # @UnusedWildImport
+from ibapi.ticktype import TickTypeEnum
+
+
+logger = logging.getLogger(__name__)
+
+
+MIN_SIMULATED_VER = MIN_SERVER_VER_LAST_LIQUIDITY
+
+# the OPEN_ORDER message version of the servers that still send one
+OPEN_ORDER_VERSION = 34
+
+DEFAULT_ACCOUNT_VALUES = {
+    "NetLiquidation": ("100000.00", "USD"),
+    "ExcessLiquidity": ("50000.00", "USD"),
+    "SMA": ("50000.00", "USD"),
+    "AvailableFunds": ("50000.00", "USD"),
+    "BuyingPower": ("200000.00", "USD"),
+    "DayTradesRemaining": ("3", ""),
+}
+
+
+class EmptyFields(object):
+    """ an endless iterator of empty fields that counts how many were read """
+
+    def __init__(self):
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.count += 1
+        return b""
+
+
+def openOrderLayout(serverVersion):
+    """ the (target name, attr) of every field of an OPEN_ORDER after the
+    version, None for the fields that are sent empty """
+
+    version = serverVersion if serverVersion >= MIN_SERVER_VER_ORDER_CONTAINER \
+        else OPEN_ORDER_VERSION
+    layout = []
+    for (target, attr, args) in OrderDecodePlan(version, serverVersion).openOrder():
+        if target == PLAN_SKIP:
+            layout.append(None)
+        elif target == PLAN_COMPLEX:
+            # the value dependent parts (combo legs, algo params, ...) are sent
+            # in their empty form, count how many fields that takes
+            fields = EmptyFields()
+            attr(OrderDecoder(Contract(), Order(), OrderState(), version,
+                              serverVersion), fields, *args)
+            layout += [None] * fields.count
+        else:
+            layout.append((PLAN_TARGET_NAMES[target], attr))
+    return layout
+
+
+def openOrderVals(layout, contract, order, orderState):
+    """ the values of the OPEN_ORDER fields of layout """
+
+    objects = {"contract": contract, "order": order, "orderState": orderState}
+    vals = []
+    for field in layout:
+        val = None if field is None else getattr(objects[field[0]], field[1])
+        vals.append("" if val is None else val)
+    return vals
+
+
+def stockContract(symbol, conId):
+    contract = Contract()
+    contract.conId = conId
+    contract.symbol = symbol
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.primaryExchange = "ISLAND"
+    contract.currency = "USD"
+    contract.localSymbol = symbol
+    contract.tradingClass = "NMS"
+    return contract
+
+
+def tradingHours(today, days=7):
+    """ the tradingHours of a US stock from today on, closed at weekends """
+
+    sessions = []
+    for n in range(days):
+        day = (today + datetime.timedelta(days=n)).strftime("%Y%m%d")
+        if (today + datetime.timedelta(days=n)).weekday() >= 5:
+            sessions.append("%s:CLOSED" % day)
+        else:
+            sessions.append("%s:0400-%s:2000" % (day, day))
+    return ";".join(sessions)
+
+
+class SimulatedQuote(Object):
+    """ the random walk of one symbol's price """
+
+    def __init__(self, symbol):
+        self.rng = random.Random(zlib.crc32(symbol.encode()))
+        self.close = round(self.rng.uniform(5, 500), 2)
+        self.open = round(self.close * self.rng.uniform(0.98, 1.02), 2)
+        self.last = self.open
+        self.spread = max(0.01, round(self.close * 0.0005, 2))
+
+    def step(self):
+        self.last = max(0.01, round(self.last * (1 + self.rng.gauss(0, 0.0005)), 2))
+
+    def bid(self):
+        return round(self.last - self.spread / 2, 2)
+
+    def ask(self):
+        return round(self.last + self.spread / 2, 2)
+
+    def lastPrice(self):
+        return self.last
+
+
+class SimulatedAccount(Object):
+    """ the positions, orders and executions the simulator serves, shared by
+    all its sessions and guarded by lock """
+
+    def __init__(self, account, positions=None, accountValues=None):
+        self.lock = threading.Lock()
+        self.account = account
+        self.accountValues = dict(DEFAULT_ACCOUNT_VALUES if accountValues is None
+                                  else accountValues)
+        self.conIds = {}
+        self.quotes = {}
+        # symbol: [position, avgCost]
+        self.positions = {}
+        # orderId: (contract, order, orderState)
+        self.orders = {}
+        # (contract, execution) in the order they happened
+        self.executions = []
+        self.nextOrderId = 1
+        self.nextPermId = 1000000
+        for (symbol, position) in (positions or {}).items():
+            self.positions[symbol] = [position, self.quote(symbol).close]
+
+    def conId(self, symbol):
+        conId = self.conIds.get(symbol)
+        if conId is None:
+            conId = self.conIds[symbol] = 100000 + len(self.conIds)
+        return conId
+
+    def symbol(self, conId):
+        for (symbol, symbolConId) in self.conIds.items():
+            if symbolConId == conId:
+                return symbol
+        return None
+
+    def quote(self, symbol):
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            quote = self.quotes[symbol] = SimulatedQuote(symbol)
+        return quote
+
+    def contract(self, symbol):
+        return stockContract(symbol, self.conId(symbol))
+
+    def newExecution(self, order, price):
+        execution = Execution()
+        execution.orderId = order.orderId
+        execution.execId = "%08x.%08x.01.01" % (order.permId, len(self.executions))
+        execution.time = datetime.datetime.now().strftime("%Y%m%d  %H:%M:%S")
+        execution.acctNumber = self.account
+        execution.exchange = "ISLAND"
+        execution.side = "BOT" if order.action == "BUY" else "SLD"
+        execution.shares = order.totalQuantity
+        execution.price = price
+        execution.permId = order.permId
+        execution.clientId = order.clientId
+        execution.cumQty = order.totalQuantity
+        execution.avgPrice = price
+        execution.lastLiquidity = 1
+        return execution
+
+    def pnl(self, symbol):
+        """ (position, dailyPnL, unrealizedPnL, realizedPnL, value) """
+
+        (position, avgCost) = self.positions.get(symbol, (0, 0.))
+        quote = self.quote(symbol)
+        value = position * quote.last
+        return (position, position * (quote.last - quote.close),
+                value - position * avgCost, 0., value)
+
+
+class SimulatorSession(threading.Thread):
+    """ serves one client connection """
+
+    TICK_INTERVAL = 0.01
+
+    def __init__(self, simulator, sock):
+        super().__init__(daemon=True)
+        self.simulator = simulator
+        self.account = simulator.account
+        self.sock = sock
+        self.sendLock = threading.Lock()
+        self.serverVersion = simulator.serverVersion
+        self.clientId = None
+        self.connected = True
+        self.buf = b""
+        # reqId: symbol of the market data subscriptions
+        self.subscriptions = {}
+        self.tickRate = simulator.tickRate
+        self.nTicks = 0
+        self.handlers = {
+            OUT.START_API: self.startApi,
+            OUT.REQ_IDS: self.reqIds,
+            OUT.REQ_CURRENT_TIME: self.reqCurrentTime,
+            OUT.REQ_POSITIONS: self.reqPositions,
+            OUT.REQ_ALL_OPEN_ORDERS: self.reqOpenOrders,
+            OUT.REQ_OPEN_ORDERS: self.reqOpenOrders,
+            OUT.REQ_EXECUTIONS: self.reqExecutions,
+            OUT.REQ_CONTRACT_DATA: self.reqContractDetails,
+            OUT.REQ_ACCOUNT_SUMMARY: self.reqAccountSummary,
+            OUT.REQ_PNL: self.reqPnL,
+            OUT.REQ_PNL_SINGLE: self.reqPnLSingle,
+            OUT.REQ_MKT_DATA: self.reqMktData,
+            OUT.CANCEL_MKT_DATA: self.cancelMktData,
+            OUT.PLACE_ORDER: self.placeOrder,
+            OUT.CANCEL_ORDER: self.cancelOrder,
+        }
+
+    def run(self):
+        try:
+            if self.handshake():
+                if self.tickRate > 0:
+                    threading.Thread(target=self.streamTicks, daemon=True).start()
+                while self.connected:
+                    msg = self.readMsg()
+                    if msg is None:
+                        break
+                    self.processMsg(msg)
+        except OSError as ex:
+            logger.debug("session ended: %s", ex)
+        except:
+            logger.exception("unhandled exception in simulator session")
+        finally:
+            self.close()
+
+    def close(self):
+        self.connected = False
+        try:
+            # the client sees the connection end, close() alone does not
+            # send it while this session is blocked in recv()
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.simulator.sessionClosed(self)
+
+    def recv(self, size):
+        """ reads until buf holds size bytes, False once the peer is gone """
+
+        while len(self.buf) < size:
+            data = self.sock.recv(65536)
+            if not data:
+                return False
+            self.buf += data
+        return True
+
+    def readMsg(self):
+        if not self.recv(4):
+            return None
+        (size, msg, self.buf) = comm.read_msg(self.buf)
+        if not msg and size:
+            if not self.recv(4 + size):
+                return None
+            (size, msg, self.buf) = comm.read_msg(self.buf)
+        return msg
+
+    def handshake(self):
+        if not self.recv(4) or self.buf[:4] != b"API\0":
+            logger.warning("not an API client, closing")
+            return False
+        self.buf = self.buf[4:]
+        msg = self.readMsg()
+        if msg is None:
+            return False
+
+        # "v100..160" optionally followed by the connection options
+        versions = msg.decode().split()[0][1:].split("..")
+        maxVersion = int(versions[-1])
+        if maxVersion < MIN_SIMULATED_VER:
+            logger.warning("client version %d is not simulated", maxVersion)
+            return False
+        self.serverVersion = min(self.serverVersion, maxVersion)
+        connTime = datetime.datetime.now().strftime("%Y%m%d %H:%M:%S EST")
+        self.sendRaw(comm.make_msg(make_field(self.serverVersion) + make_field(connTime)))
+        return True
+
+    def processMsg(self, msg):
+        fields = [field.decode() for field in comm.read_fields(msg)]
+        handler = self.handlers.get(int(fields[0]))
+        if handler is None:
+            logger.debug("ignoring request %s", fields[0])
+            return
+        try:
+            handler(fields)
+        except (IndexError, ValueError):
+            # a request this simulator does not understand should not end
+            # the session
+            logger.exception("bad request %s", fields)
+
+    ######################################################################
+
+    def sendRaw(self, data):
+        with self.sendLock:
+            self.sock.sendall(data)
+
+    def send(self, *vals):
+        self.sendRaw(self.makeMsg(vals))
+
+    def makeMsg(self, vals):
+        return comm.make_msg("".join(make_field_handle_empty(val) for val in vals))
+
+    def error(self, reqId, code, text):
+        self.send(IN.ERR_MSG, 2, reqId, code, text)
+
+    ######################################################################
+
+    def startApi(self, fields):
+        self.clientId = int(fields[2])
+        with self.account.lock:
+            nextOrderId = self.account.nextOrderId
+        self.send(IN.NEXT_VALID_ID, 1, nextOrderId)
+        self.send(IN.MANAGED_ACCTS, 1, self.account.account)
+
+    def reqIds(self, fields):
+        with self.account.lock:
+            nextOrderId = self.account.nextOrderId
+        self.send(IN.NEXT_VALID_ID, 1, nextOrderId)
+
+    def reqCurrentTime(self, fields):
+        self.send(IN.CURRENT_TIME, 1, int(time.time()))
+
+    def reqPositions(self, fields):
+        account = self.account
+        with account.lock:
+            msgs = [self.makeMsg((IN.POSITION_DATA, 3, account.account)
+                        + self.contractFields(account.contract(symbol))
+                        + (position, avgCost))
+                    for (symbol, (position, avgCost)) in account.positions.items()]
+        msgs.append(self.makeMsg((IN.POSITION_END, 1)))
+        self.sendRaw(b"".join(msgs))
+
+    def contractFields(self, contract):
+        return (contract.conId, contract.symbol, contract.secType,
+                contract.lastTradeDateOrContractMonth, contract.strike,
+                contract.right, contract.multiplier, contract.exchange,
+                contract.currency, contract.localSymbol, contract.tradingClass)
+
+    def reqOpenOrders(self, fields):
+        with self.account.lock:
+            msgs = [self.openOrderMsg(contract, order, orderState)
+                    for (contract, order, orderState) in self.account.orders.values()
+                    if orderState.status in ("PreSubmitted", "Submitted")]
+        msgs.append(self.makeMsg((IN.OPEN_ORDER_END, 1)))
+        self.sendRaw(b"".join(msgs))
+
+    def openOrderMsg(self, contract, order, orderState):
+        vals = [IN.OPEN_ORDER]
+        if self.serverVersion < MIN_SERVER_VER_ORDER_CONTAINER:
+            vals.append(OPEN_ORDER_VERSION)
+        vals += openOrderVals(self.simulator.openOrderLayout(self.serverVersion),
+                              contract, order, orderState)
+        return self.makeMsg(vals)
+
+    def orderStatusMsg(self, order, orderState):
+        filled = order.filledQuantity if order.filledQuantity != UNSET_DOUBLE else 0
+        return self.makeMsg((IN.ORDER_STATUS, order.orderId, orderState.status,
+            filled, order.totalQuantity - filled, order.avgFillPrice,
+            order.permId, order.parentId, order.avgFillPrice, order.clientId,
+            "", 0.))
+
+    def reqExecutions(self, fields):
+        reqId = int(fields[2])
+        with self.account.lock:
+            msgs = [self.executionMsg(reqId, contract, execution)
+                    for (contract, execution) in self.account.executions]
+        msgs.append(self.makeMsg((IN.EXECUTION_DATA_END, 1, reqId)))
+        self.sendRaw(b"".join(msgs))
+
+    def executionMsg(self, reqId, contract, execution):
+        return self.makeMsg((IN.EXECUTION_DATA, reqId, execution.orderId)
+            + self.contractFields(contract)
+            + (execution.execId, execution.time, execution.acctNumber,
+               execution.exchange, execution.side, execution.shares,
+               execution.price, execution.permId, execution.clientId,
+               execution.liquidation, execution.cumQty, execution.avgPrice,
+               execution.orderRef, execution.evRule, execution.evMultiplier,
+               execution.modelCode, execution.lastLiquidity))
+
+    def reqContractDetails(self, fields):
+        reqId = int(fields[2])
+        symbol = fields[4]
+        with self.account.lock:
+            contract = self.account.contract(symbol)
+        vals = (IN.CONTRACT_DATA, 8, reqId, symbol, contract.secType, "",
+            0., "", contract.exchange, contract.currency, symbol, "NMS",
+            contract.tradingClass, contract.conId, 0.01, 1, "",
+            "ACTIVETIM,ADJUST,ALERT,LMT,MKT,STP,TRAIL", "SMART,ISLAND", 1, 0,
+            symbol + " INC", contract.primaryExchange, "", "Technology", "",
+            "", "US/Eastern", tradingHours(datetime.date.today()),
+            tradingHours(datetime.date.today()).replace("0400", "0930").replace("2000", "1600"),
+            "", 0, 0, 1, "", "", "26", "")
+        if self.serverVersion >= MIN_SERVER_VER_STOCK_TYPE:
+            vals += ("COMMON",)
+        self.sendRaw(self.makeMsg(vals) + self.makeMsg((IN.CONTRACT_DATA_END, 1, reqId)))
+
+    def reqAccountSummary(self, fields):
+        reqId = int(fields[2])
+        account = self.account
+        msgs = [self.makeMsg((IN.ACCOUNT_SUMMARY, 1, reqId, account.account,
+                              tag, value, currency))
+                for (tag, (value, currency)) in account.accountValues.items()
+                if tag in fields[4].split(",")]
+        msgs.append(self.makeMsg((IN.ACCOUNT_SUMMARY_END, 1, reqId)))
+        self.sendRaw(b"".join(msgs))
+
+    def reqPnL(self, fields):
+        reqId = int(fields[1])
+        with self.account.lock:
+            pnls = [self.account.pnl(symbol) for symbol in self.account.positions]
+        self.send(IN.PNL, reqId, sum(pnl[1] for pnl in pnls),
+                  sum(pnl[2] for pnl in pnls), 0.)
+
+    def reqPnLSingle(self, fields):
+        reqId = int(fields[1])
+        with self.account.lock:
+            symbol = self.account.symbol(int(fields[4]))
+            if symbol is None:
+                self.error(reqId, 200, "No security definition has been found for the request")
+                return
+            (position, dailyPnL, unrealizedPnL, realizedPnL, value) = self.account.pnl(symbol)
+        self.send(IN.PNL_SINGLE, reqId, int(position), dailyPnL, unrealizedPnL,
+                  realizedPnL, value)
+
+    ######################################################################
+
+    def reqMktData(self, fields):
+        reqId = int(fields[2])
+        symbol = fields[4]
+        with self.account.lock:
+            quote = self.account.quote(symbol)
+            msgs = [self.tickPriceMsg(reqId, TickTypeEnum.CLOSE, quote.close, 0),
+                    self.tickPriceMsg(reqId, TickTypeEnum.OPEN, quote.open, 0),
+                    self.tickPriceMsg(reqId, TickTypeEnum.BID, quote.bid(), 100),
+                    self.tickPriceMsg(reqId, TickTypeEnum.ASK, quote.ask(), 100)]
+            self.subscriptions[reqId] = symbol
+        self.sendRaw(b"".join(msgs))
+
+    def cancelMktData(self, fields):
+        with self.account.lock:
+            self.subscriptions.pop(int(fields[2]), None)
+
+    def tickPriceMsg(self, reqId, tickType, price, size):
+        return self.makeMsg((IN.TICK_PRICE, 6, reqId, tickType, price, size, 0))
+
+    def streamTicks(self):
+        """ sends tickRate ticks per second round robin over the
+        subscriptions, batched every TICK_INTERVAL """
+
+        tickTypes = ((TickTypeEnum.BID, SimulatedQuote.bid),
+                     (TickTypeEnum.ASK, SimulatedQuote.ask),
+                     (TickTypeEnum.LAST, SimulatedQuote.lastPrice))
+        start = time.monotonic()
+        cursor = 0
+        try:
+            while self.connected:
+                time.sleep(self.TICK_INTERVAL)
+                due = int((time.monotonic() - start) * self.tickRate) - self.nTicks
+                msgs = []
+                with self.account.lock:
+                    subscriptions = list(self.subscriptions.items())
+                    for _ in range(due if subscriptions else 0):
+                        (reqId, symbol) = subscriptions[cursor % len(subscriptions)]
+                        (tickType, price) = tickTypes[(cursor // len(subscriptions)) % 3]
+                        quote = self.account.quote(symbol)
+                        quote.step()
+                        msgs.append(self.tickPriceMsg(reqId, tickType, price(quote), 100))
+                        cursor += 1
+                self.nTicks += due
+                if msgs:
+                    self.sendRaw(b"".join(msgs))
+        except OSError as ex:
+            logger.debug("tick stream ended: %s", ex)
+
+    ######################################################################
+
+    def placeOrder(self, fields):
+        # the version field went away with the order containers
+        first = 1 if self.serverVersion >= MIN_SERVER_VER_ORDER_CONTAINER else 2
+        orderId = int(fields[first])
+        symbol = fields[first + 2]
+        order = Order()
+        order.orderId = orderId
+        order.clientId = self.clientId
+        order.action = fields[first + 15]
+        order.totalQuantity = float(fields[first + 16])
+        order.orderType = fields[first + 17]
+        order.lmtPrice = float(fields[first + 18]) if fields[first + 18] else UNSET_DOUBLE
+        order.auxPrice = float(fields[first + 19]) if fields[first + 19] else UNSET_DOUBLE
+        order.tif = fields[first + 20]
+        order.account = self.account.account
+        order.filledQuantity = 0.
+        order.avgFillPrice = 0.
+        orderState = OrderState()
+        orderState.status = "Submitted"
+
+        account = self.account
+        with account.lock:
+            if orderId >= account.nextOrderId:
+                account.nextOrderId = orderId + 1
+            order.permId = account.nextPermId
+            account.nextPermId += 1
+            contract = account.contract(symbol)
+            account.orders[orderId] = (contract, order, orderState)
+            msgs = [self.openOrderMsg(contract, order, orderState),
+                    self.orderStatusMsg(order, orderState)]
+            if order.orderType == "MKT":
+                msgs += self.fill(contract, order, orderState)
+        self.sendRaw(b"".join(msgs))
+
+    def fill(self, contract, order, orderState):
+        """ fills order at the current price, with account.lock held """
+
+        account = self.account
+        quote = account.quote(contract.symbol)
+        price = quote.ask() if order.action == "BUY" else quote.bid()
+        shares = order.totalQuantity if order.action == "BUY" else -order.totalQuantity
+        (position, avgCost) = account.positions.get(contract.symbol, (0, 0.))
+        if position + shares == 0:
+            account.positions.pop(contract.symbol, None)
+        else:
+            if (position >= 0) == (shares > 0):
+                avgCost = (position * avgCost + shares * price) / (position + shares)
+            account.positions[contract.symbol] = [position + shares, avgCost]
+
+        order.filledQuantity = order.totalQuantity
+        order.avgFillPrice = price
+        orderState.status = "Filled"
+        execution = account.newExecution(order, price)
+        account.executions.append((contract, execution))
+        return [self.orderStatusMsg(order, orderState),
+                self.executionMsg(-1, contract, execution)]
+
+    def cancelOrder(self, fields):
+        orderId = int(fields[2])
+        with self.account.lock:
+            entry = self.account.orders.get(orderId)
+            if entry is None or entry[2].status not in ("PreSubmitted", "Submitted"):
+                entry = None
+            else:
+                entry[2].status = "Cancelled"
+                msg = self.orderStatusMsg(entry[1], entry[2])
+        if entry is None:
+            self.error(orderId, 135, "Can't find order with id =%d" % orderId)
+        else:
+            self.sendRaw(msg)
+
+
+class TwsSimulator(object):
+    """ listens on host:port, port 0 picks a free one, see self.port """
+
+    def __init__(self, host="127.0.0.1", port=0, serverVersion=MAX_CLIENT_VER,
+                 account="DU1234567", positions=None, accountValues=None,
+                 tickRate=1000):
+        if serverVersion < MIN_SIMULATED_VER:
+            raise ValueError("server versions below %d are not simulated" % MIN_SIMULATED_VER)
+        self.serverVersion = serverVersion
+        self.account = SimulatedAccount(account, positions, accountValues)
+        self.tickRate = tickRate
+        self.layouts = {}
+        self.sessions = []
+        self.sessionsLock = threading.Lock()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(16)
+        (self.host, self.port) = self.sock.getsockname()[:2]
+        self.thread = None
+
+    def openOrderLayout(self, serverVersion):
+        layout = self.layouts.get(serverVersion)
+        if layout is None:
+            layout = self.layouts[serverVersion] = openOrderLayout(serverVersion)
+        return layout
+
+    def start(self):
+        """ accepts connections on a background thread """
+        self.thread = threading.Thread(target=self.serveForever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serveForever(self):
+        logger.info("simulating TWS %d on %s:%d", self.serverVersion, self.host, self.port)
+        while True:
+            try:
+                (sock, addr) = self.sock.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logger.info("client connected from %s:%d", *addr[:2])
+            session = SimulatorSession(self, sock)
+            with self.sessionsLock:
+                self.sessions.append(session)
+            session.start()
+
+    def sessionClosed(self, session):
+        with self.sessionsLock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def stop(self):
+        try:
+            # wakes up accept(), close() alone does not
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        with self.sessionsLock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            session.close()
+        if self.thread is not None:
+            self.thread.join(1)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def symbols(n):
+    """ n made up tickers """
+    return ["S%04d" % i for i in range(n)]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="local TWS simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7497)
+    parser.add_argument("--server-version", type=int, default=MAX_CLIENT_VER)
+    parser.add_argument("--account", default="DU1234567")
+    parser.add_argument("--positions", type=int, default=0,
+                        help="number of made up positions")
+    parser.add_argument("--tick-rate", type=int, default=1000,
+                        help="ticks per second of every connection")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    simulator = TwsSimulator(args.host, args.port, args.server_version,
+        args.account, {symbol: 100 for symbol in symbols(args.positions)},
+        tickRate=args.tick_rate)
+    try:
+        simulator.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if "__main__" == __name__:
+    main()
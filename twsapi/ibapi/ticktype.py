@@ -114,3 +114,13 @@ TickTypeEnum = Enum("BID_SIZE",
                 "ETF_NAV_HIGH",
                 "ETF_NAV_LOW",
                 "NOT_SET")
+
+
+# size tick type reported along with each price tick type (TICK_PRICE ver 2 field)
+SIZE_TICK_BY_PRICE_TICK = {
+    TickTypeEnum.BID: TickTypeEnum.BID_SIZE,
+    TickTypeEnum.ASK: TickTypeEnum.ASK_SIZE,
+    TickTypeEnum.LAST: TickTypeEnum.LAST_SIZE,
+    TickTypeEnum.DELAYED_BID: TickTypeEnum.DELAYED_BID_SIZE,
+    TickTypeEnum.DELAYED_ASK: TickTypeEnum.DELAYED_ASK_SIZE,
+    TickTypeEnum.DELAYED_LAST: TickTypeEnum.DELAYED_LAST_SIZE}
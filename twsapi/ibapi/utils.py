@@ -9,6 +9,7 @@ Collection of misc tools
 """
 
 
+import os
 import sys
 import logging
 import inspect
@@ -19,6 +20,18 @@ from ibapi.common import UNSET_INTEGER, UNSET_DOUBLE, UNSET_LONG
 logger = logging.getLogger(__name__)
 
 
+# The debug logging of the per message paths (framing, decoding, sending,
+# locking) is skipped altogether unless tracing is on, so it costs a global
+# lookup instead of a logging call when nobody listens. Turn it on with
+# IBAPI_TRACE=1 in the environment or with setTrace(True).
+TRACE = os.environ.get("IBAPI_TRACE", "") not in ("", "0")
+
+
+def setTrace(trace:bool):
+    global TRACE
+    TRACE = trace
+
+
 # I use this just to visually emphasize it's a wrapper overridden method
 def iswrapper(fn):
     return fn
@@ -34,6 +47,13 @@ class ClientException(Exception):
         self.msg = msg
         self.text = text
 
+class RequestError(Exception):
+    def __init__(self, reqId, code, msg):
+        super().__init__(reqId, code, msg)
+        self.reqId = reqId
+        self.code = code
+        self.msg = msg
+
 class LogFunction(object):
     def __init__(self, text, logLevel):
         self.text = text
@@ -70,7 +90,8 @@ def decode(the_type, fields, show_unset = False):
     except StopIteration:
         raise BadMessage("no more fields")
 
-    logger.debug("decode %s %s", the_type, s)
+    if TRACE:
+        logger.debug("decode %s %s", the_type, s)
 
     if the_type is str:
         if type(s) is str:
@@ -346,6 +346,19 @@ class EWrapper:
         self.logAnswer(current_fn_name(), vars())
 
 
+    def historicalDataBatch(self, reqId: int, bars):
+        """ returns all the bars of a historical data answer at once, in
+        place of historicalData(), when the client is set up with
+        setHistoricalBatch(True)
+
+        reqId - the request's identifier
+        bars  - a columnar.HistoricalBars whose date, open, high, low,
+            close, volume, average and barCount attributes are numpy arrays
+            with one element per bar """
+
+        self.logAnswer(current_fn_name(), vars())
+
+
     def historicalDataEnd(self, reqId:int, start:str, end:str):
         """ Marks the ending of the historical bars reception. """
         self.logAnswer(current_fn_name(), vars())
@@ -681,6 +694,25 @@ class EWrapper:
         """returns historical tick data when whatToShow=TRADES"""
         self.logAnswer(current_fn_name(), vars())
 
+    def historicalTicksBatch(self, reqId: int, ticks, done: bool):
+        """returns a page of historical tick data when whatToShow=MIDPOINT
+        as a numpy structured array with the time, price and size fields,
+        in place of historicalTicks() when the client is set up with
+        setHistoricalTicksBatch(True)"""
+        self.logAnswer(current_fn_name(), vars())
+
+    def historicalTicksBidAskBatch(self, reqId: int, ticks, done: bool):
+        """returns a page of historical tick data when whatToShow=BID_ASK
+        as a numpy structured array with the time, attribs (1: askPastHigh,
+        2: bidPastLow), priceBid, priceAsk, sizeBid and sizeAsk fields"""
+        self.logAnswer(current_fn_name(), vars())
+
+    def historicalTicksLastBatch(self, reqId: int, ticks, done: bool):
+        """returns a page of historical tick data when whatToShow=TRADES
+        as a numpy structured array with the time, attribs (1: pastLimit,
+        2: unreported), price, size, exchange and specialConditions fields"""
+        self.logAnswer(current_fn_name(), vars())
+
     def tickByTickAllLast(self, reqId: int, tickType: int, time: int, price: float,
                           size: int, tickAttribLast: TickAttribLast, exchange: str,
                           specialConditions: str):
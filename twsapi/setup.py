@@ -19,5 +19,6 @@ setup(
     license='IB API Non-Commercial License or the IB API Commercial License',
     author='IBG LLC',
     author_email='dnastase@interactivebrokers.com',
-    description='Python IB API'
+    description='Python IB API',
+    extras_require={'numpy': ['numpy']}
 )
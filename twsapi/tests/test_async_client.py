@@ -0,0 +1,191 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import asyncio
+
+from ibapi import comm
+from ibapi.async_client import AsyncEClient
+from ibapi.contract import Contract
+from ibapi.message import IN, OUT
+from ibapi.order import Order
+from ibapi.pacing import (msgPriority, ORDER_PRIORITY, DATA_PRIORITY)
+from ibapi.wrapper import EWrapper
+from ibapi.server_versions import MAX_CLIENT_VER
+from ibapi.utils import RequestError
+
+
+def make_fields(*vals):
+    return comm.make_msg("".join(comm.make_field(val) for val in vals))
+
+
+class FakeTws(asyncio.Protocol):
+    """ answers the handshake and reqPositions, keeps the ids of the
+    messages it gets; last is the latest connection """
+
+    def __init__(self):
+        self.msgIds = []
+
+    def connection_made(self, transport):
+        FakeTws.last = self
+        self.transport = transport
+        self.framer = comm.MsgFramer(1024)
+        self.handshaked = False
+
+    def data_received(self, data):
+        if not self.handshaked:
+            self.handshaked = True
+            data = data[4:]     # "API\0" prefix
+            self.transport.write(make_fields(MAX_CLIENT_VER, "20260101 10:00:00 EST"))
+        self.framer.feed(data)
+        for msg in self.framer.frames():
+            fields = comm.read_fields(bytes(msg))
+            self.msgIds.append(int(fields[0]) if fields else None)
+            if not fields:
+                pass    # version range of the handshake
+            elif int(fields[0]) == OUT.START_API:
+                self.transport.write(make_fields(IN.NEXT_VALID_ID, 1, 7))
+            elif int(fields[0]) == OUT.REQ_POSITIONS:
+                self.transport.write(
+                    make_fields(IN.POSITION_DATA, 3, "DU1", 265598, "AAPL", "STK", "",
+                                0.0, "", "", "NASDAQ", "USD", "AAPL", "NMS", 10, 120.5)
+                    + make_fields(IN.POSITION_END, 1))
+
+
+def make_contract(symbol):
+    contract = Contract()
+    contract.symbol = symbol
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.currency = "USD"
+    return contract
+
+
+def make_order():
+    order = Order()
+    order.action = "BUY"
+    order.orderType = "LMT"
+    order.totalQuantity = 5
+    order.lmtPrice = 1.5
+    return order
+
+
+class App(EWrapper, AsyncEClient):
+    def __init__(self):
+        AsyncEClient.__init__(self, self)
+        self.nextId = None
+
+    def nextValidId(self, orderId):
+        self.nextId = orderId
+
+
+class AsyncClientTestCase(unittest.TestCase):
+    def test_reqPositionsAsync(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            server = await loop.create_server(FakeTws, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+
+            app = App()
+            await app.connectAsync("127.0.0.1", port, 1)
+            self.assertTrue(app.isConnected())
+            self.assertEqual(app.serverVersion(), MAX_CLIENT_VER)
+            self.assertEqual(app.twsConnectionTime(), b"20260101 10:00:00 EST")
+
+            (first, second) = await asyncio.wait_for(
+                asyncio.gather(app.reqPositionsAsync(), app.reqPositionsAsync()), 2)
+
+            self.assertEqual(app.nextId, 7)
+            self.assertEqual(first, second)
+            self.assertEqual(len(first), 1)
+            (account, contract, position, avgCost) = first[0]
+            self.assertEqual((account, contract.symbol, position, avgCost),
+                             ("DU1", "AAPL", 10, 120.5))
+
+            app.disconnect()
+            with self.assertRaises(ConnectionError):
+                await app.reqPositionsAsync()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
+
+
+    def test_orders(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            server = await loop.create_server(FakeTws, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+
+            app = App()
+            await app.connectAsync("127.0.0.1", port, 1)
+            await asyncio.wait_for(app.reqPositionsAsync(), 2)
+            app.placeOrder(7, make_contract("AAPL"), make_order())
+            app.cancelOrder(7)
+            app.flush()
+            await asyncio.sleep(0.1)
+
+            self.assertEqual(FakeTws.last.msgIds[-2:], [OUT.PLACE_ORDER, OUT.CANCEL_ORDER])
+            app.disconnect()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
+
+
+    def test_priorities(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            server = await loop.create_server(FakeTws, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+
+            app = App()
+            app.setCoalescing(4096)
+            await app.connectAsync("127.0.0.1", port, 1)
+            await asyncio.wait_for(app.reqPositionsAsync(), 2)
+            start = len(FakeTws.last.msgIds)
+            requests = [(OUT.REQ_MKT_DATA, lambda: app.reqMktData(
+                            3, make_contract("AAPL"), "", False, False, [])),
+                        (OUT.PLACE_ORDER, lambda: app.placeOrder(7, make_contract("AAPL"),
+                                                                 make_order())),
+                        (OUT.CANCEL_MKT_DATA, lambda: app.cancelMktData(3)),
+                        (OUT.CANCEL_ORDER, lambda: app.cancelOrder(7)),
+                        (OUT.REQ_GLOBAL_CANCEL, app.reqGlobalCancel),
+                        (OUT.REQ_CURRENT_TIME, app.reqCurrentTime)]
+            for (_, request) in requests:
+                request()
+            app.flush()
+            await asyncio.sleep(0.1)
+
+            # data and order messages alike go out in the order they are made
+            self.assertEqual(FakeTws.last.msgIds[start:], [msgId for (msgId, _) in requests])
+            self.assertEqual({msgPriority(str(msgId) + "\0") for (msgId, _) in requests},
+                             {ORDER_PRIORITY, DATA_PRIORITY})
+            self.assertEqual((app.conn.recvMsg(), app.conn.recvMsgInto(None)), (b"", 0))
+            app.disconnect()
+            server.close()
+            await server.wait_closed()
+
+        asyncio.run(scenario())
+
+
+    def test_failRequest(self):
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            app = App()
+            for key in (("executions", 5), ("historicalData", 5), ("contractDetails", 6)):
+                app.pending[key] = (loop.create_future(), [])
+
+            app.failRequest(5, RequestError(5, 200, "No security definition"))
+
+            self.assertEqual(list(app.pending), [("contractDetails", 6)])
+            with self.assertRaises(RuntimeError):
+                app.run()
+
+        asyncio.run(scenario())
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import contextlib
+import io
+
+from ibapi import comm
+from ibapi.decoder import Decoder
+from ibapi.server_versions import MAX_CLIENT_VER
+
+from benchmarks import bench_codec
+from tests.test_decoder import RecordingWrapper
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    def test_synthetic_messages(self):
+        # every synthetic message must decode to its callback, otherwise the
+        # benchmark would only measure the BadMessage handling
+        expected = {
+            "TICK_PRICE": "tickPrice",
+            "TICK_SIZE": "tickSize",
+            "ORDER_STATUS": "orderStatus",
+            "OPEN_ORDER": "openOrder",
+            "HISTORICAL_DATA": "historicalData",
+            "PNL_SINGLE": "pnlSingle",
+            "ACCOUNT_SUMMARY": "accountSummary",
+        }
+        messages = bench_codec.syntheticMessages(10)
+        self.assertEqual(sorted(messages), sorted(expected))
+        for (name, payloads) in messages.items():
+            wrapper = RecordingWrapper()
+            decoder = Decoder(wrapper, MAX_CLIENT_VER)
+            decoder.interpret(comm.read_fields(payloads[-1]))
+            self.assertEqual(wrapper.calls[0][0], expected[name], name)
+            if name == "OPEN_ORDER":
+                (orderId, contract, order, orderState) = wrapper.calls[0][1]
+                self.assertEqual((orderId, contract.symbol, order.lmtPrice, orderState.status),
+                                 (9, "S0009", 19.25, "Submitted"))
+
+
+    def test_main(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            results = bench_codec.main(["--number", "20", "--repeat", "1",
+                                        "--filter", "TICK"])
+
+        self.assertEqual(sorted(results), ["interpret TICK_PRICE", "interpret TICK_SIZE"])
+        self.assertGreater(results["interpret TICK_PRICE"]["msgsPerSec"], 0)
+        self.assertIn("interpret TICK_SIZE", out.getvalue())
+
+
+if "__main__" == __name__:
+    unittest.main()
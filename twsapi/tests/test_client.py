@@ -0,0 +1,139 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import socket
+import time
+
+from ibapi import comm
+from ibapi.client import EClient
+from ibapi.connection import Connection
+from ibapi.contract import Contract
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.pacing import Pacer
+from ibapi.wrapper import EWrapper
+from ibapi.server_versions import MAX_CLIENT_VER
+
+
+class TimeWrapper(EWrapper):
+    def __init__(self):
+        EWrapper.__init__(self)
+        self.times = []
+
+    def currentTime(self, time:int):
+        self.times.append(time)
+
+
+class SentConnection:
+    def __init__(self):
+        self.sent = []
+
+    def isConnected(self):
+        return True
+
+    def sendMsg(self, msg):
+        self.sent.append(msg)
+
+    def flush(self):
+        self.sent.append(None)
+
+
+def make_contract(symbol):
+    contract = Contract()
+    contract.symbol = symbol
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.primaryExchange = "ISLAND"
+    contract.currency = "USD"
+    return contract
+
+
+def make_payload(*vals):
+    return "".join(comm.make_field(val) for val in vals).encode()
+
+
+class ClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.wrapper = TimeWrapper()
+        self.client = EClient(self.wrapper)
+        self.client.decoder = Decoder(self.wrapper, MAX_CLIENT_VER)
+
+
+    def test_run_drains_queue(self):
+        self.client.msg_queue.put(make_payload(IN.CURRENT_TIME, 1, 100))
+        self.client.msg_queue.put([make_payload(IN.CURRENT_TIME, 1, 101),
+                                   make_payload(IN.CURRENT_TIME, 1, 102)])
+        self.client.msg_queue.put(make_payload(IN.CURRENT_TIME, 1, 103))
+
+        self.client.run()
+
+        self.assertEqual(self.wrapper.times, [100, 101, 102, 103])
+        self.assertEqual(self.client.msgLoopWakeups, 1)
+        self.assertEqual(self.client.msgLoopMaxMsgs, 4)
+        self.assertEqual(self.client.msgsPerWake(), 4)
+
+    def test_contract_fields_cached(self):
+        self.client.conn = SentConnection()
+        self.client.connState = EClient.CONNECTED
+        self.client.serverVersion_ = MAX_CLIENT_VER
+
+        self.client.reqMktData(1, make_contract("AAPL"), "", False, False, [])
+        self.client.reqMktData(2, make_contract("AAPL"), "", False, False, [])
+        self.client.reqMktData(3, make_contract("MSFT"), "", False, False, [])
+
+        self.assertEqual(len(self.client.contractEncoder.cache), 2)
+        (first, second, third) = [comm.read_fields(msg[4:])
+                                  for msg in self.client.conn.sent]
+        self.assertEqual(first[3:15], (b"0", b"AAPL", b"STK", b"", b"0.0", b"",
+            b"", b"SMART", b"ISLAND", b"USD", b"", b""))
+        self.assertEqual(first[3:], second[3:])
+        self.assertEqual(third[4], b"MSFT")
+
+
+    def test_orders_skip_coalescing(self):
+        (sock, peer) = socket.socketpair()
+        peer.settimeout(1)
+        self.client.conn = Connection("127.0.0.1", 0, coalesceSize=4096, coalesceDelay=10)
+        self.client.conn.socket = sock
+        self.client.connState = EClient.CONNECTED
+        self.client.serverVersion_ = MAX_CLIENT_VER
+        try:
+            self.client.reqCurrentTime()
+            self.assertEqual(self.client.conn.nFlushes, 0)
+            self.client.cancelOrder(7)
+
+            (_, first, rest) = comm.read_msg(peer.recv(1024))
+            (_, second, _) = comm.read_msg(rest)
+            self.assertEqual(self.client.conn.nFlushes, 1)
+            self.assertEqual([comm.read_fields(msg)[0] for msg in (first, second)],
+                             [b"49", b"4"], "the order goes out with what was pending before it")
+        finally:
+            self.client.conn.disconnect()
+            peer.close()
+
+
+    def test_flush_does_not_wait_for_pacing(self):
+        conn = SentConnection()
+        self.client.conn = conn
+        self.client.connState = EClient.CONNECTED
+        self.client.serverVersion_ = MAX_CLIENT_VER
+        self.client.pacer = Pacer(conn.sendMsg, rate=1, burst=1)
+        try:
+            for _ in range(3):
+                self.client.reqCurrentTime()
+            start = time.monotonic()
+            self.client.flush()
+
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertEqual(len(conn.sent), 2, "one message sent, then the flush")
+            self.assertIsNone(conn.sent[-1])
+            self.assertEqual(self.client.pacer.pending(), 2)
+        finally:
+            self.client.pacer.stop()
+
+
+if "__main__" == __name__:
+    unittest.main()
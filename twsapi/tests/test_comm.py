@@ -61,6 +61,77 @@ class CommTestCase(unittest.TestCase):
         self.assertEqual(fields[1].decode(), text2)        
 
 
+    def test_readFieldsLazy(self):
+        text = comm.make_field("ABCD") + comm.make_field("") + comm.make_field(123)
+
+        fields = comm.read_fields(text)
+        lazy = comm.read_fields_lazy(text)
+
+        self.assertEqual(lazy[1], fields[1])
+        self.assertEqual(lazy[-1], fields[-1])
+        self.assertEqual(lazy[1:], fields[1:])
+        self.assertEqual(tuple(lazy), fields)
+        self.assertEqual(len(lazy), len(fields))
+        with self.assertRaises(IndexError):
+            lazy[3]
+        with self.assertRaises(IndexError):
+            lazy[-4]
+
+
+    def test_readFieldsLazyInPlace(self):
+        text = comm.make_field("ABCD") + comm.make_field("") + comm.make_field(123)
+        buf = bytearray(b"xx" + text.encode())
+        fields = comm.read_fields(text)
+
+        lazy = comm.read_fields_lazy(memoryview(buf)[2:])
+        self.assertEqual(lazy[2], b"123")
+        self.assertIsInstance(lazy[0], bytes)
+        self.assertEqual(lazy[0:2], fields[0:2])
+        self.assertEqual(tuple(lazy), fields)
+        self.assertTrue(lazy)
+        self.assertFalse(comm.read_fields_lazy(bytearray()))
+        # the fields are read where they lie
+        buf[2] = ord("Z")
+        self.assertEqual(comm.read_fields_lazy(memoryview(buf)[2:])[0], b"ZBCD")
+
+
+    def test_hasFields(self):
+        text = comm.make_field("ABCD") + comm.make_field("") + comm.make_field(123)
+
+        for fields in (comm.read_fields(text), comm.read_fields_lazy(text)):
+            self.assertEqual([comm.has_fields(fields, n) for n in (2, 3, 4)],
+                             [False, True, False])
+
+
+    def test_framer(self):
+        msgs = [comm.make_msg(comm.make_field(text)) for text in ("ABCD", "123", "")]
+        stream = b"".join(msgs)
+
+        framer = comm.MsgFramer(16)
+        received = []
+        for i in range(0, len(stream), 3):
+            framer.feed(stream[i:i+3])
+            received += [bytes(msg) for msg in framer.frames()]
+
+        self.assertEqual(received, [b"ABCD\0", b"123\0", b"\0"])
+        self.assertEqual(len(framer), 0, "there should be no remainder msg")
+
+
+    def test_framer_grows(self):
+        text = "X" * 100
+        msg = comm.make_msg(comm.make_field(text))
+
+        framer = comm.MsgFramer(8)
+        framer.feed(msg[0:50])
+        self.assertEqual(list(framer.frames()), [])
+        framer.feed(msg[50:])
+        frames = [bytes(f) for f in framer.frames()]
+
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(comm.read_fields(frames[0])[0].decode(), text)
+        self.assertGreaterEqual(framer.capacity(), len(msg))
+
+
 if "__main__" == __name__:
     unittest.main()
         
@@ -0,0 +1,135 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import queue
+import threading
+import time
+
+from ibapi.comm import make_field
+from ibapi.conflation import (ConflatingQueue, conflationKey)
+from ibapi.message import IN
+from ibapi.simulator import TwsSimulator
+from ibapi.ticktype import TickTypeEnum
+
+from tests.test_simulator import (SimulatorApp, make_contract, make_order)
+
+
+def make_payload(*vals):
+    return "".join(make_field(val) for val in vals).encode()
+
+
+def tick_price(reqId, tickType, price):
+    return make_payload(IN.TICK_PRICE, 6, reqId, tickType, price, 100, 0)
+
+
+def tick_size(reqId, tickType, size):
+    return make_payload(IN.TICK_SIZE, 6, reqId, tickType, size)
+
+
+class ConflationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.msg_queue = ConflatingQueue(4)
+
+
+    def test_key(self):
+        self.assertEqual(conflationKey(tick_price(5, TickTypeEnum.BID, 1.5)),
+                         (b"1", b"5", b"1"))
+        self.assertIsNone(conflationKey(make_payload(IN.ORDER_STATUS, 5, "Filled")))
+        self.assertIsNone(conflationKey(b""))
+
+
+    def test_conflate(self):
+        status = make_payload(IN.ORDER_STATUS, 7, "Filled", 5, 0)
+        msgs = [tick_price(1, TickTypeEnum.BID, 1.0),
+                tick_size(1, TickTypeEnum.BID_SIZE, 100),
+                status,
+                tick_price(1, TickTypeEnum.BID, 1.1),
+                tick_price(2, TickTypeEnum.BID, 7.0),
+                status,
+                tick_price(1, TickTypeEnum.BID, 1.2)]
+        for msg in msgs:
+            self.msg_queue.put(msg)
+
+        self.assertEqual(self.msg_queue.qsize(), 5)
+        self.assertEqual(self.msg_queue.get(), [msgs[6], msgs[1], status, msgs[4], status])
+        self.assertTrue(self.msg_queue.empty())
+
+        # a tick handed out is not replaced any more
+        self.msg_queue.put(tick_price(1, TickTypeEnum.BID, 1.3))
+        self.assertEqual(self.msg_queue.get_nowait(), [tick_price(1, TickTypeEnum.BID, 1.3)])
+
+
+    def test_batch(self):
+        msgs = [tick_price(1, TickTypeEnum.LAST, 10. + idx) for idx in range(5)]
+        self.msg_queue.put(msgs)
+        self.msg_queue.put([b""])
+
+        self.assertEqual(self.msg_queue.get(), [msgs[-1], b""])
+        stats = self.msg_queue.stats()
+        self.assertEqual((stats["put"], stats["conflated"], stats["highWater"]), (6, 4, 2))
+
+
+    def test_overflow(self):
+        statuses = [make_payload(IN.ORDER_STATUS, orderId) for orderId in range(6)]
+        for msg in statuses:
+            self.msg_queue.put(msg)
+
+        self.assertEqual(self.msg_queue.get(), statuses, "no message but ticks may be dropped")
+        self.assertEqual(self.msg_queue.nOverflows, 2)
+        self.assertEqual(self.msg_queue.highWater, 6)
+
+
+    def test_get_timeout(self):
+        with self.assertRaises(queue.Empty):
+            self.msg_queue.get(timeout=0.01)
+        with self.assertRaises(queue.Empty):
+            self.msg_queue.get_nowait()
+
+        threading.Timer(0.01, self.msg_queue.put, (b"",)).start()
+        self.assertEqual(self.msg_queue.get(timeout=5), [b""])
+
+
+class SlowApp(SimulatorApp):
+    """ takes its time over every tick """
+
+    def tickPrice(self, reqId, tickType, price, attrib):
+        time.sleep(0.001)
+        SimulatorApp.tickPrice(self, reqId, tickType, price, attrib)
+
+
+class ConflationSimulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = TwsSimulator(tickRate=20000).start()
+        self.app = SlowApp()
+        self.app.setEventDriven(True)
+        self.app.setConflation(True, 100)
+        self.app.connect(self.simulator.host, self.simulator.port, 1)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        self.app.wait("nextValidId")
+
+
+    def tearDown(self):
+        self.app.disconnect()
+        self.thread.join(2)
+        self.simulator.stop()
+
+
+    def test_slow_consumer(self):
+        app = self.app
+        self.assertIsInstance(app.msg_queue, ConflatingQueue)
+        for reqId in range(3):
+            app.reqMktData(reqId, make_contract("S%d" % reqId), "", False, False, [])
+        app.wait("ticks")
+        app.placeOrder(app.nextId, make_contract("AAPL"), make_order("BUY", "MKT", 5))
+        app.wait("filled")
+
+        self.assertIn((app.nextId, "Filled", 5, 0), app.statuses)
+        self.assertGreater(app.msg_queue.nConflated, 0)
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import socket
+import threading
+import time
+
+from ibapi import comm
+from ibapi.connection import Connection
+
+
+class ConnectionTestCase(unittest.TestCase):
+    def setUp(self):
+        (self.sock, self.peer) = socket.socketpair()
+        self.conn = Connection("127.0.0.1", 0, recvSize=8)
+        self.conn.socket = self.sock
+
+
+    def tearDown(self):
+        self.conn.disconnect()
+        self.peer.close()
+
+
+    def test_recvMsgInto(self):
+        msg = comm.make_msg(comm.make_field("ABCD") + comm.make_field("123"))
+        self.peer.sendall(msg)
+
+        framer = comm.MsgFramer(4)
+        received = []
+        while len(received) == 0:
+            nBytes = self.conn.recvMsgInto(framer)
+            self.assertLessEqual(nBytes, 8, "read size not honored")
+            received += [bytes(f) for f in framer.frames()]
+
+        self.assertEqual(received, [msg[4:]])
+
+
+    def test_recvMsgInto_closed(self):
+        self.peer.close()
+
+        nBytes = self.conn.recvMsgInto(comm.MsgFramer(16))
+
+        self.assertEqual(nBytes, 0)
+        self.assertFalse(self.conn.isConnected())
+
+
+    def test_coalesced_sendMsg(self):
+        self.conn.coalesceSize = 3 * 8
+        self.conn.coalesceDelay = 10
+        msgs = [comm.make_msg(comm.make_field("MSG%d" % i)) for i in range(3)]
+
+        self.conn.sendMsg(msgs[0])
+        self.conn.sendMsg(msgs[1])
+        self.assertEqual(self.conn.nFlushes, 0)
+        self.conn.sendMsg(msgs[2])
+
+        self.assertEqual(self.conn.nFlushes, 1)
+        self.peer.settimeout(1)
+        self.assertEqual(self.peer.recv(1024), b"".join(msgs))
+
+
+    def test_coalesced_sendMsg_timer(self):
+        self.conn.coalesceSize = 1024
+        self.conn.coalesceDelay = 0.01
+        msg = comm.make_msg(comm.make_field("MSG"))
+
+        self.conn.sendMsg(msg)
+        self.peer.settimeout(1)
+
+        self.assertEqual(self.peer.recv(1024), msg)
+        with self.conn.lock:
+            # the timer thread counts the flush once sendall returned
+            self.assertEqual(self.conn.nFlushes, 1)
+
+
+    def test_coalesced_timer_failure(self):
+        self.conn.coalesceSize = 1024
+        self.conn.coalesceDelay = 0.01
+        self.peer.close()
+
+        self.conn.sendMsg(comm.make_msg(comm.make_field("MSG")))
+        deadline = time.monotonic() + 1
+        while self.conn.isConnected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertFalse(self.conn.isConnected(), "a failed timer flush should disconnect")
+
+
+    def test_failed_flush_keeps_pending(self):
+        msg = comm.make_msg(comm.make_field("MSG"))
+        self.conn.coalesceSize = 1024
+        self.conn.coalesceDelay = 10
+        self.conn.sendMsg(msg)
+        self.conn.socket = BrokenSocket()
+
+        with self.assertRaises(OSError):
+            self.conn.flush()
+        self.assertEqual(self.conn.pending, [msg])
+        self.conn.socket = self.sock
+
+
+class BrokenSocket:
+    def sendall(self, data):
+        raise BrokenPipeError()
+
+
+class EventDrivenConnectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.conn = Connection("127.0.0.1", self.listener.getsockname()[1],
+                               eventDriven=True)
+        self.conn.connect()
+        (self.peer, _) = self.listener.accept()
+
+
+    def tearDown(self):
+        self.conn.disconnect()
+        self.peer.close()
+        self.listener.close()
+
+
+    def test_recvMsg(self):
+        msg = comm.make_msg(comm.make_field("ABCD"))
+        self.peer.sendall(msg)
+
+        self.assertEqual(self.conn.recvMsg(), msg)
+
+
+    def test_disconnect_wakes_reader(self):
+        result = []
+        reader = threading.Thread(target=lambda: result.append(self.conn.recvMsg()))
+        reader.start()
+        time.sleep(0.05)
+
+        start = time.monotonic()
+        self.conn.disconnect()
+        reader.join(1)
+
+        self.assertFalse(reader.is_alive(), "reader was not woken up")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(result, [b""])
+        self.assertIsNone(self.conn.selector, "selector was not released")
+
+
+if "__main__" == __name__:
+    unittest.main()
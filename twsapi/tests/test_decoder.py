@@ -0,0 +1,313 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+
+from ibapi import (comm, columnar)
+from ibapi.compact import (CompactBarData, CompactTickAttrib)
+from ibapi.decoder import Decoder
+from ibapi.orderdecoder import ORDER_SUMMARY
+from ibapi.msgplan import (MessagePlan, MESSAGE_PLANS)
+from ibapi.message import IN
+from ibapi.utils import BadMessage
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+from ibapi.server_versions import (MAX_CLIENT_VER, MIN_SERVER_VER_ENCODE_MSG_ASCII7,
+    MIN_SERVER_VER_FRACTIONAL_POSITIONS, MIN_SERVER_VER_REALIZED_PNL,
+    MIN_SERVER_VER_LAST_LIQUIDITY, MIN_SERVER_VER_SYNT_REALTIME_BARS)
+
+
+class RecordingWrapper(EWrapper):
+    """ records every callback as a (name, args) tuple """
+
+    def __init__(self):
+        EWrapper.__init__(self)
+        self.calls = []
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name[0].islower() and name != "calls" and callable(attr):
+            calls = object.__getattribute__(self, "calls")
+            return lambda *args: calls.append((name, args))
+        return attr
+
+
+def make_fields(*vals):
+    return comm.read_fields("".join(comm.make_field(val) for val in vals).encode())
+
+
+def comparable(calls):
+    return [(name, [vars(arg) if hasattr(arg, "__dict__") else arg for arg in args])
+            for (name, args) in calls]
+
+
+class DecoderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.wrapper = RecordingWrapper()
+        self.decoder = Decoder(self.wrapper, MAX_CLIENT_VER)
+
+
+    def test_signature(self):
+        self.decoder.interpret(make_fields(IN.TICK_SIZE, 1, 7, 0, 300))
+        self.decoder.interpret(make_fields(IN.ACCOUNT_SUMMARY, 1, 8, "DU1", "SMA", "1000.5", "USD"))
+
+        self.assertEqual(self.wrapper.calls, [
+            ("tickSize", (7, 0, 300)),
+            ("accountSummary", (8, "DU1", "SMA", "1000.5", "USD"))])
+
+
+    def test_lazy_fields(self):
+        self.decoder.rawTickAttribs = True
+        self.decoder.compile()
+
+        for readFields in (comm.read_fields, comm.read_fields_lazy):
+            for vals in ((IN.TICK_SIZE, 1, 7, 0, 300),
+                         (IN.TICK_PRICE, 6, 7, 9, 10.5, 0, 0),
+                         (IN.PNL, 5, 2.5, 1.5, 0.5)):
+                self.decoder.interpret(readFields(
+                    "".join(comm.make_field(val) for val in vals).encode()))
+
+        self.assertEqual(len(self.wrapper.calls), 6)
+        self.assertEqual(self.wrapper.calls[0:2], self.wrapper.calls[3:5])
+        self.assertEqual(self.wrapper.calls[2], ("pnl", (5, 2.5, 1.5, 0.5)))
+        self.assertEqual(self.wrapper.calls[5], ("pnl", (5, 2.5, 1.5, 0.5)))
+
+
+    def test_lazy_fields_indexed(self):
+        class IndexedOnly(comm.LazyFields):
+            __slots__ = ()
+
+            def __len__(self):
+                raise AssertionError("len() of the fields")
+
+            def __getitem__(self, idx):
+                if isinstance(idx, slice):
+                    raise AssertionError("slice of the fields")
+                return comm.LazyFields.__getitem__(self, idx)
+
+        for vals in ((IN.TICK_SIZE, 1, 7, 0, 300),
+                     (IN.TICK_PRICE, 6, 7, 1, 10.5, 0, 0),
+                     (IN.PNL, 5, 2.5, 1.5, 0.5)):
+            self.decoder.interpret(IndexedOnly(
+                "".join(comm.make_field(val) for val in vals).encode()))
+
+        self.assertEqual([call[0] for call in self.wrapper.calls],
+                         ["tickSize", "tickPrice", "tickSize", "pnl"])
+
+
+    def test_signature_wrong_length(self):
+        self.decoder.interpret(make_fields(IN.TICK_SIZE, 1, 7, 0))
+
+        self.assertEqual(self.wrapper.calls, [])
+
+
+    def test_signature_encoding(self):
+        fields = make_fields(IN.ERR_MSG, 2, 5, 200, "caf\\u00e9")
+
+        self.decoder.interpret(fields)
+        self.decoder.serverVersion = MIN_SERVER_VER_ENCODE_MSG_ASCII7 - 1
+        self.decoder.interpret(fields)
+
+        self.assertEqual(self.wrapper.calls, [
+            ("error", (5, 200, "caf\u00e9")),
+            ("error", (5, 200, "caf\\u00e9"))])
+
+
+    def test_serverVersion(self):
+        msgDecoders = self.decoder.msgDecoders
+        self.decoder.serverVersion = MAX_CLIENT_VER
+        self.assertIs(self.decoder.msgDecoders, msgDecoders)
+
+        self.decoder.serverVersion = MAX_CLIENT_VER - 1
+        self.assertIsNot(self.decoder.msgDecoders, msgDecoders)
+
+
+    def test_tickPrice(self):
+        fields = make_fields(IN.TICK_PRICE, 6, 7, TickTypeEnum.BID, 10.5, 300, 3)
+
+        self.decoder.interpret(fields)
+        self.decoder.processTickPriceMsg(iter(fields))
+
+        self.assertEqual(len(self.wrapper.calls), 4)
+        self.assertEqual(self.wrapper.calls[1], self.wrapper.calls[3])
+        self.assertEqual(self.wrapper.calls[0][1][0:3], self.wrapper.calls[2][1][0:3])
+        self.assertEqual(vars(self.wrapper.calls[0][1][3]), vars(self.wrapper.calls[2][1][3]),
+                         "fast path differs from processTickPriceMsg")
+        (name, (reqId, tickType, price, attrib)) = self.wrapper.calls[0]
+        self.assertEqual((name, reqId, tickType, price), ("tickPrice", 7, TickTypeEnum.BID, 10.5))
+        self.assertEqual((attrib.canAutoExecute, attrib.pastLimit, attrib.preOpen),
+                         (True, True, False))
+        self.assertEqual(self.wrapper.calls[1], ("tickSize", (7, TickTypeEnum.BID_SIZE, 300)))
+
+
+    def test_tick_empty_fields(self):
+        self.decoder.interpret(make_fields(IN.TICK_PRICE, 6, "", TickTypeEnum.CLOSE, "", "", 0))
+        self.decoder.interpret(make_fields(IN.TICK_SIZE, 1, "", TickTypeEnum.VOLUME, ""))
+
+        self.assertEqual(self.wrapper.calls[0][1][0:3], (0, TickTypeEnum.CLOSE, 0.))
+        self.assertEqual(self.wrapper.calls[1], ("tickSize", (0, TickTypeEnum.VOLUME, 0)))
+
+
+    def test_tickPrice_raw_attribs(self):
+        self.decoder.rawTickAttribs = True
+        self.decoder.compile()
+
+        self.decoder.interpret(make_fields(IN.TICK_PRICE, 6, 7, TickTypeEnum.CLOSE, 10.5, 0, 4))
+
+        self.assertEqual(self.wrapper.calls, [("tickPrice", (7, TickTypeEnum.CLOSE, 10.5, 4))])
+
+
+    def test_compact_objects(self):
+        self.decoder.compactObjects = True
+        self.decoder.compile()
+
+        self.decoder.interpret(make_fields(IN.TICK_PRICE, 6, 7, TickTypeEnum.CLOSE, 10.5, 0, 2))
+        self.decoder.interpret(make_fields(IN.HISTORICAL_DATA, 7, "start", "end", 1,
+            "20200102", 1.5, 2.5, 0.5, 2.0, 100, 1.75, 10))
+
+        (_, (_, _, _, attrib)) = self.wrapper.calls[0]
+        self.assertIs(type(attrib), CompactTickAttrib)
+        self.assertEqual((attrib.canAutoExecute, attrib.pastLimit), (False, True))
+        (name, (reqId, bar)) = self.wrapper.calls[1]
+        self.assertEqual((name, reqId), ("historicalData", 7))
+        self.assertIs(type(bar), CompactBarData)
+        self.assertFalse(hasattr(bar, "__dict__"))
+        self.assertEqual((bar.date, bar.open, bar.close, bar.volume, bar.barCount),
+                         ("20200102", 1.5, 2.0, 100, 10))
+        self.assertEqual(self.wrapper.calls[2], ("historicalDataEnd", (7, "start", "end")))
+
+
+    @unittest.skipIf(columnar.numpy is None, "numpy is not installed")
+    def test_historical_batch(self):
+        fields = make_fields(IN.HISTORICAL_DATA, 7, "start", "end", 2,
+            "20200102", 1.5, 2.5, 0.5, 2.0, 100, 1.75, 10,
+            "20200103", 2.0, 3.0, 1.5, "", 200, 2.25, 20)
+        self.decoder.interpret(fields)
+        self.decoder.historicalBatch = True
+        self.decoder.compile()
+        self.decoder.interpret(fields)
+
+        bars = [bar for (name, (_, bar)) in self.wrapper.calls[0:2]]
+        (name, (reqId, batch)) = self.wrapper.calls[3]
+        self.assertEqual((name, reqId, len(batch)), ("historicalDataBatch", 7, 2))
+        for attr in ("date", "open", "high", "low", "close", "volume", "average", "barCount"):
+            self.assertEqual(list(getattr(batch, attr)), [getattr(bar, attr) for bar in bars])
+        self.assertEqual(self.wrapper.calls[4], self.wrapper.calls[2])
+
+
+    @unittest.skipIf(columnar.numpy is None, "numpy is not installed")
+    def test_historical_batch_truncated(self):
+        self.decoder.historicalBatch = True
+        self.decoder.compile()
+
+        with self.assertRaises(BadMessage):
+            self.decoder.interpret(make_fields(IN.HISTORICAL_DATA, 7, "start", "end", 2,
+                "20200102", 1.5, 2.5, 0.5, 2.0, 100, 1.75, 10))
+
+
+    @unittest.skipIf(columnar.numpy is None, "numpy is not installed")
+    def test_historical_ticks_batch(self):
+        bidAsk = make_fields(IN.HISTORICAL_TICKS_BID_ASK, 7, 2,
+            1600000000, 1, 10.5, 10.75, 100, 200,
+            1600000001, 2, 10.25, 10.5, 300, 400, 1)
+        last = make_fields(IN.HISTORICAL_TICKS_LAST, 8, 2,
+            1600000000, 0, 10.5, 100, "ISLAND", "",
+            1600000001, 2, 10.25, 300, "NYSE", "  T", 0)
+        self.decoder.interpret(bidAsk)
+        self.decoder.interpret(last)
+        self.decoder.historicalTicksBatch = True
+        self.decoder.compile()
+        self.decoder.interpret(bidAsk)
+        self.decoder.interpret(last)
+
+        (name, (reqId, ticks, done)) = self.wrapper.calls[2]
+        self.assertEqual((name, reqId, done), ("historicalTicksBidAskBatch", 7, True))
+        for (row, tick) in zip(ticks, self.wrapper.calls[0][1][1]):
+            self.assertEqual((row["time"], row["priceBid"], row["priceAsk"], row["sizeBid"], row["sizeAsk"]),
+                             (tick.time, tick.priceBid, tick.priceAsk, tick.sizeBid, tick.sizeAsk))
+            self.assertEqual((row["attribs"] & 1 != 0, row["attribs"] & 2 != 0),
+                             (tick.tickAttribBidAsk.askPastHigh, tick.tickAttribBidAsk.bidPastLow))
+
+        (name, (reqId, ticks, done)) = self.wrapper.calls[3]
+        self.assertEqual((name, reqId, done, len(ticks)), ("historicalTicksLastBatch", 8, False, 2))
+        for (row, tick) in zip(ticks, self.wrapper.calls[1][1][1]):
+            self.assertEqual((row["time"], row["price"], row["size"], row["exchange"], row["specialConditions"]),
+                             (tick.time, tick.price, tick.size, tick.exchange, tick.specialConditions))
+
+
+    def test_open_order_summary(self):
+        fields = make_fields(IN.OPEN_ORDER, 5, 1, "AAPL", "STK", "", 0, "", "",
+            "SMART", "USD", "AAPL", "NMS", "BUY", 10, "LMT", 1.5, "", "GTC",
+            "oca", *[""] * 300)
+        self.decoder.interpret(fields)
+        self.decoder.orderProjection = ORDER_SUMMARY
+        self.decoder.compile()
+        self.decoder.interpret(fields)
+
+        ((name, full), (_, summary)) = self.wrapper.calls
+        self.assertEqual(name, "openOrder")
+        (orderId, contract, order, orderState) = summary
+        self.assertEqual((orderId, contract.symbol, contract.exchange, order.action,
+                          order.totalQuantity, order.orderType, order.lmtPrice, order.tif),
+                         (5, "AAPL", "SMART", "BUY", 10, "LMT", 1.5, "GTC"))
+        for attr in ORDER_SUMMARY:
+            for (obj, fullObj) in zip(summary[1:], full[1:]):
+                if hasattr(obj, attr):
+                    self.assertEqual(getattr(obj, attr), getattr(fullObj, attr), attr)
+        self.assertEqual(full[2].ocaGroup, "oca")
+        self.assertEqual(order.ocaGroup, "")
+        self.assertEqual(contract.tradingClass, "")
+
+        with self.assertRaises(BadMessage):
+            self.decoder.interpret(make_fields(IN.OPEN_ORDER, 5, 1, "AAPL"))
+
+
+    def test_message_plans(self):
+        # "not computed" indicators and numbers, that any field type accepts
+        vals = ["-2", "-1", "3", "0", "", "7"] * 8
+        for serverVersion in (MIN_SERVER_VER_FRACTIONAL_POSITIONS - 1,
+                              MIN_SERVER_VER_REALIZED_PNL,
+                              MIN_SERVER_VER_LAST_LIQUIDITY, MAX_CLIENT_VER):
+            self.decoder.serverVersion = serverVersion
+            for (msgId, makePlan, processName) in MESSAGE_PLANS:
+                plan = makePlan(MessagePlan(serverVersion))
+                versions = [None] if plan is None or plan.pinnedVersion is None \
+                    else [plan.pinnedVersion[1], 2]
+                for version in versions:
+                    fields = make_fields(msgId, *([version] if version else []), *vals)
+                    del self.wrapper.calls[:]
+                    self.decoder.interpret(fields)
+                    getattr(self.decoder, processName)(iter(fields))
+
+                    (planCall, processCall) = comparable(self.wrapper.calls)
+                    self.assertEqual(planCall, processCall,
+                                     "%s differs for %d" % (processName, serverVersion))
+
+                with self.assertRaises(BadMessage):
+                    self.decoder.interpret(make_fields(msgId, vals[0]))
+
+
+    def test_historical_data(self):
+        for serverVersion in (MIN_SERVER_VER_SYNT_REALTIME_BARS - 1, MAX_CLIENT_VER):
+            oldServer = serverVersion < MIN_SERVER_VER_SYNT_REALTIME_BARS
+            self.decoder.serverVersion = serverVersion
+            bar = ["20200102", 1.5, 2.5, 0.5, 2.0, 100, 1.75] + (["0"] if oldServer else []) + [10]
+            fields = make_fields(IN.HISTORICAL_DATA, *([3] if oldServer else []),
+                                 7, "start", "end", 2, *bar, *bar)
+            del self.wrapper.calls[:]
+            self.decoder.interpret(fields)
+            self.decoder.processHistoricalDataMsg(iter(fields))
+
+            calls = comparable(self.wrapper.calls)
+            self.assertEqual(len(calls), 6)
+            self.assertEqual(calls[0:3], calls[3:6])
+            self.assertEqual(calls[0][1][1]["barCount"], 10)
+
+            with self.assertRaises(BadMessage):
+                self.decoder.interpret(fields[:-1])
+
+
+if "__main__" == __name__:
+    unittest.main()
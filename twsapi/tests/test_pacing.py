@@ -0,0 +1,132 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import threading
+import time
+
+from ibapi import comm
+from ibapi.message import OUT
+from ibapi.pacing import (Pacer, msgPriority, ORDER_PRIORITY, DATA_PRIORITY)
+
+
+class PacingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.allSent = threading.Event()
+        self.expected = 0
+        self.pacer = Pacer(self.send, rate=200, burst=2)
+
+
+    def tearDown(self):
+        self.pacer.stop()
+
+
+    def send(self, msg):
+        self.sent.append((time.monotonic(), msg))
+        if len(self.sent) == self.expected:
+            self.allSent.set()
+
+
+    def test_msgPriority(self):
+        self.assertEqual(msgPriority(comm.make_field(OUT.PLACE_ORDER) + "7\0"),
+                         ORDER_PRIORITY)
+        self.assertEqual(msgPriority(comm.make_field(OUT.CANCEL_MKT_DATA) + "7\0"),
+                         DATA_PRIORITY)
+
+
+    def test_burst_then_rate(self):
+        self.expected = 12
+        start = time.monotonic()
+        for i in range(self.expected):
+            self.pacer.sendMsg(i)
+
+        self.assertEqual([msg for (_, msg) in self.sent], [0, 1])
+        self.assertTrue(self.allSent.wait(1))
+        self.assertEqual([msg for (_, msg) in self.sent], list(range(12)))
+        # 10 messages over the burst at 200 per second
+        self.assertGreaterEqual(self.sent[-1][0] - start, 0.045)
+
+
+    def test_orders_first(self):
+        self.expected = 6
+        for i in range(5):
+            self.pacer.sendMsg("data%d" % i, DATA_PRIORITY)
+        self.pacer.sendMsg("order", ORDER_PRIORITY)
+
+        self.assertTrue(self.allSent.wait(1))
+        self.assertEqual([msg for (_, msg) in self.sent],
+                         ["data0", "data1", "order", "data2", "data3", "data4"])
+
+
+    def test_order_flush(self):
+        flushed = []
+        pacer = Pacer(self.send, rate=200, burst=2, flush=lambda: flushed.append(len(self.sent)))
+        try:
+            pacer.sendMsg("data", DATA_PRIORITY)
+            pacer.sendMsg("order", ORDER_PRIORITY)
+        finally:
+            pacer.stop()
+
+        self.assertEqual(flushed, [2], "only an order should be flushed")
+
+
+    def test_send_outside_lock(self):
+        release = threading.Event()
+
+        def blockingSend(msg):
+            self.send(msg)
+            if msg == "second":
+                release.wait(5)
+
+        pacer = Pacer(blockingSend, rate=1000, burst=1)
+        try:
+            pacer.sendMsg("first")
+            pacer.sendMsg("second")
+            while not any(msg == "second" for (_, msg) in self.sent):
+                time.sleep(0.001)
+
+            caller = threading.Thread(target=pacer.sendMsg, args=("third",))
+            caller.start()
+            caller.join(1)
+            self.assertFalse(caller.is_alive(), "sendMsg waited for the pacing thread's send")
+            release.set()
+            self.assertTrue(pacer.drain(1))
+        finally:
+            release.set()
+            pacer.stop()
+        self.assertEqual([msg for (_, msg) in self.sent], ["first", "second", "third"])
+
+
+    def test_stop_drains(self):
+        for i in range(6):
+            self.pacer.sendMsg(i, ORDER_PRIORITY if i == 5 else DATA_PRIORITY)
+        self.pacer.stop(1)
+
+        self.assertEqual(sorted(msg for (_, msg) in self.sent), list(range(6)))
+        self.assertEqual(self.pacer.pending(), 0)
+
+
+    def test_send_failure(self):
+        disconnected = threading.Event()
+
+        def failingSend(msg):
+            if msg != 0:
+                raise BrokenPipeError()
+            self.send(msg)
+
+        pacer = Pacer(failingSend, rate=200, burst=1, disconnect=disconnected.set)
+        with self.assertLogs("ibapi.pacing", "ERROR"):
+            for i in range(4):
+                pacer.sendMsg(i)
+            self.assertTrue(disconnected.wait(1))
+        pacer.sendMsg(4)
+
+        self.assertEqual(pacer.pending(), 0)
+        self.assertEqual([msg for (_, msg) in self.sent], [0])
+
+
+if "__main__" == __name__:
+    unittest.main()
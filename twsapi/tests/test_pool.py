@@ -0,0 +1,161 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import threading
+import time
+
+from ibapi.pool import EClientPool
+from ibapi.simulator import TwsSimulator
+
+from tests.test_simulator import (SimulatorApp, make_contract, make_order)
+
+
+class PoolApp(SimulatorApp):
+    """ counts the nextValidId and managedAccounts calls """
+
+    def __init__(self):
+        SimulatorApp.__init__(self)
+        self.nNextValidId = 0
+        self.accounts = []
+        self.tickThreads = set()
+
+    def nextValidId(self, orderId):
+        self.nNextValidId += 1
+        SimulatorApp.nextValidId(self, orderId)
+
+    def managedAccounts(self, accountsList):
+        self.accounts.append(accountsList)
+
+    def tickPrice(self, reqId, tickType, price, attrib):
+        self.tickThreads.add(threading.current_thread().name)
+        SimulatorApp.tickPrice(self, reqId, tickType, price, attrib)
+
+
+class PoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = TwsSimulator(tickRate=2000).start()
+        self.other = TwsSimulator(tickRate=2000).start()
+        self.app = PoolApp()
+        self.app.setEventDriven(True)
+        self.pool = EClientPool(self.app, 2, ports=[self.simulator.port, self.other.port])
+        self.pool.connect(self.simulator.host, self.simulator.port, 7)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        self.app.wait("nextValidId")
+
+
+    def tearDown(self):
+        self.pool.disconnect()
+        self.thread.join(2)
+        self.simulator.stop()
+        self.other.stop()
+
+
+    def test_connect(self):
+        (first, second) = self.pool.secondaries
+        self.assertEqual([(client.clientId, client.port) for client in self.pool.clients()],
+                         [(7, self.simulator.port), (8, self.simulator.port), (9, self.other.port)])
+        self.assertTrue(first.eventDriven, "secondaries should copy the primary's options")
+        self.assertEqual(self.pool.dataClients, [first, second])
+        self.assertEqual(self.app.nNextValidId, 1)
+        self.assertEqual(self.app.accounts, ["DU1234567"])
+        self.assertEqual(self.pool.serverVersion(), self.app.serverVersion())
+
+
+    def test_market_data(self):
+        pool = self.pool
+        pool.reqMarketDataType(1)
+        for reqId in range(10, 16):
+            pool.reqMktData(reqId, make_contract("S%d" % reqId), "", False, False, [])
+        pool.flush()
+        self.app.wait("ticks")
+
+        owners = [pool.connectionOf(reqId) for reqId in range(10, 16)]
+        self.assertEqual(owners, pool.secondaries * 3)
+        self.assertNotIn("MainThread", self.app.tickThreads)
+
+        for reqId in range(10, 16):
+            pool.cancelMktData(reqId)
+        self.assertEqual(pool.owners, {})
+        self.assertEqual(list(pool.loads.values()), [0, 0])
+        self.assertEqual(self.app.errors, [])
+
+
+    def test_orders_on_primary(self):
+        orderId = self.app.nextId
+        self.pool.placeOrder(orderId, make_contract("AAPL"), make_order("BUY", "MKT", 5))
+        self.app.wait("filled")
+
+        self.assertIn((orderId, "Filled", 5, 0), self.app.statuses)
+
+
+    def test_secondary_unavailable(self):
+        self.pool.disconnect()
+        self.thread.join(2)
+        self.other.stop()
+
+        self.pool.connect(self.simulator.host, self.simulator.port, 7)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        self.app.wait("nextValidId")
+
+        self.assertEqual(self.pool.dataClients, [self.pool.secondaries[0]])
+        self.assertEqual(len(self.pool.clients()), 2)
+
+
+
+    def test_secondary_dropped(self):
+        pool = self.pool
+        (first, second) = pool.secondaries
+        for reqId in (10, 11):
+            pool.reqMktData(reqId, make_contract("S%d" % reqId), "", False, False, [])
+        self.assertEqual([pool.connectionOf(reqId) for reqId in (10, 11)], [first, second])
+
+        self.other.stop()
+        deadline = time.monotonic() + 2
+        while second in pool.dataClients and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertFalse(second.isConnected())
+        self.assertEqual(pool.dataClients, [first])
+        self.assertEqual(pool.owners, {10: first})
+        self.app.ticks.clear()
+        self.app.events["ticks"].clear()
+        for reqId in range(12, 15):
+            pool.reqMktData(reqId, make_contract("S%d" % reqId), "", False, False, [])
+        pool.flush()
+        self.app.wait("ticks")
+
+        self.assertEqual([pool.connectionOf(reqId) for reqId in range(12, 15)], [first] * 3)
+        self.assertEqual(pool.loads, {first: 4})
+        self.assertLessEqual(set(self.app.ticks), {10, 12, 13, 14})
+
+        first.disconnect()
+        self.assertEqual(pool.dataClients, [self.app])
+        pool.reqMktData(15, make_contract("S15"), "", False, False, [])
+        self.assertIs(pool.connectionOf(15), self.app)
+
+
+    def test_no_secondaries(self):
+        self.pool.disconnect()
+        self.thread.join(2)
+
+        self.pool = EClientPool(self.app, 0)
+        self.pool.connect(self.simulator.host, self.simulator.port, 7)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        self.app.wait("nextValidId")
+
+        self.assertEqual(self.pool.clients(), [self.app])
+        self.assertEqual(self.pool.dataClients, [self.app])
+        self.pool.reqMktData(10, make_contract("AAPL"), "", False, False, [])
+        self.pool.flush()
+        self.app.wait("ticks")
+        self.assertIs(self.pool.connectionOf(10), self.app)
+
+
+if "__main__" == __name__:
+    unittest.main()
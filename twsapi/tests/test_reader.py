@@ -0,0 +1,74 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import queue
+
+from ibapi import comm
+from ibapi.reader import EReader
+
+
+class FakeConnection:
+    """ returns the scripted reads, then reports itself disconnected """
+
+    eventDriven = False
+
+    def __init__(self, reads):
+        self.reads = list(reads)
+
+    def isConnected(self):
+        return len(self.reads) > 0
+
+    def recvMsg(self):
+        return self.reads.pop(0)
+
+    def recvMsgInto(self, framer):
+        data = self.reads.pop(0)
+        framer.feed(data)
+        return len(data)
+
+
+class ReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.msgs = [comm.make_field(text).encode() for text in ("ABCD", "123", "XY")]
+        stream = b"".join(comm.make_msg(msg.decode()) for msg in self.msgs)
+        self.reads = [stream[0:10], stream[10:]]
+
+
+    def drain(self, msg_queue):
+        items = []
+        while not msg_queue.empty():
+            items.append(msg_queue.get_nowait())
+        return items
+
+
+    def test_queue(self):
+        for framer in (None, comm.MsgFramer(8)):
+            msg_queue = queue.Queue()
+            EReader(FakeConnection(self.reads), msg_queue, framer).run()
+            self.assertEqual(self.drain(msg_queue), self.msgs)
+
+
+    def test_batch(self):
+        msg_queue = queue.Queue()
+        EReader(FakeConnection(self.reads), msg_queue, batch=True).run()
+
+        batches = self.drain(msg_queue)
+        self.assertEqual(len(batches), 2, "one queue item per read expected")
+        self.assertEqual(sum(batches, []), self.msgs)
+
+
+    def test_inline(self):
+        msg_queue = queue.Queue()
+        dispatched = []
+        EReader(FakeConnection(self.reads), msg_queue, comm.MsgFramer(8),
+                dispatch=dispatched.append).run()
+
+        self.assertEqual(dispatched, self.msgs)
+        self.assertTrue(msg_queue.empty())
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import os
+import queue
+import tempfile
+import time
+
+from ibapi import comm
+from ibapi.decoder import Decoder
+from ibapi.message import IN
+from ibapi.reader import EReader
+from ibapi.recorder import (WireRecorder, WireReplayer, SESSION, MESSAGE)
+from ibapi.server_versions import MAX_CLIENT_VER
+
+from tests.test_decoder import RecordingWrapper
+from tests.test_reader import FakeConnection
+
+
+def make_payload(*vals):
+    return "".join(comm.make_field(val) for val in vals).encode()
+
+
+class RecorderTestCase(unittest.TestCase):
+    def setUp(self):
+        (fd, self.path) = tempfile.mkstemp(suffix=".wire")
+        os.close(fd)
+        os.remove(self.path)
+        self.msgs = [make_payload(IN.TICK_SIZE, 1, 7, 0, 300),
+                     make_payload(IN.PNL, 5, 2.5, 1.5, 0.5)]
+
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+    def record(self, serverVersion=MAX_CLIENT_VER):
+        recorder = WireRecorder(self.path)
+        recorder.startSession(serverVersion, "20240102 10:00:00 EST")
+        stream = b"".join(comm.make_msg(msg.decode()) for msg in self.msgs)
+        EReader(FakeConnection([stream[0:10], stream[10:]]), queue.Queue(),
+                recorder=recorder).run()
+        self.assertTrue(recorder.file.closed, "reader should close the recorder")
+
+
+    def test_records(self):
+        self.record()
+        self.record(MAX_CLIENT_VER - 1)
+
+        with WireReplayer(self.path) as replayer:
+            records = list(replayer.records())
+
+        self.assertEqual([kind for (_, kind, _) in records],
+                         [SESSION, MESSAGE, MESSAGE] * 2)
+        self.assertEqual([payload for (_, kind, payload) in records if kind == MESSAGE],
+                         self.msgs * 2)
+        timestamps = [timestamp for (timestamp, _, _) in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+
+    def test_truncated(self):
+        self.record()
+        with open(self.path, "ab") as f:
+            f.write(b"\1\2\3")
+
+        with WireReplayer(self.path) as replayer:
+            self.assertEqual(len(list(replayer.records())), 3)
+
+
+    def test_not_a_recording(self):
+        with open(self.path, "wb") as f:
+            f.write(b"garbage")
+
+        with self.assertRaises(ValueError):
+            WireReplayer(self.path)
+
+
+    def test_replay(self):
+        self.record()
+
+        wrapper = RecordingWrapper()
+        decoder = Decoder(wrapper, 0)
+        with WireReplayer(self.path) as replayer:
+            self.assertEqual(replayer.replay(decoder), 2)
+            start = time.monotonic()
+            self.assertEqual(replayer.replay(decoder, speed=1.0, lazyFields=True), 2)
+            self.assertLess(time.monotonic() - start, 1)
+
+        self.assertEqual(decoder.serverVersion, MAX_CLIENT_VER)
+        expected = [("tickSize", (7, 0, 300)), ("pnl", (5, 2.5, 1.5, 0.5))]
+        self.assertEqual(wrapper.calls, expected * 2)
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import concurrent.futures
+import threading
+
+from ibapi.execution import ExecutionFilter
+from ibapi.registry import (RequestRegistry, REQ_ID_BASE, NEXT_VALID_ID,
+    POSITIONS, waitAll)
+from ibapi.simulator import TwsSimulator
+from ibapi.utils import RequestError
+
+from tests.test_simulator import (SimulatorApp, make_contract, make_order)
+
+
+class RegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.registry = RequestRegistry()
+
+
+    def test_ids(self):
+        registry = self.registry
+        ready = registry.request(NEXT_VALID_ID)
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            registry.nextOrderId(timeout=0)
+
+        registry.setNextOrderId(5)
+        self.assertEqual(ready.result(0), 5)
+        registry.setNextOrderId(3)
+
+        orderIds = []
+        reqIds = []
+
+        def allocate():
+            for _ in range(1000):
+                orderIds.append(registry.nextOrderId())
+                reqIds.append(registry.nextReqId())
+
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(orderIds), list(range(5, 4005)))
+        self.assertEqual(sorted(reqIds), list(range(REQ_ID_BASE, REQ_ID_BASE + 4000)))
+
+
+    def test_complete(self):
+        registry = self.registry
+        rows = registry.request()
+        positions = registry.request(POSITIONS)
+        registry.add(rows.reqId, "a")
+        registry.add(rows.reqId + 1, "ignored")
+        registry.add(rows.reqId, "b")
+
+        self.assertTrue(registry.isPending(rows.reqId))
+        registry.complete(rows.reqId)
+        registry.complete(POSITIONS, {"AAPL": 10})
+        registry.complete(rows.reqId, "too late")
+
+        self.assertEqual(waitAll([rows, positions], 0), [["a", "b"], {"AAPL": 10}])
+        self.assertFalse(registry.isPending(rows.reqId))
+
+
+    def test_timeout(self):
+        handles = [self.registry.request() for _ in range(2)]
+        self.registry.complete(handles[0].reqId)
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            waitAll(handles, 0.01)
+
+
+    def test_errors(self):
+        registry = self.registry
+        handle = registry.request()
+        registry.error(handle.reqId, 2104, "Market data farm connection is OK")
+        registry.error(-1, 502, "Couldn't connect to TWS")
+        self.assertFalse(handle.done())
+
+        registry.error(handle.reqId, 200, "No security definition has been found")
+        with self.assertRaises(RequestError) as cm:
+            handle.result(0)
+        self.assertEqual((cm.exception.reqId, cm.exception.code), (handle.reqId, 200))
+
+        pending = registry.request()
+        registry.cancelAll("connection closed")
+        with self.assertRaises(ConnectionError):
+            pending.result(0)
+
+
+class RegistryApp(SimulatorApp):
+    """ completes the registry's requests from the callbacks """
+
+    def __init__(self):
+        SimulatorApp.__init__(self)
+        self.requests = RequestRegistry()
+
+    def nextValidId(self, orderId):
+        self.requests.setNextOrderId(orderId)
+
+    def error(self, reqId, errorCode, errorString):
+        SimulatorApp.error(self, reqId, errorCode, errorString)
+        self.requests.error(reqId, errorCode, errorString)
+
+    def position(self, account, contract, position, avgCost):
+        self.requests.add(POSITIONS, (contract.symbol, position))
+
+    def positionEnd(self):
+        self.requests.complete(POSITIONS)
+
+    def execDetails(self, reqId, contract, execution):
+        self.requests.add(reqId, (contract.symbol, execution.side, execution.shares))
+
+    def execDetailsEnd(self, reqId):
+        self.requests.complete(reqId)
+
+    def contractDetails(self, reqId, contractDetails):
+        self.requests.add(reqId, contractDetails.contract.symbol)
+
+    def contractDetailsEnd(self, reqId):
+        self.requests.complete(reqId)
+
+
+class RegistrySimulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = TwsSimulator(positions={"AAPL": 10}).start()
+        self.app = RegistryApp()
+        self.app.setEventDriven(True)
+        ready = self.app.requests.request(NEXT_VALID_ID)
+        self.app.connect(self.simulator.host, self.simulator.port, 1)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        ready.result(5)
+
+
+    def tearDown(self):
+        self.app.disconnect()
+        self.thread.join(2)
+        self.simulator.stop()
+
+
+    def test_requests(self):
+        app = self.app
+        requests = app.requests
+        positions = requests.request(POSITIONS)
+        app.reqPositions()
+        details = requests.request()
+        app.reqContractDetails(details.reqId, make_contract("MSFT"))
+        self.assertEqual(waitAll([positions, details], 5), [[("AAPL", 10)], ["MSFT"]])
+
+        app.placeOrder(requests.nextOrderId(), make_contract("MSFT"), make_order("BUY", "MKT", 5))
+        app.wait("filled")
+        executions = requests.request()
+        app.reqExecutions(executions.reqId, ExecutionFilter())
+        self.assertEqual(executions.result(5), [("MSFT", "BOT", 5)])
+
+
+if "__main__" == __name__:
+    unittest.main()
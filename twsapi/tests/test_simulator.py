@@ -0,0 +1,297 @@
+"""
+Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is subject to the terms
+ and conditions of the IB API Non-Commercial License or the IB API Commercial License, as applicable.
+"""
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+from ibapi import comm
+from ibapi.client import EClient
+from ibapi.compact import (CompactContract, CompactContractDetails, CompactOrder,
+    CompactSoftDollarTier)
+from ibapi.contract import Contract
+from ibapi.execution import ExecutionFilter
+from ibapi.order import Order
+from ibapi.recorder import (WireReplayer, SESSION)
+from ibapi.simulator import (TwsSimulator, openOrderLayout, MIN_SIMULATED_VER)
+from ibapi.server_versions import (MAX_CLIENT_VER, MIN_SERVER_VER_ORDER_CONTAINER)
+from ibapi.ticktype import TickTypeEnum
+from ibapi.wrapper import EWrapper
+
+
+class SimulatorApp(EWrapper, EClient):
+    """ collects the callbacks, every *End one sets an event """
+
+    def __init__(self):
+        EWrapper.__init__(self)
+        EClient.__init__(self, self)
+        self.nextId = None
+        self.positions = []
+        self.orders = {}
+        self.statuses = []
+        self.executions = []
+        self.details = []
+        self.summary = {}
+        self.pnls = []
+        self.ticks = {}
+        self.errors = []
+        self.events = {name: threading.Event() for name in ("nextValidId",
+            "positionEnd", "openOrderEnd", "execDetailsEnd",
+            "contractDetailsEnd", "accountSummaryEnd", "pnl", "pnlSingle",
+            "ticks", "filled")}
+
+    def wait(self, name):
+        if not self.events[name].wait(5):
+            raise AssertionError("no %s" % name)
+        self.events[name].clear()
+
+    def error(self, reqId, errorCode, errorString):
+        self.errors.append((reqId, errorCode, errorString))
+
+    def nextValidId(self, orderId):
+        self.nextId = orderId
+        self.events["nextValidId"].set()
+
+    def position(self, account, contract, position, avgCost):
+        self.positions.append((account, contract.symbol, contract.conId, position))
+
+    def positionEnd(self):
+        self.events["positionEnd"].set()
+
+    def openOrder(self, orderId, contract, order, orderState):
+        self.orders[orderId] = (contract.symbol, order.action, order.orderType,
+                                order.totalQuantity, order.lmtPrice, orderState.status)
+
+    def openOrderEnd(self):
+        self.events["openOrderEnd"].set()
+
+    def orderStatus(self, orderId, status, filled, remaining, avgFillPrice,
+                    permId, parentId, lastFillPrice, clientId, whyHeld, mktCapPrice):
+        self.statuses.append((orderId, status, filled, remaining))
+        if status == "Filled":
+            self.events["filled"].set()
+
+    def execDetails(self, reqId, contract, execution):
+        self.executions.append((reqId, contract.symbol, execution.side, execution.shares))
+
+    def execDetailsEnd(self, reqId):
+        self.events["execDetailsEnd"].set()
+
+    def contractDetails(self, reqId, contractDetails):
+        self.details.append(contractDetails)
+
+    def contractDetailsEnd(self, reqId):
+        self.events["contractDetailsEnd"].set()
+
+    def accountSummary(self, reqId, account, tag, value, currency):
+        self.summary[tag] = value
+
+    def accountSummaryEnd(self, reqId):
+        self.events["accountSummaryEnd"].set()
+
+    def pnl(self, reqId, dailyPnL, unrealizedPnL, realizedPnL):
+        self.pnls.append(reqId)
+        self.events["pnl"].set()
+
+    def pnlSingle(self, reqId, pos, dailyPnL, unrealizedPnL, realizedPnL, value):
+        self.pnls.append((reqId, pos))
+        self.events["pnlSingle"].set()
+
+    def tickPrice(self, reqId, tickType, price, attrib):
+        self.ticks.setdefault(reqId, []).append((tickType, price))
+        if len(self.ticks[reqId]) >= 10:
+            self.events["ticks"].set()
+
+
+def make_contract(symbol):
+    contract = Contract()
+    contract.symbol = symbol
+    contract.secType = "STK"
+    contract.exchange = "SMART"
+    contract.primaryExchange = "ISLAND"
+    contract.currency = "USD"
+    return contract
+
+
+def make_order(action, orderType, quantity, lmtPrice=None):
+    order = Order()
+    order.action = action
+    order.orderType = orderType
+    order.totalQuantity = quantity
+    if lmtPrice is not None:
+        order.lmtPrice = lmtPrice
+    order.tif = "GTC"
+    return order
+
+
+class SimulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = TwsSimulator(positions={"AAPL": 10, "MSFT": -5},
+                                      tickRate=2000).start()
+        self.app = SimulatorApp()
+        self.app.setEventDriven(True)
+        self.app.connect(self.simulator.host, self.simulator.port, 1)
+        self.thread = threading.Thread(target=self.app.run, daemon=True)
+        self.thread.start()
+        self.app.wait("nextValidId")
+
+
+    def tearDown(self):
+        self.app.disconnect()
+        self.thread.join(2)
+        self.simulator.stop()
+
+
+    def test_openOrderLayout(self):
+        # the layout only depends on the server version
+        for serverVersion in (MIN_SIMULATED_VER, MIN_SERVER_VER_ORDER_CONTAINER,
+                              MAX_CLIENT_VER):
+            layout = openOrderLayout(serverVersion)
+            self.assertEqual(layout[0], ("order", "orderId"))
+            self.assertIn(("orderState", "status"), layout)
+
+
+    def test_account(self):
+        app = self.app
+        self.assertEqual(app.serverVersion(), MAX_CLIENT_VER)
+
+        app.reqPositions()
+        app.wait("positionEnd")
+        self.assertEqual(sorted((symbol, position) for (_, symbol, _, position) in app.positions),
+                         [("AAPL", 10), ("MSFT", -5)])
+
+        app.reqAccountSummary(1, "All", "NetLiquidation,SMA,DayTradesRemaining")
+        app.wait("accountSummaryEnd")
+        self.assertEqual(sorted(app.summary), ["DayTradesRemaining", "NetLiquidation", "SMA"])
+
+        app.reqPnL(2, "DU1234567", "")
+        app.wait("pnl")
+        app.reqPnLSingle(3, "DU1234567", "", app.positions[0][2])
+        app.wait("pnlSingle")
+        self.assertEqual(app.pnls[1][0], 3)
+        self.assertIn(app.pnls[1][1], (10, -5))
+
+        app.reqContractDetails(4, make_contract("AAPL"))
+        app.wait("contractDetailsEnd")
+        self.assertEqual(app.details[0].contract.symbol, "AAPL")
+        self.assertEqual(len(app.details[0].tradingHours.split(";")), 7)
+
+
+    def test_compact_objects(self):
+        app = SimulatorApp()
+        app.setEventDriven(True)
+        app.setCompactObjects(True)
+        app.connect(self.simulator.host, self.simulator.port, 2)
+        thread = threading.Thread(target=app.run, daemon=True)
+        thread.start()
+        try:
+            app.wait("nextValidId")
+            app.reqContractDetails(4, make_contract("AAPL"))
+            app.wait("contractDetailsEnd")
+        finally:
+            app.disconnect()
+            thread.join(2)
+
+        details = app.details[0]
+        self.assertIs(type(details), CompactContractDetails)
+        self.assertIs(type(details.contract), CompactContract)
+        self.assertFalse(hasattr(details.contract, "__dict__"))
+        self.assertEqual(details.contract.symbol, "AAPL")
+        self.assertIs(type(CompactOrder().softDollarTier), CompactSoftDollarTier)
+
+
+    def test_wire_recording(self):
+        (fd, path) = tempfile.mkstemp(suffix=".wire")
+        os.close(fd)
+        os.remove(path)
+        self.addCleanup(lambda: os.path.exists(path) and os.remove(path))
+        app = SimulatorApp()
+        app.setEventDriven(True)
+        app.setWireRecording(path)
+        app.connect(self.simulator.host, self.simulator.port, 2)
+        thread = threading.Thread(target=app.run, daemon=True)
+        thread.start()
+        try:
+            app.wait("nextValidId")
+            connTime = app.twsConnectionTime()
+        finally:
+            reader = app.reader
+            app.disconnect()
+            thread.join(2)
+            # the reader closes the recording on its way out
+            reader.join(2)
+
+        # twsConnectionTime() returns the field as received
+        self.assertIsInstance(connTime, bytes)
+        with WireReplayer(path) as replayer:
+            (_, kind, payload) = next(replayer.records())
+        self.assertEqual(kind, SESSION)
+        self.assertEqual(comm.read_fields(payload), (str(MAX_CLIENT_VER).encode(), connTime))
+
+
+    def test_orders(self):
+        app = self.app
+        orderId = app.nextId
+        app.placeOrder(orderId, make_contract("AAPL"), make_order("BUY", "LMT", 5, 1.5))
+        app.placeOrder(orderId + 1, make_contract("MSFT"), make_order("BUY", "MKT", 5))
+        app.wait("filled")
+
+        app.orders.clear()
+        app.reqAllOpenOrders()
+        app.wait("openOrderEnd")
+        self.assertEqual(app.orders, {orderId: ("AAPL", "BUY", "LMT", 5, 1.5, "Submitted")})
+
+        app.reqExecutions(5, ExecutionFilter())
+        app.wait("execDetailsEnd")
+        # the fill itself is reported with reqId -1
+        self.assertEqual(app.executions, [(-1, "MSFT", "BOT", 5), (5, "MSFT", "BOT", 5)])
+
+        app.cancelOrder(orderId)
+        app.reqPositions()
+        app.wait("positionEnd")
+        self.assertNotIn("MSFT", [symbol for (_, symbol, _, _) in app.positions])
+        self.assertIn((orderId, "Cancelled", 0, 5), app.statuses)
+
+
+    def test_orders_before_disconnect(self):
+        app = SimulatorApp()
+        app.setEventDriven(True)
+        app.setPacing(20, 1)
+        app.setCoalescing(4096, 1)
+        app.connect(self.simulator.host, self.simulator.port, 2)
+        thread = threading.Thread(target=app.run, daemon=True)
+        thread.start()
+        app.wait("nextValidId")
+
+        for idx in range(5):
+            app.placeOrder(app.nextId + idx, make_contract("AAPL"), make_order("BUY", "LMT", 1, 1.5))
+        app.disconnect()
+        thread.join(2)
+
+        deadline = time.monotonic() + 2
+        while len(self.simulator.account.orders) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.simulator.account.orders), 5,
+                         "paced orders dropped by disconnect()")
+
+
+    def test_ticks(self):
+        app = self.app
+        for reqId in range(10, 15):
+            app.reqMktData(reqId, make_contract("S%d" % reqId), "", False, False, [])
+        app.wait("ticks")
+
+        first = app.ticks[10][0:4]
+        self.assertEqual([tickType for (tickType, _) in first],
+                         [TickTypeEnum.CLOSE, TickTypeEnum.OPEN, TickTypeEnum.BID,
+                          TickTypeEnum.ASK])
+        self.assertLess(first[2][1], first[3][1])
+        self.assertEqual(app.errors, [])
+
+
+if "__main__" == __name__:
+    unittest.main()
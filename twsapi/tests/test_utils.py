@@ -4,7 +4,9 @@ Copyright (C) 2019 Interactive Brokers LLC. All rights reserved. This code is su
 """
 
 import unittest
+import logging
 
+from ibapi import (comm, utils)
 from ibapi.enum_implem import Enum
 from ibapi.utils import setattr_log
 
@@ -49,6 +51,22 @@ class UtilsTestCase(unittest.TestCase):
         o = B()
         #import code; code.interact(local=locals())
 
+
+    def test_setTrace(self):
+        msg = comm.make_msg(comm.make_field("ABCD"))
+        trace = utils.TRACE
+        try:
+            utils.setTrace(True)
+            with self.assertLogs("ibapi.comm", logging.DEBUG):
+                comm.read_msg(msg)
+
+            utils.setTrace(False)
+            with self.assertRaises(AssertionError):
+                with self.assertLogs("ibapi.comm", logging.DEBUG):
+                    comm.read_msg(msg)
+        finally:
+            utils.setTrace(trace)
+
  
 if "__main__" == __name__:
     unittest.main()